@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Bounded caches, in memory or on the filesystem."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import cPickle as pickle
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from collections import OrderedDict
+
+
+def content_hash(data):
+    """Compute a canonical hash of JSON serializable data.
+
+    Keys of dictionaries are sorted, thus equal data always give the same
+    hash, in any process.
+
+    :param data:
+        JSON serializable data.
+
+        Example:
+            data = {'signatures': [...], 'records': [...]}
+
+    :return:
+        A hexadecimal SHA-1 digest.
+    """
+    content = json.dumps(data, sort_keys=True, separators=(',', ':'),
+                         default=repr)
+
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class LRUCache(object):
+    """A thread-safe least recently used cache bounded by the size of values.
+
+    :param max_size:
+        The maximum total size of the values. Zero disables the cache.
+
+    :param sizeof:
+        A callable returning the size of a value, e.g. in bytes. By default
+        each value has size 1, which bounds the number of entries.
+
+    :param max_age:
+        An optional number of seconds after which entries expire.
+    """
+
+    def __init__(self, max_size, sizeof=None, max_age=None):
+        """Initialize an empty cache."""
+        self.max_size = max_size
+        self.max_age = max_age
+        self.sizeof = sizeof or (lambda value: 1)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """Return the number of entries."""
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Check if the key is cached, without touching the entry."""
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Return the value of the key and mark it as recently used."""
+        with self._lock:
+            try:
+                value, size, created = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if self.max_age is not None and \
+                    time.time() - created > self.max_age:
+                self.size -= size
+                self.evictions += 1
+                self.misses += 1
+                return default
+
+            self._entries[key] = (value, size, created)
+            self.hits += 1
+
+            return value
+
+    def put(self, key, value):
+        """Store the value, evicting the least recently used entries.
+
+        Values larger than the whole cache are not stored.
+        """
+        size = self.sizeof(value)
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+
+            if size > self.max_size:
+                return
+
+            self._entries[key] = (value, size, time.time())
+            self.size += size
+
+            while self.size > self.max_size:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all the entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Return the counters of the cache.
+
+        :return:
+            A dictionary of counters.
+
+            Example:
+                {'entries': 1200, 'size': 4718592, 'max_size': 268435456,
+                 'hits': 9000, 'misses': 1200, 'hit_rate': 0.88,
+                 'evictions': 0}
+        """
+        requests = self.hits + self.misses
+
+        return {
+            'entries': len(self._entries),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+class FilesystemCache(object):
+    """A cache of pickled values stored as files in a directory.
+
+    The directory may be shared by all the processes of a host. Values are
+    written to temporary files and renamed, thus readers never see partial
+    files. The modification time of a file is refreshed on each hit, so
+    that the least recently used files are evicted first once the total
+    size of the directory exceeds ``max_size``.
+
+    :param directory:
+        The directory holding the files. It is created if needed.
+
+    :param max_size:
+        The maximum total size of the files, in bytes.
+
+    :param max_age:
+        An optional number of seconds after which unused entries expire.
+    """
+
+    suffix = '.pickle'
+
+    def __init__(self, directory, max_size, max_age=None):
+        """Initialize the cache in the given directory."""
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    def _path(self, key):
+        return os.path.join(self.directory,
+                            hashlib.sha1(key.encode('utf-8')).hexdigest() +
+                            self.suffix)
+
+    def _files(self):
+        """List the cached files as (mtime, size, path) tuples."""
+        files = []
+
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+
+            path = os.path.join(self.directory, name)
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another process meanwhile.
+                continue
+
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        return files
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.evictions += 1
+        except OSError:
+            pass
+
+    def get(self, key, default=None):
+        """Return the value of the key and mark it as recently used."""
+        path = self._path(key)
+
+        try:
+            expired = self.max_age is not None and \
+                time.time() - os.stat(path).st_mtime > self.max_age
+
+            if not expired:
+                with open(path, 'rb') as fp:
+                    value = pickle.load(fp)
+
+                os.utime(path, None)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            # Missing, or removed by another process meanwhile.
+            self.misses += 1
+            return default
+
+        if expired:
+            self._remove(path)
+            self.misses += 1
+            return default
+
+        self.hits += 1
+
+        return value
+
+    def put(self, key, value):
+        """Store the value, evicting expired and least recently used files."""
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                pickle.dump(value, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.rename(temporary, self._path(key))
+        except:
+            os.remove(temporary)
+            raise
+
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        files = []
+
+        for mtime, size, path in self._files():
+            if self.max_age is not None and now - mtime > self.max_age:
+                self._remove(path)
+            else:
+                files.append((mtime, size, path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+
+        for _, size, path in files:
+            if total <= self.max_size:
+                break
+
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """Remove all the files and reset the counters."""
+        for _, _, path in self._files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Return the counters of the cache, as ``LRUCache.stats``."""
+        files = self._files()
+        requests = self.hits + self.misses
+
+        return {
+            'entries': len(files),
+            'size': sum(size for _, size, _ in files),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+def make_cache(backend, max_size, max_age=None, directory=None,
+               sizeof=None):
+    """Create a cache with the given backend.
+
+    :param backend:
+        ``'memory'`` for an ``LRUCache``, ``'filesystem'`` for a
+        ``FilesystemCache`` or ``None`` for no cache.
+
+    :return:
+        The cache, or ``None``.
+    """
+    if not backend or not max_size:
+        return None
+
+    if backend == 'memory':
+        return LRUCache(max_size, sizeof=sizeof, max_age=max_age)
+
+    if backend == 'filesystem':
+        if directory is None:
+            directory = os.path.join(tempfile.gettempdir(),
+                                     'beard-server-cache')
+
+        return FilesystemCache(directory, max_size, max_age=max_age)
+
+    raise ValueError("Unknown cache backend: {0}.".format(backend))
@@ -33,5 +33,8 @@ from celery import Celery
 app = Celery('beard_server')
 app.config_from_object(config)
 
+# Preload the models before the pool of the worker is forked.
+from beard_server import warmup  # noqa
+
 if __name__ == '__main__':
     app.start()
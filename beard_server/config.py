@@ -36,11 +36,130 @@ CELERY_ROUTES = {
     "beard_server.tasks.make_clusters": {
         "queue": "beard"
     },
+    "beard_server.tasks.update_clusters": {
+        "queue": "beard"
+    },
+    "beard_server.tasks.cluster_block": {
+        "queue": "beard"
+    },
+    "beard_server.tasks.merge_clusters": {
+        "queue": "beard"
+    },
     "beard_server.tasks.solve_conflicts": {
         "queue:": "beard"
     }
 }
 
+# Load the models in the parent process of a Celery worker, so that the
+# children of a prefork pool share them.
+BEARD_SERVER_PRELOAD_MODELS = True
+
+# Clustering.
+# Payloads with more signatures than this are blocked up front and their
+# blocks clustered by "cluster_block" subtasks, which small blocks share up
+# to the given number of signatures. A "merge_clusters" chord callback
+# matches the clusters. It requires a result backend supporting chords.
+# None clusters every payload in a single task.
+BEARD_SERVER_FAN_OUT_SIZE = None
+BEARD_SERVER_BLOCK_GROUP_SIZE = 2000
+
+# Number of processes clustering the blocks of a single task. Negative
+# values are relative to the number of cores, -1 meaning all of them. It
+# applies to the Celery tasks, while the jobs of the web application,
+# which run on threads, cluster their blocks sequentially.
+BEARD_SERVER_CLUSTERING_JOBS = 1
+
+# Clustering of the blocks, "full" or "sparse". In the sparse mode, blocks
+# larger than the given size are clustered on their candidate pairs only.
+BEARD_SERVER_CLUSTERING_MODE = "full"
+BEARD_SERVER_SPARSE_BLOCK_SIZE = 2000
+
+# Blocks larger than this size are split by initial, given names and
+# coauthors before being clustered, e.g. 10000. Clusters of sub-blocks
+# closer than the clustering threshold are linked afterwards, which may
+# give other clusters than clustering the whole block. None keeps the
+# phonetic blocks.
+BEARD_SERVER_MAX_BLOCK_SIZE = None
+
+# Cluster signatures identical for the distance model as one weighted
+# representative.
+BEARD_SERVER_DEDUPLICATE = False
+
+# Keep the signatures of a task in a columnar store with interned values
+# instead of dictionaries. It takes several times less memory and the
+# getters run once per distinct value, but it is slower to load.
+BEARD_SERVER_COLUMNAR_SIGNATURES = False
+
+# Directory keeping the distance matrices of the blocks between tasks, as
+# float32 files, or None. Only the distances of new or changed signatures
+# are then computed. Least recently used matrices are removed once the
+# total size in bytes is above the quota.
+BEARD_SERVER_DISTANCE_STORE_DIR = None
+BEARD_SERVER_DISTANCE_STORE_SIZE = 10 * 1024 * 1024 * 1024
+
+# Incremental clustering compares new signatures with at most this many
+# members of each existing cluster. The block is clustered from scratch if
+# the fraction of new signatures, or of new signatures close to several
+# clusters, is above the given limits.
+BEARD_SERVER_INCREMENTAL_MAX_MEMBERS = 20
+BEARD_SERVER_INCREMENTAL_MAX_NEW_FRACTION = 0.5
+BEARD_SERVER_INCREMENTAL_MAX_INSTABILITY = 0.1
+
+# Pairs with incompatible initials and no common coauthor get a fixed
+# distance without being scored. The year gap, if not None, further
+# restricts the pruned pairs to publications that many years apart.
+BEARD_SERVER_CASCADE = False
+BEARD_SERVER_CASCADE_DISTANCE = 1.0
+BEARD_SERVER_CASCADE_MIN_YEAR_GAP = None
+
+# Memory, in bytes, of the transformed signatures kept across tasks.
+# Zero disables the cache.
+BEARD_SERVER_FEATURE_CACHE_SIZE = 256 * 1024 * 1024
+
+# Timing and memory of the stages of the clustering tasks, emitted as JSON
+# records of the "beard_server.instrumentation" logger. The slowest blocks
+# are listed, up to the given number. The profile can also be returned as a
+# third element of the results of the tasks. Tracing Python allocations
+# (Python 3 only) slows the run down.
+BEARD_SERVER_INSTRUMENTATION = True
+BEARD_SERVER_INSTRUMENTATION_MAX_BLOCKS = 50
+BEARD_SERVER_INSTRUMENTATION_IN_RESULT = False
+BEARD_SERVER_INSTRUMENTATION_TRACEMALLOC = False
+
+# Number of author names whose derived forms (normalized name, initials,
+# phonetic tokens, ...) are kept by each process.
+BEARD_SERVER_NAME_FORMS_CACHE_SIZE = 200000
+
+# Cache of the clusters of whole blocks, keyed by their content, the
+# clustering parameters and the model. The backend is "memory" (per
+# process), "filesystem" (shared by the workers of a host) or None.
+BEARD_SERVER_BLOCK_CACHE = "memory"
+BEARD_SERVER_BLOCK_CACHE_DIR = None
+# Maximum size in bytes and age in seconds of the cached results.
+BEARD_SERVER_BLOCK_CACHE_SIZE = 64 * 1024 * 1024
+BEARD_SERVER_BLOCK_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
+# Store of the records referenced by the tasks, as {"publication_id": ...,
+# "record_hash": ...}, instead of being embedded in the messages. The
+# backend is "filesystem" (a directory of JSON files), "sqlite" (a database
+# file) or None. The path defaults to the temporary directory.
+BEARD_SERVER_RECORD_STORE = None
+BEARD_SERVER_RECORD_STORE_PATH = None
+
+# Number of (not-claimed, claimed) signature pairs scored at once when
+# solving conflicts.
+BEARD_SERVER_CONFLICTS_BATCH_SIZE = 10000
+
+# Seconds during which a web worker uses its coreness model without
+# checking whether a new one was published.
+BEARD_SERVER_PREDICTOR_CHECK_INTERVAL = 1.0
+
+# Jobs submitted to the endpoints with "?async=1" run on this many threads
+# of the web process. Finished jobs are kept for the given number of
+# seconds.
+BEARD_SERVER_JOBS_WORKERS = 2
+BEARD_SERVER_JOBS_MAX_AGE = 24 * 60 * 60
+
 # Jinja.
 BEARD_SERVER_BASE_TEMPLATE = "base.html"
 JSON_AS_ASCII = False
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Timing and memory of the stages of a clustering run.
+
+A run is wrapped in ``profile``; the stages inside it in ``stage``::
+
+    with profile('make_clusters') as run:
+        with stage('predict'):
+            ...
+
+    run.as_dict()
+
+Each stage records its wall and CPU times, the resident memory at its
+end and the peak resident memory of the process and of its children.
+``count`` adds to counters and ``record_block`` keeps the size, the
+number of pairs and the time of a clustered block. When the run ends, it
+is emitted as a JSON log record of the ``beard_server.instrumentation``
+logger, the profile being also available in the ``profile`` attribute of
+the record.
+
+Outside of a run, ``stage``, ``count`` and ``record_block`` do nothing.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import json
+import logging
+import resource
+import threading
+import time
+
+from contextlib import contextmanager
+
+from beard_server import config
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def rss():
+    """Return the resident memory of the process in bytes, or None."""
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss(who=resource.RUSAGE_SELF):
+    """Return the peak resident memory in bytes (Linux semantics)."""
+    return resource.getrusage(who).ru_maxrss * 1024
+
+
+class Profile(object):
+    """The stages, counters and blocks of a run.
+
+    :param name:
+        The name of the run, e.g. 'make_clusters'.
+    """
+
+    def __init__(self, name, **fields):
+        """Start an empty profile."""
+        self.name = name
+        self.fields = fields
+        self.stages = []
+        self.counters = {}
+        self.blocks = []
+        self.start = time.time()
+        self.time = None
+        self._path = []
+
+    @property
+    def current_stage(self):
+        """The path of the stage being run, e.g. 'predict/clustering'."""
+        return '/'.join(self._path) or None
+
+    def count(self, name, value=1):
+        """Add a value to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self, max_blocks=None):
+        """Return the profile as JSON serializable data.
+
+        :param max_blocks:
+            If not None, only the given number of the slowest blocks are
+            listed; all of them are summed in ``counters``.
+
+        :return:
+            Example:
+                {'name': 'make_clusters', 'time': 12.5,
+                 'stages': [{'name': 'predict/clustering', 'time': 11.9,
+                             'cpu_time': 11.7, 'rss': 812003328,
+                             'peak_rss': 901775360,
+                             'children_peak_rss': 0}, ...],
+                 'counters': {'blocks': 2, 'pairs': 153, ...},
+                 'blocks': [{'block': 'WANGs', 'size': 12, 'pairs': 66,
+                             'time': 0.2}, ...]}
+        """
+        blocks = sorted(self.blocks, key=lambda block: -block['time'])
+
+        if max_blocks is not None:
+            blocks = blocks[:max_blocks]
+
+        data = dict(self.fields)
+        data.update({
+            'name': self.name,
+            'time': self.time,
+            'stages': list(self.stages),
+            'counters': dict(self.counters),
+            'blocks': blocks,
+        })
+
+        return data
+
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def current_profile():
+    """Return the profile of the run of this thread, if any."""
+    stack = _stack()
+
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def profile(name, **fields):
+    """Profile a run, then emit it as a log record.
+
+    :param name:
+        The name of the run.
+
+    :param fields:
+        Additional JSON serializable fields of the profile.
+
+    :return:
+        The ``Profile``, or None if ``BEARD_SERVER_INSTRUMENTATION`` is
+        False.
+    """
+    if not config.BEARD_SERVER_INSTRUMENTATION:
+        yield None
+        return
+
+    run = Profile(name, **fields)
+    stack = _stack()
+    stack.append(run)
+    tracing = tracemalloc is not None and \
+        config.BEARD_SERVER_INSTRUMENTATION_TRACEMALLOC and \
+        not tracemalloc.is_tracing()
+
+    if tracing:
+        tracemalloc.start()
+
+    try:
+        yield run
+    finally:
+        run.time = time.time() - run.start
+
+        if tracing:
+            run.fields['tracemalloc_peak'] = \
+                tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        stack.pop()
+        data = run.as_dict(config.BEARD_SERVER_INSTRUMENTATION_MAX_BLOCKS)
+        logger.info(json.dumps(data, sort_keys=True, default=repr),
+                    extra={'profile': data})
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current run.
+
+    Stages may be nested; their names are then joined with slashes, e.g.
+    'clustering/blocking'.
+    """
+    run = current_profile()
+
+    if run is None:
+        yield
+        return
+
+    run._path.append(name)
+    path = '/'.join(run._path)
+    start = time.time()
+    cpu_start = time.clock()
+
+    try:
+        yield
+    finally:
+        run._path.pop()
+        run.stages.append({
+            'name': path,
+            'time': time.time() - start,
+            'cpu_time': time.clock() - cpu_start,
+            'rss': rss(),
+            'peak_rss': peak_rss(),
+            'children_peak_rss': peak_rss(resource.RUSAGE_CHILDREN),
+        })
+
+
+def count(name, value=1):
+    """Add a value to a counter of the current run."""
+    run = current_profile()
+
+    if run is not None:
+        run.count(name, value)
+
+
+def record_block(block, size, pairs, elapsed, **fields):
+    """Record a clustered block in the current run.
+
+    :param block:
+        The key of the block, e.g. 'WANGs'.
+
+    :param size:
+        The number of signatures of the block.
+
+    :param pairs:
+        The number of pairs of signatures scored or linked.
+
+    :param elapsed:
+        The time spent to cluster the block, in seconds.
+    """
+    run = current_profile()
+
+    if run is None:
+        return
+
+    entry = dict(fields)
+    entry.update(block=block, size=size, pairs=pairs, time=elapsed)
+    run.blocks.append(entry)
+    run.count('blocks')
+    run.count('signatures', size)
+    run.count('pairs', pairs)
+    run.count('block_time', elapsed)
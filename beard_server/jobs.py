@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Background jobs of the web application.
+
+Clustering and training take minutes, more than a request should. With
+``?async=1`` the endpoints submit their work as a job and answer at once
+with its identifier; ``GET /api/jobs/<id>`` then returns the status, the
+progress and, once done, the result of the job.
+
+Jobs run on a pool of threads of the web process, so that their progress
+can be read from the stage of their run (see ``instrumentation``). Jobs
+are kept in memory, thus the web application must run a single process
+(``workers = 1`` in ``gunicorn.cfg``).
+
+Clustering jobs run one at a time and cluster their blocks sequentially:
+the affinity functions read the model from globals of the process, and
+worker processes are not forked from a process running other threads.
+Large payloads are better sent to the Celery tasks, which cluster their
+blocks on ``BEARD_SERVER_CLUSTERING_JOBS`` processes.
+
+A job submitted while an identical one, with the same name and arguments,
+is queued or running is not run twice: the identifier of the running job
+is returned instead.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import logging
+import threading
+import time
+import uuid
+
+from multiprocessing.pool import ThreadPool
+
+from flask import jsonify, request, url_for
+
+from beard_server import config, instrumentation
+from beard_server.cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class Job(object):
+    """A function call run in the background.
+
+    :param name:
+        The name of the job, e.g. 'clustering.clusters'.
+
+    :param key:
+        The content hash of the name and the arguments of the job.
+    """
+
+    def __init__(self, name, key):
+        """Create a queued job."""
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.run = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def in_flight(self):
+        """Tell if the job is queued or running."""
+        return self.status in ('queued', 'running')
+
+    def progress(self):
+        """Return the stage being run and the stages done, if profiled."""
+        run = self.run
+
+        if run is None:
+            return None
+
+        return {
+            'stage': run.current_stage,
+            'stages_done': [entry['name'] for entry in run.stages],
+        }
+
+    def as_dict(self):
+        """Return the job as JSON serializable data.
+
+        :return:
+            Example:
+                {'id': '9e107d9d372bb6826bd81d3542a419d6',
+                 'name': 'clustering.clusters', 'status': 'running',
+                 'progress': {'stage': 'block_clustering',
+                              'stages_done': ['load_model',
+                                              'load_signatures']},
+                 'submitted_at': 1476783412.5, 'started_at': 1476783412.6,
+                 'finished_at': None}
+        """
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'progress': self.progress(),
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+
+        return data
+
+    def __call__(self, func, args):
+        """Run the function and keep its result or its error."""
+        self.status = 'running'
+        self.started_at = time.time()
+
+        try:
+            with instrumentation.profile('job', job=self.name) as run:
+                self.run = run
+                result = func(*args)
+        except Exception as error:
+            logger.exception("Job %s (%s) failed.", self.id, self.name)
+            self.error = '{0}: {1}'.format(type(error).__name__, error)
+            self.status = 'failed'
+        else:
+            self.result = result
+            self.status = 'done'
+        finally:
+            self.finished_at = time.time()
+
+
+class JobManager(object):
+    """Submit jobs to a pool of threads and keep track of them.
+
+    :param n_workers:
+        The number of jobs run at the same time.
+
+    :param max_age:
+        The number of seconds finished jobs are kept.
+    """
+
+    def __init__(self, n_workers, max_age):
+        """Initialize a manager without jobs."""
+        self.n_workers = n_workers
+        self.max_age = max_age
+        self._jobs = {}
+        self._in_flight = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, name, func, *args):
+        """Run ``func(*args)`` as a job, unless an identical one is running.
+
+        :param args:
+            JSON serializable arguments.
+
+        :return:
+            The new job, or the identical job in flight.
+        """
+        key = content_hash({'name': name, 'args': args})
+
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(self._in_flight.get(key))
+
+            if job is not None and job.in_flight:
+                return job
+
+            if self._pool is None:
+                # Started lazily, i.e. after the web workers are forked.
+                self._pool = ThreadPool(self.n_workers)
+
+            job = Job(name, key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+            self._pool.apply_async(job, (func, args))
+
+        return job
+
+    def get(self, job_id):
+        """Return the job with the given identifier, or None."""
+        return self._jobs.get(job_id)
+
+    def _expire(self):
+        """Forget the jobs finished more than ``max_age`` seconds ago."""
+        now = time.time()
+
+        for job in list(self._jobs.values()):
+            if not job.in_flight and now - job.finished_at > self.max_age:
+                del self._jobs[job.id]
+
+                if self._in_flight.get(job.key) == job.id:
+                    del self._in_flight[job.key]
+
+
+jobs = JobManager(config.BEARD_SERVER_JOBS_WORKERS,
+                  config.BEARD_SERVER_JOBS_MAX_AGE)
+
+
+def respond_async():
+    """Tell if the client of the request asked for a job."""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def submit_response(name, func, *args):
+    """Submit a job and answer with its identifier and its status URL."""
+    job = jobs.submit(name, func, *args)
+    location = url_for('beard_server.job_status', job_id=job.id)
+    response = jsonify({'job_id': job.id, 'status': job.status,
+                        'location': location})
+    response.status_code = 202
+    response.headers['Location'] = location
+
+    return response
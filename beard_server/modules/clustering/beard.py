@@ -30,40 +30,229 @@ from __future__ import absolute_import, division, print_function, \
 import cPickle as pickle
 import os
 
+import numpy as np
+
+from beard_server import config, instrumentation
+from beard_server.cache import content_hash, make_cache
+from beard_server.registry import load_model, registry
+
+from .incremental import assign_signatures
 from .utils import clustering, learn_model, pair_sampling
+from .utils.beard_cascade import Cascade
+from .utils.beard_names import block_phonetic
+from .utils.beard_store import DistanceStore
 from .recid import make_recid_clusters
 
 
-def predict(records, signatures, clusters=False):
+# Clusters of the blocks already seen.
+block_cache = make_cache(
+    config.BEARD_SERVER_BLOCK_CACHE,
+    config.BEARD_SERVER_BLOCK_CACHE_SIZE,
+    max_age=config.BEARD_SERVER_BLOCK_CACHE_MAX_AGE,
+    directory=config.BEARD_SERVER_BLOCK_CACHE_DIR,
+    sizeof=len)
+
+# Distance matrices of the blocks already seen.
+distance_store = None
+
+if config.BEARD_SERVER_DISTANCE_STORE_DIR:
+    distance_store = DistanceStore(config.BEARD_SERVER_DISTANCE_STORE_DIR,
+                                   config.BEARD_SERVER_DISTANCE_STORE_SIZE)
+
+
+def _block_key(records, signatures, parameters, distance_model):
+    """Compute the cache key of a block.
+
+    Signatures and records are sorted by their identifiers, as their order
+    does not change the clusters.
+    """
+    return content_hash({
+        'signatures': sorted(signatures,
+                             key=lambda s: s.get('signature_id')),
+        'records': sorted(records, key=lambda r: r.get('publication_id')),
+        'parameters': parameters,
+        'model': registry.fingerprint(distance_model),
+    })
+
+
+# Default parameters for blocking signatures to be clustered.
+BLOCKING_THRESHOLD = 0
+BLOCKING_PHONETIC_ALG = 'nysiis'
+
+
+def group_blocks(records, signatures, max_size):
+    """Split a payload into groups of whole blocks.
+
+    The signatures are blocked as in ``predict``. Blocks are packed, the
+    largest first, into the first group with room for them. Blocks larger
+    than ``max_size`` form a group on their own.
+
+    :param max_size:
+        The maximum number of signatures of a group of several blocks.
+
+    :return:
+        A list of ``(records, signatures, blocks)`` payloads, where
+        ``blocks`` holds the block of each signature of the group.
+    """
+    X = np.empty((len(signatures), 1), dtype=object)
+    X[:, 0] = signatures
+    block_ids = block_phonetic(X, threshold=BLOCKING_THRESHOLD,
+                               phonetic_algorithm=BLOCKING_PHONETIC_ALG)
+
+    members = {}
+
+    for i, block in enumerate(block_ids.tolist()):
+        members.setdefault(block, []).append(i)
+
+    groups = []
+    sizes = []
+
+    for block in sorted(members, key=lambda b: (-len(members[b]), b)):
+        size = len(members[block])
+
+        for g in range(len(groups)):
+            if sizes[g] + size <= max_size:
+                groups[g].append(block)
+                sizes[g] += size
+                break
+        else:
+            groups.append([block])
+            sizes.append(size)
+
+    payloads = []
+
+    for group in groups:
+        indices = sorted(i for block in group for i in members[block])
+        group_signatures = [signatures[i] for i in indices]
+        publications = set(s['publication_id'] for s in group_signatures)
+        group_records = [r for r in records
+                         if r['publication_id'] in publications]
+
+        payloads.append((group_records, group_signatures,
+                         [block_ids[i].item() for i in indices]))
+
+    return payloads
+
+
+def predict(records, signatures, clusters=False, blocks=None):
+    """Cluster the signatures of a payload.
+
+    :param blocks:
+        If given, the block of each signature, as computed by
+        ``group_blocks`` on a larger payload. Otherwise the signatures are
+        blocked by the phonetic tokens of their surnames.
+    """
     # Default parameters for clustering signatures.
     blocking_function = 'block_phonetic'
-    blocking_threshold = 0
-    blocking_phonetic_alg = 'nysiis'
+    blocking_threshold = BLOCKING_THRESHOLD
+    blocking_phonetic_alg = BLOCKING_PHONETIC_ALG
     clustering_threshold = 0.709
     verbose = 0
 
-    # Note that beard-server already receives phonetic blocks in packages.
-    n_jobs = 1
+    # A single payload may hold many phonetic blocks.
+    n_jobs = config.BEARD_SERVER_CLUSTERING_JOBS
+    clustering_mode = config.BEARD_SERVER_CLUSTERING_MODE
+    sparse_block_size = config.BEARD_SERVER_SPARSE_BLOCK_SIZE
+    max_block_size = config.BEARD_SERVER_MAX_BLOCK_SIZE
+    deduplicate = config.BEARD_SERVER_DEDUPLICATE
+    columnar = config.BEARD_SERVER_COLUMNAR_SIGNATURES
+    cascade = None
+
+    if config.BEARD_SERVER_CASCADE:
+        cascade = Cascade(
+            distance=config.BEARD_SERVER_CASCADE_DISTANCE,
+            min_year_gap=config.BEARD_SERVER_CASCADE_MIN_YEAR_GAP)
 
     # Paths, where the model is stored.
     distance_model = os.path.abspath(os.path.join(os.path.dirname(
         __file__), 'classifiers/linkage.dat'))
 
+    if blocks is not None:
+        blocks = dict(zip((s['signature_id'] for s in signatures), blocks))
+
+    if block_cache is not None:
+        with instrumentation.stage('block_cache'):
+            key = _block_key(records, signatures, {
+                'clusters': clusters,
+                'clustering_threshold': clustering_threshold,
+                'blocking_function': blocking_function,
+                'blocking_threshold': blocking_threshold,
+                'blocking_phonetic_alg': blocking_phonetic_alg,
+                'clustering_mode': clustering_mode,
+                'sparse_block_size': sparse_block_size,
+                'max_block_size': max_block_size,
+                'distance_store': distance_store is not None,
+                'deduplicate': deduplicate,
+                'blocks': blocks,
+                'cascade': config.BEARD_SERVER_CASCADE and [
+                    config.BEARD_SERVER_CASCADE_DISTANCE,
+                    config.BEARD_SERVER_CASCADE_MIN_YEAR_GAP],
+            }, distance_model)
+            # Results are kept pickled, so that callers get their own copy.
+            result = block_cache.get(key)
+
+        if result is not None:
+            instrumentation.count('block_cache_hits')
+            return pickle.loads(result)
+
     # Create known clusters.
     if clusters:
         known_clusters = make_recid_clusters(signatures, True)
     else:
         known_clusters = None
 
-    return clustering(input_signatures=signatures,
-                      input_records=records,
-                      input_clusters=known_clusters,
-                      distance_model=distance_model,
-                      verbose=verbose, n_jobs=n_jobs,
-                      clustering_threshold=clustering_threshold,
-                      blocking_function=blocking_function,
-                      blocking_threshold=blocking_threshold,
-                      blocking_phonetic_alg=blocking_phonetic_alg)
+    with instrumentation.stage('clustering'):
+        result = clustering(input_signatures=signatures,
+                            input_records=records,
+                            input_clusters=known_clusters,
+                            distance_model=distance_model,
+                            verbose=verbose, n_jobs=n_jobs,
+                            clustering_threshold=clustering_threshold,
+                            blocking_function=blocking_function,
+                            blocking_threshold=blocking_threshold,
+                            blocking_phonetic_alg=blocking_phonetic_alg,
+                            clustering_mode=clustering_mode,
+                            sparse_block_size=sparse_block_size,
+                            cascade=cascade,
+                            max_block_size=max_block_size,
+                            store=distance_store,
+                            deduplicate=deduplicate,
+                            blocks=blocks,
+                            columnar=columnar)
+
+    if block_cache is not None:
+        with instrumentation.stage('cache_store'):
+            block_cache.put(key,
+                            pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+
+    return result
+
+
+def update(records, signatures, clusters):
+    """Add new signatures to existing clusters.
+
+    Signatures of the block which are not in ``clusters`` are assigned to
+    the existing clusters or grouped into new ones. If the assignment is
+    unstable, the whole block is clustered again with ``predict``.
+    """
+    clustering_threshold = 0.709
+
+    distance_model = os.path.abspath(os.path.join(os.path.dirname(
+        __file__), 'classifiers/linkage.dat'))
+
+    result = assign_signatures(
+        records, signatures, clusters,
+        distance_model=distance_model,
+        clustering_threshold=clustering_threshold,
+        max_members=config.BEARD_SERVER_INCREMENTAL_MAX_MEMBERS,
+        max_new_fraction=config.BEARD_SERVER_INCREMENTAL_MAX_NEW_FRACTION,
+        max_instability=config.BEARD_SERVER_INCREMENTAL_MAX_INSTABILITY,
+        batch_size=config.BEARD_SERVER_CONFLICTS_BATCH_SIZE)
+
+    if result is None:
+        result = predict(records, signatures)
+
+    return result
 
 
 def train(clusters, records, signatures):
@@ -90,9 +279,9 @@ def train(clusters, records, signatures):
     # Paths, where model will be stored and ethnicity model can be found.
     distance_model = os.path.abspath(os.path.join(os.path.dirname(
         __file__), 'classifiers/linkage.dat'))
-    ethnicity_estimator = pickle.load(open(os.path.abspath(os.path.join(
+    ethnicity_estimator = load_model(os.path.abspath(os.path.join(
         os.path.dirname(__file__),
-        'classifiers/ethnicity_estimator.pickle')), 'r'))
+        'classifiers/ethnicity_estimator.pickle')))
 
     # Training with full name, co-authors and affiliation features.
     fast = 2
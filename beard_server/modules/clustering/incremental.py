@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Incremental assignment of new signatures to existing clusters."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import logging
+import os
+
+import numpy as np
+import scipy.cluster.hierarchy as hac
+import scipy.sparse as sp
+
+from .utils.beard_affinity import get_affinity_engine
+from .utils.beard_utils import as_column
+from .utils.beard_utils import load_signatures
+
+logger = logging.getLogger(__name__)
+
+
+def _representatives(members, max_members):
+    """Pick at most ``max_members`` evenly spread members of a cluster."""
+    if len(members) <= max_members:
+        return list(members)
+
+    positions = np.linspace(0, len(members) - 1, max_members)
+
+    return [members[position] for position in positions.astype(np.int64)]
+
+
+def assign_signatures(records, signatures, clusters, distance_model=None,
+                      clustering_threshold=0.709, max_members=20,
+                      max_new_fraction=0.5, max_instability=0.1,
+                      batch_size=10000):
+    """Add the signatures not yet clustered to the existing clusters.
+
+    Each new signature is compared with (at most ``max_members``)
+    members of every cluster. As in average linkage, it joins the cluster
+    with the lowest average distance if that distance is below the
+    threshold. New signatures joining no cluster are clustered together
+    with average linkage.
+
+    A new signature close to several clusters could make a full average
+    linkage merge them. The fraction of such new signatures is the
+    instability of the assignment.
+
+    :param records:
+        A list of records, as in ``predict``.
+
+    :param signatures:
+        A list of all the signatures of the block, as in ``predict``.
+
+    :param clusters:
+        A dictionary of the existing clusters, e.g. from
+        ``make_recid_clusters`` or a previous ``predict``. Signatures
+        which are not in the block are ignored.
+
+        Example:
+            {"10123": ["a4156520-560d-4248-a57f-949c361e0dd0"]}
+
+    :param distance_model:
+        Path to the pickled linkage model. Defaults to the model shipped
+        in the ``classifiers`` directory.
+
+    :param clustering_threshold:
+        The largest average distance of a signature to the cluster it is
+        assigned to.
+
+    :param max_members:
+        The number of members of a cluster compared with new signatures.
+
+    :param max_new_fraction:
+        The largest fraction of new signatures in the block.
+
+    :param max_instability:
+        The largest fraction of new signatures close to several clusters.
+
+    :param batch_size:
+        The number of (new signature, member) pairs scored at once.
+
+    :return:
+        A dictionary of clusters holding the existing clusters, with their
+        labels, and the clusters of new signatures only, labelled
+        ``new_0``, ``new_1``, ... None if the block has to be clustered
+        from scratch, i.e. if there are no existing clusters, too many new
+        signatures or the assignment is unstable.
+    """
+    signatures_by_id, _ = load_signatures(signatures, records)
+
+    existing = {}
+    for label, members in clusters.items():
+        members = [m for m in members if m in signatures_by_id]
+        if members:
+            existing[label] = members
+
+    clustered = set(m for members in existing.values() for m in members)
+    new_ids = [s['signature_id'] for s in signatures
+               if s['signature_id'] not in clustered]
+    result = dict((label, list(members))
+                  for label, members in existing.items())
+
+    if not new_ids:
+        return result
+
+    if not existing or \
+            len(new_ids) > max_new_fraction * len(signatures_by_id):
+        logger.info("%d of %d signatures are new, clustering from scratch.",
+                    len(new_ids), len(signatures_by_id))
+        return None
+
+    if distance_model is None:
+        distance_model = os.path.abspath(os.path.join(os.path.dirname(
+                                         __file__), 'classifiers/linkage.dat'))
+
+    affinity_engine = get_affinity_engine(distance_model)
+
+    labels = sorted(existing)
+    member_ids = []
+    owners = []
+
+    for position, label in enumerate(labels):
+        representatives = _representatives(existing[label], max_members)
+        member_ids.extend(representatives)
+        owners.extend([position] * len(representatives))
+
+    n_members = len(member_ids)
+    # Sums the distances to the members of each cluster.
+    membership = sp.csr_matrix((np.ones(n_members), (owners,
+                                                     np.arange(n_members))),
+                               shape=(len(labels), n_members))
+    sizes = np.asarray(membership.sum(axis=1)).ravel()
+
+    new_features = affinity_engine.transform(
+        as_column([signatures_by_id[s] for s in new_ids]))
+    member_features = affinity_engine.transform(
+        as_column([signatures_by_id[s] for s in member_ids]))
+
+    n_rows = max(1, batch_size // n_members)
+    averages = np.empty((len(new_ids), len(labels)))
+
+    for start in range(0, len(new_ids), n_rows):
+        end = min(len(new_ids), start + n_rows)
+        rows = np.arange(start, end)
+        distances = affinity_engine.predict_proba(
+            new_features, np.repeat(rows, n_members),
+            member_features, np.tile(np.arange(n_members), len(rows)))[:, 1]
+        distances = distances.reshape(len(rows), n_members)
+
+        averages[start:end] = membership.dot(distances.T).T / sizes
+
+    close = averages <= clustering_threshold
+    instability = np.mean(close.sum(axis=1) > 1)
+
+    if instability > max_instability:
+        logger.info("Instability of %.3f above %.3f, clustering from "
+                    "scratch.", instability, max_instability)
+        return None
+
+    unassigned = []
+
+    for new_id, row, is_close in zip(new_ids, averages, close):
+        if is_close.any():
+            result[labels[np.argmin(row)]].append(new_id)
+        else:
+            unassigned.append(new_id)
+
+    if len(unassigned) > 1:
+        distances = affinity_engine.distances(
+            as_column([signatures_by_id[s] for s in unassigned]))
+        new_labels = hac.fcluster(hac.linkage(distances, method='average'),
+                                  clustering_threshold,
+                                  criterion='distance')
+    else:
+        new_labels = [1] * len(unassigned)
+
+    new_clusters = {}
+    for new_id, new_label in zip(unassigned, new_labels):
+        new_clusters.setdefault(new_label, []).append(new_id)
+
+    index = 0
+    for new_label in sorted(new_clusters):
+        # Labels of a previous assignment may be passed back as existing.
+        while 'new_%d' % index in result:
+            index += 1
+
+        result['new_%d' % index] = new_clusters[new_label]
+
+    return result
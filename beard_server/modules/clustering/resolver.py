@@ -26,12 +26,15 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 import os
-import pickle
 
 import numpy as np
 
+from .utils.beard_affinity import get_affinity_engine
+from .utils.beard_utils import as_column
 
-def solve_claims_conflict(claimed_signatures, not_claimed_signatures):
+
+def solve_claims_conflict(claimed_signatures, not_claimed_signatures,
+                          distance_model=None, batch_size=10000):
     """Match signatures to the most likely claimed signatures.
 
     If Beard will cluster at least two different (claimed) signatures
@@ -79,6 +82,13 @@ def solve_claims_conflict(claimed_signatures, not_claimed_signatures):
                 }}
             ]
 
+    :param distance_model:
+        Path to the pickled linkage model. Defaults to the model shipped
+        in the ``classifiers`` directory.
+
+    :param batch_size:
+        The number of (not-claimed, claimed) pairs scored at once.
+
     :return:
         A dictionary of manually clustered signatures, where the keys
         represent uuids of claimed signatures and values are the lists
@@ -94,28 +104,96 @@ def solve_claims_conflict(claimed_signatures, not_claimed_signatures):
     for claimed_signature in claimed_signatures:
         results[claimed_signature['signature_id']] = []
 
-    claimed_signatures_map = dict(enumerate(results.keys()))
+    for not_claimed_id, claimed_id in iter_claims_assignments(
+            claimed_signatures, not_claimed_signatures,
+            distance_model=distance_model, batch_size=batch_size):
+        results[claimed_id].append(not_claimed_id)
+
+    return results
+
+
+def iter_claims_assignments(claimed_signatures, not_claimed_signatures,
+                            distance_model=None, batch_size=10000):
+    """Assign not-claimed signatures to claimed ones, chunk by chunk.
 
-    # Load the linkage model.
-    distance_model = os.path.abspath(os.path.join(os.path.dirname(
-                                     __file__), 'classifiers/linkage.dat'))
-    distance_estimator = pickle.load(open(distance_model, 'rb'))
+    The grid of not-claimed times claimed signatures is scored in chunks
+    of at most ``batch_size`` pairs (but at least one row of the grid).
+    Not-claimed signatures are consumed lazily, thus only one chunk of
+    them is held in memory at a time.
 
-    try:
-        distance_estimator.steps[-1][1].set_params(n_jobs=1)
-    except:
-        pass
+    :param claimed_signatures:
+        A list of claimed signatures, as in ``solve_claims_conflict``.
+
+    :param not_claimed_signatures:
+        An iterable of not-claimed signatures, as in
+        ``solve_claims_conflict``.
+
+    :param distance_model:
+        Path to the pickled linkage model. Defaults to the model shipped
+        in the ``classifiers`` directory.
+
+    :param batch_size:
+        The number of (not-claimed, claimed) pairs scored at once.
+
+    :return:
+        A generator of pairs of the uuid of a not-claimed signature and
+        the uuid of the claimed signature it is assigned to, in the order
+        of ``not_claimed_signatures``.
+
+        Example:
+            ('fcf53cb9-2d19-433b-b735-f6c1de9a6d57',
+             'd63537a8-1df4-4436-b5ed-224da5b5028c')
+    """
+    if not claimed_signatures:
+        return
+
+    if distance_model is None:
+        distance_model = os.path.abspath(os.path.join(os.path.dirname(
+                                         __file__), 'classifiers/linkage.dat'))
+
+    affinity_engine = get_affinity_engine(distance_model)
+
+    # Claimed signatures are transformed only once.
+    claimed_features = affinity_engine.transform(
+        as_column(claimed_signatures))
+
+    n_claimed = len(claimed_signatures)
+    n_rows = max(1, batch_size // n_claimed)
+    chunk = []
 
     for not_claimed_signature in not_claimed_signatures:
-        X = np.empty((len(claimed_signatures), 2), dtype=np.object)
+        chunk.append(not_claimed_signature)
 
-        for claimed_index, claimed_signature in enumerate(claimed_signatures):
-            X[claimed_index] = \
-                not_claimed_signature, claimed_signature
+        if len(chunk) == n_rows:
+            for assignment in _assign_chunk(affinity_engine, chunk,
+                                            claimed_signatures,
+                                            claimed_features):
+                yield assignment
 
-        # Position of the claimed signature to represent the same author.
-        position = np.argmax(distance_estimator.predict_proba(X)[:, 0])
-        results[claimed_signatures_map[position]].append(
-            not_claimed_signature['signature_id'])
+            chunk = []
 
-    return results
+    if chunk:
+        for assignment in _assign_chunk(affinity_engine, chunk,
+                                        claimed_signatures, claimed_features):
+            yield assignment
+
+
+def _assign_chunk(affinity_engine, not_claimed_signatures,
+                  claimed_signatures, claimed_features):
+    """Score a chunk of the grid and take the row-wise argmax."""
+    n_rows = len(not_claimed_signatures)
+    n_claimed = len(claimed_signatures)
+
+    probabilities = affinity_engine.predict_proba(
+        affinity_engine.transform(as_column(not_claimed_signatures)),
+        np.repeat(np.arange(n_rows), n_claimed),
+        claimed_features,
+        np.tile(np.arange(n_claimed), n_rows))[:, 0]
+
+    # Position of the claimed signature to represent the same author.
+    positions = np.argmax(probabilities.reshape(n_rows, n_claimed), axis=1)
+
+    for not_claimed_signature, position in zip(not_claimed_signatures,
+                                               positions):
+        yield (not_claimed_signature['signature_id'],
+               claimed_signatures[position]['signature_id'])
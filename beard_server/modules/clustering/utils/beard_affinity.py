@@ -0,0 +1,546 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Pairwise affinity computed from per-signature features.
+
+The distance estimator built by ``_build_distance_estimator`` is a pipeline
+of a ``FeatureUnion`` and a classifier. Each transformer of the union first
+maps both signatures of a pair to a vector (getters, TF-IDF, ...) and then
+combines the two vectors into a similarity column (cosine, absolute
+difference, ...). Applied on an array of pairs, the per-signature part is
+recomputed for every chunk of pairs.
+
+``AffinityEngine`` splits the fitted union into these two parts. Every
+signature of a block is transformed exactly once and the similarity columns
+of the pairs are computed by indexing the transformed matrices. Only the
+final classifier, compiled into flat arrays when possible, sees the matrix
+of pairs.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import hashlib
+import json
+
+from collections import Mapping
+
+import numpy as np
+import scipy.sparse as sp
+
+from beard.similarity import CosineSimilarity
+from beard.similarity import PairTransformer
+from beard.utils import FuncTransformer
+from sklearn.pipeline import Pipeline
+
+from beard_server import config
+from beard_server.cache import LRUCache
+from beard_server.registry import registry
+
+from .beard_columns import store_of
+from .beard_columns import view_indices
+
+
+def _stack(Xa, Xb):
+    """Put the rows of two element matrices side by side."""
+    if sp.issparse(Xa):
+        return sp.hstack((Xa, Xb)).tocsr()
+
+    return np.hstack((Xa, Xb))
+
+
+def _row_sum(X):
+    """Sum the rows of a dense or sparse matrix into a flat array."""
+    return np.asarray(X.sum(axis=1)).ravel()
+
+
+def _plain(value):
+    """Serialize views of a ``SignatureStore`` as their content."""
+    if isinstance(value, Mapping):
+        return dict(value)
+
+    return repr(value)
+
+
+def record_key(record):
+    """Compute a hash of the content of a record.
+
+    Keys are not sorted, which lets ``json`` use its C encoder; the same
+    content built in another order only gives a cache miss.
+    """
+    content = json.dumps(record, default=_plain)
+
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+
+def signature_key(signature, record_keys=None):
+    """Compute a hash of the fields of a signature read by the getters.
+
+    The hash covers the id, author name and affiliation of the signature
+    and the content of its publication, thus any change of the data used
+    by the getters gives a different key.
+
+    :param signature:
+        A signature, with its publication.
+
+    :param record_keys:
+        An optional dict of the keys of the records by publication id,
+        filled on the fly, so that the records shared by several
+        signatures are hashed once.
+
+    :return:
+        The hexadecimal digest of the signature.
+    """
+    publication_id = signature.get('publication_id')
+
+    if record_keys is None or publication_id is None:
+        digest = record_key(signature.get('publication'))
+    elif publication_id in record_keys:
+        digest = record_keys[publication_id]
+    else:
+        digest = record_keys[publication_id] = record_key(
+            signature.get('publication'))
+
+    content = json.dumps([signature.get('signature_id'),
+                          signature.get('author_name'),
+                          signature.get('author_affiliation'),
+                          publication_id, digest], default=_plain)
+
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+
+def _split_rows(transformed):
+    """Split the output of ``_Feature.transform`` into one row per sample.
+
+    Sparse rows are kept as ``(data, indices, n_columns)`` tuples.
+    """
+    Xt, norms = transformed
+
+    if sp.issparse(Xt):
+        rows = [(Xt.data[start:end].copy(), Xt.indices[start:end].copy(),
+                 Xt.shape[1])
+                for start, end in zip(Xt.indptr[:-1], Xt.indptr[1:])]
+    else:
+        rows = [row.copy() for row in Xt]
+
+    if norms is None:
+        return [(row, None) for row in rows]
+
+    return list(zip(rows, norms))
+
+
+def _join_rows(rows):
+    """Build the output of ``_Feature.transform`` from rows of samples."""
+    first, norm = rows[0]
+
+    if isinstance(first, tuple):
+        lengths = [len(data) for (data, _, _), _ in rows]
+        Xt = sp.csr_matrix(
+            (np.concatenate([data for (data, _, _), _ in rows]),
+             np.concatenate([indices for (_, indices, _), _ in rows]),
+             np.concatenate(([0], np.cumsum(lengths)))),
+            shape=(len(rows), first[2]))
+    else:
+        Xt = np.array([row for row, _ in rows])
+
+    if norm is None:
+        return Xt, None
+
+    return Xt, np.array([norm for _, norm in rows])
+
+
+def _sizeof_rows(rows):
+    """Estimate the memory used by the cached rows of a signature."""
+    size = 0
+
+    for row, _ in rows:
+        if isinstance(row, tuple):
+            size += row[0].nbytes + row[1].nbytes
+        else:
+            size += row.nbytes
+
+        size += 8
+
+    return size
+
+
+def _transform_elements(transformer, X):
+    """Apply an element transformer on signatures.
+
+    On views of a ``SignatureStore``, the getter of the leading
+    ``FuncTransformer`` is evaluated in bulk by the store, which gives the
+    same values as ``FuncTransformer.transform``.
+    """
+    store = store_of(X)
+
+    if isinstance(transformer, Pipeline):
+        steps = [step for _, step in transformer.steps]
+    else:
+        steps = [transformer]
+
+    if store is None or not isinstance(steps[0], FuncTransformer):
+        return transformer.transform(X)
+
+    head = steps[0]
+    dtype = head.dtype if head.dtype is not None else X.dtype
+    Xt = store.bulk(head.func, view_indices(X), dtype=dtype).reshape(X.shape)
+
+    for step in steps[1:]:
+        Xt = step.transform(Xt)
+
+    return Xt
+
+
+class _Feature(object):
+    """One transformer of the fitted ``FeatureUnion``.
+
+    The first step of the transformer pipeline is applied on individual
+    signatures, the remaining steps on the pairs of transformed signatures.
+    """
+
+    def __init__(self, name, transformer, weight=None):
+        self.name = name
+        self.weight = weight
+
+        steps = [step for _, step in transformer.steps]
+        head = steps[0]
+
+        if isinstance(head, PairTransformer):
+            self.element_transformer = head.element_transformer
+        else:
+            # Element-wise transformers, e.g. ``FuncTransformer(get_year)``,
+            # are applied on both columns of the pairs at once.
+            self.element_transformer = head
+
+        self.combiners = steps[1:]
+        self.cosine = (len(self.combiners) == 1 and
+                       isinstance(self.combiners[0], CosineSimilarity))
+
+    def transform(self, X):
+        """Transform the signatures of a block.
+
+        :param X:
+            An array of shape (n_signatures, 1) of signatures.
+
+        :return:
+            A tuple of the transformed signatures and their squared norms
+            (``None`` if the similarity is not a cosine).
+        """
+        Xt = _transform_elements(self.element_transformer, X)
+
+        if sp.issparse(Xt):
+            Xt = Xt.tocsr()
+
+        norms = None
+
+        if self.cosine:
+            if sp.issparse(Xt):
+                norms = _row_sum(Xt.multiply(Xt))
+            else:
+                norms = (Xt * Xt).sum(axis=1)
+
+        return Xt, norms
+
+    def combine(self, transformed_a, i, transformed_b, j):
+        """Compute the column of this feature for pairs ``(a[i], b[j])``."""
+        Xa, norms_a = transformed_a
+        Xb, norms_b = transformed_b
+
+        if self.cosine:
+            # Same arithmetic as ``CosineSimilarity``, with the norms
+            # computed once per signature.
+            Xi = Xa[i]
+            Xj = Xb[j]
+
+            if sp.issparse(Xi):
+                numerator = _row_sum(Xi.multiply(Xj))
+            else:
+                numerator = (Xi * Xj).sum(axis=1)
+
+            denominator = (norms_a[i] ** 0.5) * (norms_b[j] ** 0.5)
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                Xt = numerator / denominator
+                Xt[denominator == 0.0] = 0.0
+
+            Xt = Xt.reshape((len(i), 1))
+
+        else:
+            Xt = _stack(Xa[i], Xb[j])
+
+            for combiner in self.combiners:
+                Xt = combiner.transform(Xt)
+
+        if self.weight is not None:
+            Xt = Xt * self.weight
+
+        return Xt
+
+
+class SignatureFeatures(object):
+    """Transformed signatures of a block, one matrix per feature."""
+
+    def __init__(self, transformed):
+        self.transformed = transformed
+
+    def __len__(self):
+        """Return the number of signatures."""
+        return self.transformed[0][0].shape[0] if self.transformed else 0
+
+
+class AffinityEngine(object):
+    """Score pairs of signatures with a fitted distance estimator.
+
+    :param distance_estimator:
+        A fitted pipeline of a ``FeatureUnion`` of paired transformers
+        and a probabilistic classifier, as built by
+        ``_build_distance_estimator``.
+
+    :param cache:
+        An optional ``LRUCache`` of transformed signatures, which may be
+        shared by several engines.
+
+    :param model_version:
+        A version of the distance estimator, e.g. the digest of its pickle.
+        It is part of the cache keys, thus it must be set with ``cache``.
+    """
+
+    def __init__(self, distance_estimator, cache=None, model_version=None):
+        """Split the estimator into per-signature and per-pair parts."""
+        union = distance_estimator.steps[0][1]
+        weights = union.transformer_weights or {}
+
+        if cache is not None and model_version is None:
+            raise ValueError("A model version is required to use a cache.")
+
+        self.cache = cache
+        self.model_version = model_version
+        self.distance_estimator = distance_estimator
+        self.classifier = distance_estimator.steps[-1][1]
+
+        self.features = [_Feature(name, transformer, weights.get(name))
+                         for name, transformer in union.transformer_list
+                         if transformer is not None]
+
+    def transform(self, X):
+        """Transform each signature exactly once.
+
+        :param X:
+            An array of shape (n_signatures, 1) of signatures.
+
+        :return:
+            ``SignatureFeatures`` to pass to ``pair_matrix``.
+        """
+        if self.cache is None or len(X) == 0:
+            return SignatureFeatures([feature.transform(X)
+                                      for feature in self.features])
+
+        record_keys = {}
+        keys = [(self.model_version, signature_key(signature, record_keys))
+                for signature in X[:, 0]]
+        rows = [self.cache.get(key) for key in keys]
+        missing = [index for index, row in enumerate(rows) if row is None]
+
+        if missing:
+            # Only the signatures not yet cached are transformed.
+            computed = zip(*[_split_rows(feature.transform(X[missing]))
+                             for feature in self.features])
+
+            for index, signature_rows in zip(missing, computed):
+                rows[index] = signature_rows
+                self.cache.put(keys[index], signature_rows)
+
+        return SignatureFeatures([_join_rows([signature_rows[position]
+                                              for signature_rows in rows])
+                                  for position in range(len(self.features))])
+
+    def duplicates(self, X):
+        """Group the signatures which are identical for the distance model.
+
+        Signatures are identical if all their transformed features are
+        equal, thus any pair of them gives the same pair matrix.
+
+        :param X:
+            An array of shape (n_signatures, 1) of signatures.
+
+        :return:
+            An array of group indices, numbered in order of appearance.
+        """
+        features = self.transform(X)
+        keys = [[] for _ in range(len(X))]
+
+        for Xt, _ in features.transformed:
+            if sp.issparse(Xt):
+                for key, start, end in zip(keys, Xt.indptr[:-1],
+                                           Xt.indptr[1:]):
+                    key.append(Xt.indices[start:end].tobytes())
+                    key.append(Xt.data[start:end].tobytes())
+            else:
+                for key, row in zip(keys, Xt.tolist()):
+                    key.append(tuple(row))
+
+        groups = {}
+
+        return np.array([groups.setdefault(tuple(key), len(groups))
+                         for key in keys], dtype=np.int64)
+
+    def pair_matrix(self, features_a, i, features_b, j):
+        """Build the classifier input for the pairs ``(a[i], b[j])``.
+
+        :param features_a:
+            ``SignatureFeatures`` of the left signatures.
+
+        :param i:
+            An array of indices into ``features_a``.
+
+        :param features_b:
+            ``SignatureFeatures`` of the right signatures.
+
+        :param j:
+            An array of indices into ``features_b``, of the same length
+            as ``i``.
+
+        :return:
+            A matrix of shape (len(i), n_features), exactly as returned by
+            the ``FeatureUnion`` of the distance estimator.
+        """
+        columns = [
+            feature.combine(transformed_a, i, transformed_b, j)
+            for feature, transformed_a, transformed_b in zip(
+                self.features, features_a.transformed,
+                features_b.transformed)
+        ]
+
+        if any(sp.issparse(column) for column in columns):
+            return sp.hstack(columns).tocsr()
+
+        return np.hstack(columns)
+
+    def predict_proba(self, features_a, i, features_b, j):
+        """Return the classifier probabilities for the pairs."""
+        return self.classifier.predict_proba(
+            self.pair_matrix(features_a, i, features_b, j))
+
+    def distances(self, X, step=10000, cascade=None):
+        """Compute the condensed distance matrix of a block of signatures.
+
+        :param X:
+            An array of shape (n_signatures, 1) of signatures.
+
+        :param step:
+            The number of pairs to score at once.
+
+        :param cascade:
+            An optional ``Cascade`` giving a fixed distance to the pairs it
+            prunes, which are then not scored.
+
+        :return:
+            An array of n_signatures * (n_signatures - 1) / 2 distances,
+            ordered as ``np.triu_indices(n_signatures, k=1)``.
+        """
+        all_i, all_j = np.triu_indices(len(X), k=1)
+
+        return self.pair_distances(X, all_i, all_j, step=step,
+                                   cascade=cascade)
+
+    def pair_distances(self, X, i, j, step=10000, cascade=None):
+        """Compute the distances of the given pairs of a block.
+
+        :param X:
+            An array of shape (n_signatures, 1) of signatures.
+
+        :param i:
+            An array of indices of the left signatures.
+
+        :param j:
+            An array of indices of the right signatures.
+
+        :param step:
+            The number of pairs to score at once.
+
+        :param cascade:
+            An optional ``Cascade``, as in ``distances``.
+
+        :return:
+            An array of ``len(i)`` distances.
+        """
+        features = self.transform(X)
+        cheap_features = cascade.features(X) if cascade is not None else None
+
+        n_pairs = len(i)
+        distances = np.zeros(n_pairs, dtype=np.float64)
+
+        for start in range(0, n_pairs, step):
+            end = min(n_pairs, start + step)
+            chunk_i = i[start:end]
+            chunk_j = j[start:end]
+
+            if cascade is None:
+                distances[start:end] = self.predict_proba(
+                    features, chunk_i, features, chunk_j)[:, 1]
+                continue
+
+            pruned = cascade.prune(cheap_features, chunk_i, chunk_j)
+            scored = ~pruned
+            chunk = distances[start:end]
+            chunk[pruned] = cascade.distance
+
+            if scored.any():
+                chunk[scored] = self.predict_proba(
+                    features, chunk_i[scored], features,
+                    chunk_j[scored])[:, 1]
+
+        return distances
+
+
+# Transformed signatures shared by the affinity engines of the process.
+feature_cache = LRUCache(config.BEARD_SERVER_FEATURE_CACHE_SIZE,
+                         sizeof=_sizeof_rows)
+
+
+def _build_affinity_engine(distance_estimator, model_version):
+    """Build the affinity engine of a distance model loaded by the registry."""
+    try:
+        distance_estimator.steps[-1][1].set_params(n_jobs=1)
+    except:
+        pass
+
+    cache = feature_cache if feature_cache.max_size > 0 else None
+
+    return AffinityEngine(distance_estimator, cache=cache,
+                          model_version=model_version)
+
+
+def get_affinity_engine(distance_model):
+    """Return the affinity engine of a pickled distance model.
+
+    The engine is built once per version of the model and shares the
+    process-wide ``feature_cache``. Its ``model_version`` is the content
+    hash of the model.
+
+    :param distance_model:
+        Path to the pickled distance model.
+    """
+    return registry.derived(distance_model, "affinity_engine",
+                            _build_affinity_engine)
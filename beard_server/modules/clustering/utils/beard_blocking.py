@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Block clustering on a pool of forked processes.
+
+``BlockClustering`` of Beard sends every block, with its signatures, to
+the worker processes through queues. ``ParallelBlockClustering`` hands the
+data of all the blocks to the pool it forks, as the argument of the worker
+initializer. The workers inherit it, as well as the distance model loaded
+by the parent, through copy-on-write pages. Only block keys are sent to the
+workers and only the fitted clusterers are sent back.
+
+The pool is the one of ``billiard``, the fork of ``multiprocessing`` used
+by Celery, which lets daemonic processes such as the Celery prefork
+workers have children. Blocks are thus fitted in parallel by the Celery
+workers when ``BEARD_SERVER_CLUSTERING_JOBS`` is above 1.
+
+The data of a fit and the block being fitted are kept per thread, thus
+several threads may fit blocks at the same time. The pool is however not
+forked from a process running other threads, since the child processes
+would inherit the locks held by these threads: the jobs of the web
+application, which run on threads, fit their blocks sequentially.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import billiard
+import logging
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from beard.clustering import BlockClustering
+from beard.clustering.blocking import _single_fit
+
+logger = logging.getLogger(__name__)
+
+# Data of the blocks being fitted by this thread or worker process.
+_shared = threading.local()
+
+
+def _n_workers(n_jobs):
+    """Translate ``n_jobs`` into a number of processes, as joblib does."""
+    if n_jobs < 0:
+        return max(1, multiprocessing.cpu_count() + 1 + n_jobs)
+
+    return max(1, n_jobs)
+
+
+def _block_order(blocks):
+    """Group sample indices by block, the largest blocks first.
+
+    :return:
+        A tuple of the block keys and, for each key, the indices of its
+        samples.
+    """
+    keys, inverse, counts = np.unique(blocks, return_inverse=True,
+                                      return_counts=True)
+    members = np.argsort(inverse, kind='mergesort')
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    # Stable sort, so that blocks of equal size keep the order of their keys.
+    order = np.argsort(-counts, kind='mergesort')
+
+    return ([keys[k] for k in order],
+            [members[bounds[k]:bounds[k + 1]] for k in order])
+
+
+def _init_worker(data):
+    """Keep the data of the blocks in a forked worker process."""
+    _shared.data = data
+
+
+def current_block():
+    """Return the key of the block being fitted by this thread, if any."""
+    return getattr(_shared, 'block', None)
+
+
+def add_block_stat(name, value):
+    """Add to a statistic of the block being fitted, e.g. 'affinity_time'.
+
+    Statistics are returned with the fitted clusterer, thus also the ones
+    of blocks fitted in a worker process reach the parent.
+    """
+    stats = getattr(_shared, 'block_stats', None)
+
+    if stats is not None:
+        stats[name] = stats.get(name, 0) + value
+
+
+def _fit_block(task):
+    """Fit the clusterer of one block in a worker process.
+
+    :return:
+        The key of the block, its fitted clusterer and a dictionary of
+        its size, number of pairs and times.
+    """
+    start = time.time()
+    position, existing_clusterer = task
+    data = _shared.data
+    b = _shared.block = data['keys'][position]
+    indices = data['indices'][position]
+    stats = _shared.block_stats = {'size': len(indices)}
+
+    X = data['X'][indices, :]
+    y = data['y']
+
+    if y is not None:
+        y = y[indices]
+
+    if data['affinity'] == 'precomputed':
+        X = X[:, indices]
+
+    b, clusterer = _single_fit(data['fit'], data['partial_fit'],
+                               data['base_estimator'], data['verbose'],
+                               ((b, X, y), existing_clusterer))
+
+    # Sparse linkages only score some of the pairs.
+    stats['pairs'] = getattr(clusterer, 'n_pairs_',
+                             len(indices) * (len(indices) - 1) // 2)
+    stats['time'] = time.time() - start
+
+    return b, clusterer, stats
+
+
+class ParallelBlockClustering(BlockClustering):
+    """``BlockClustering`` fitting the blocks on a pool of forked processes.
+
+    Blocks are scheduled from the largest to the smallest one, so that a
+    large block is not left alone at the end of the run. With ``n_jobs=1``
+    or while other threads are running (e.g. the jobs of the web
+    application), the blocks are fitted sequentially.
+
+    After fitting, ``block_stats_`` holds, for every block key, the number
+    of signatures and of pairs of the block, the time spent on it and the
+    statistics added with ``add_block_stat``.
+    """
+
+    def _fit(self, X, y, blocks):
+        """Fit base clustering estimators on X."""
+        n_workers = _n_workers(self.n_jobs)
+
+        if n_workers > 1 and threading.active_count() > 1:
+            logger.warning("Running in a multithreaded process, blocks are "
+                           "clustered sequentially.")
+            n_workers = 1
+
+        keys, indices = _block_order(blocks)
+        n_workers = min(n_workers, len(keys))
+
+        self.blocks_ = blocks
+        self.block_stats_ = {}
+
+        tasks = []
+        for position, b in enumerate(keys):
+            existing_clusterer = None
+
+            if self.partial_fit_:
+                existing_clusterer = self.clusterers_.get(b)
+
+            tasks.append((position, existing_clusterer))
+
+        data = dict(X=X, y=y, keys=keys, indices=indices,
+                    affinity=self.affinity, fit=self.fit_,
+                    partial_fit=self.partial_fit_,
+                    base_estimator=self.base_estimator,
+                    verbose=self.verbose)
+
+        try:
+            if n_workers <= 1:
+                _shared.data = data
+                self._collect(map(_fit_block, tasks))
+            else:
+                # The workers inherit the data when forked, unpickled.
+                pool = billiard.Pool(n_workers, _init_worker, (data,))
+
+                try:
+                    # Workers of ``imap_unordered`` wait for a count of
+                    # consumed results, which billiard only keeps for
+                    # ``apply_async``, before they exit.
+                    results = [pool.apply_async(_fit_block, (task,))
+                               for task in tasks]
+                    self._collect(result.get() for result in results)
+                    pool.close()
+                except BaseException:
+                    pool.terminate()
+                    raise
+                finally:
+                    pool.join()
+        finally:
+            _shared.__dict__.clear()
+
+        return self
+
+    def _collect(self, results):
+        """Store the fitted clusterers and the statistics of the blocks."""
+        for b, clusterer, stats in results:
+            if clusterer:
+                self.clusterers_[b] = clusterer
+
+            self.block_stats_[b] = stats
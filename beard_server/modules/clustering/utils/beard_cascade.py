@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Cheap rules for the pairs of signatures which are obviously different.
+
+Within a phonetic block, most pairs have incompatible initials and no
+coauthor in common. The distance model scores them as different with near
+certainty, after evaluating all its trees. ``Cascade`` recognizes these
+pairs from a few per-signature features compared with NumPy, so that only
+the remaining pairs go through the distance model.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+import scipy.sparse as sp
+
+from .beard_blocking import add_block_stat
+from .beard_utils import get_first_initial
+from .beard_utils import get_second_initial
+from .beard_utils import get_year
+
+
+def _codes(values):
+    """Encode strings as integers, the empty string as -1."""
+    values = np.array(values, dtype=object)
+    codes = np.unique(values.astype(np.unicode_), return_inverse=True)[1]
+
+    return np.where(values == "", -1, codes)
+
+
+def _coauthor_matrix(X, collaborations=False):
+    """Build the binary matrix of the coauthors of the signatures.
+
+    If ``collaborations`` is True, the collaborations of the publications
+    are added as coauthors.
+    """
+    vocabulary = {}
+    rows = []
+    columns = []
+
+    for row, signature in enumerate(X[:, 0]):
+        author_name = signature["author_name"]
+        publication = signature["publication"]
+        coauthors = set(publication["authors"])
+
+        if collaborations:
+            coauthors.update(("collaboration", collaboration) for
+                             collaboration in
+                             publication.get("collaborations", []))
+
+        for coauthor in coauthors:
+            if coauthor != author_name:
+                rows.append(row)
+                columns.append(vocabulary.setdefault(coauthor,
+                                                     len(vocabulary)))
+
+    return sp.csr_matrix((np.ones(len(rows), dtype=np.int32),
+                          (rows, columns)),
+                         shape=(len(X), max(1, len(vocabulary))))
+
+
+class CheapFeatures(object):
+    """Per-signature features of a block used by ``Cascade``."""
+
+    def __init__(self, X):
+        """Extract the features of the signatures.
+
+        :param X:
+            An array of shape (n_signatures, 1) of signatures.
+        """
+        self.first_initials = _codes([get_first_initial(s) for s in X[:, 0]])
+        self.second_initials = _codes([get_second_initial(s)
+                                       for s in X[:, 0]])
+        self.years = np.array([get_year(s) for s in X[:, 0]],
+                              dtype=np.int64)
+        self.coauthors = _coauthor_matrix(X)
+
+
+class Cascade(object):
+    """Decide which pairs are different without the distance model.
+
+    A pair is pruned if the initials of its authors are incompatible, i.e.
+    both first initials or both second initials are known and differ, if
+    the two signatures have no coauthor in common and, optionally, if
+    their publications are far apart in time.
+
+    :param distance:
+        The distance given to the pruned pairs.
+
+    :param min_year_gap:
+        If not None, only pairs whose publication years are both known and
+        at least that many years apart are pruned.
+    """
+
+    def __init__(self, distance=1.0, min_year_gap=None):
+        """Initialize the rules and the counters."""
+        self.distance = distance
+        self.min_year_gap = min_year_gap
+        self.n_pairs = 0
+        self.n_pruned = 0
+
+    def features(self, X):
+        """Return the ``CheapFeatures`` of a block of signatures."""
+        return CheapFeatures(X)
+
+    def prune(self, features, i, j):
+        """Find the pairs ``(i, j)`` which are confidently different.
+
+        :param features:
+            ``CheapFeatures`` of the block.
+
+        :param i:
+            An array of indices of the left signatures.
+
+        :param j:
+            An array of indices of the right signatures.
+
+        :return:
+            A boolean mask over the pairs.
+        """
+        first_i = features.first_initials[i]
+        first_j = features.first_initials[j]
+        second_i = features.second_initials[i]
+        second_j = features.second_initials[j]
+
+        pruned = (((first_i >= 0) & (first_j >= 0) & (first_i != first_j)) |
+                  ((second_i >= 0) & (second_j >= 0) &
+                   (second_i != second_j)))
+
+        if self.min_year_gap is not None:
+            years_i = features.years[i]
+            years_j = features.years[j]
+            pruned &= ((years_i >= 0) & (years_j >= 0) &
+                       (np.abs(years_i - years_j) >= self.min_year_gap))
+
+        if pruned.any():
+            candidates = np.flatnonzero(pruned)
+            coauthors = features.coauthors
+            shared = np.asarray(coauthors[i[candidates]].multiply(
+                coauthors[j[candidates]]).sum(axis=1)).ravel()
+            pruned[candidates[shared > 0]] = False
+
+        n_pruned = int(pruned.sum())
+        self.n_pairs += len(i)
+        self.n_pruned += n_pruned
+        add_block_stat('cascade_pairs', len(i))
+        add_block_stat('cascade_pruned', n_pruned)
+
+        return pruned
+
+    def stats(self):
+        """Return the number and the fraction of the pruned pairs.
+
+        Example:
+            {'pairs': 1000, 'pruned': 870, 'pruned_fraction': 0.87}
+        """
+        return {
+            'pairs': self.n_pairs,
+            'pruned': self.n_pruned,
+            'pruned_fraction': (self.n_pruned / self.n_pairs
+                                if self.n_pairs else 0.0),
+        }
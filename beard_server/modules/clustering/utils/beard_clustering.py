@@ -16,11 +16,14 @@ See README.rst for further details.
 
 """
 
-import pickle
 import json
+import logging
 import numpy as np
+import threading
+import time
 
 from functools import partial
+from functools import wraps
 
 from sklearn.cross_validation import train_test_split
 
@@ -43,48 +46,124 @@ from .beard_utils import get_references
 from .beard_utils import get_topics
 from .beard_utils import get_year
 from .beard_utils import group_by_signature
+from .beard_utils import as_column
 from .beard_utils import load_signatures
 
-from beard.clustering import BlockClustering
 from beard.clustering import block_last_name_first_initial
-from beard.clustering import block_phonetic
 from beard.clustering import ScipyHierarchicalClustering
 from beard.metrics import b3_f_score
 from beard.metrics import b3_precision_recall_fscore
 from beard.metrics import paired_precision_recall_fscore
 
+from beard_server import instrumentation
+from beard_server.registry import registry
+
+from .beard_affinity import feature_cache
+from .beard_affinity import get_affinity_engine
+from .beard_blocking import ParallelBlockClustering
+from .beard_blocking import add_block_stat
+from .beard_blocking import current_block
+from .beard_columns import SignatureStore
+from .beard_dedupe import DeduplicatedLinkage
+from .beard_names import block_phonetic
+from .beard_names import name_cache
+from .beard_sparse import SparseAverageLinkage
+from .beard_subblocking import block_size_aware
+from .beard_subblocking import link_subblocks
+from .beard_subblocking import log_block_sizes
+
+logger = logging.getLogger(__name__)
+
+# Held while the globals read by the affinity functions are in use, as
+# they are shared by all the threads of the process.
+_affinity_lock = threading.Lock()
+
 
 def _affinity(X, step=10000):
     """Custom affinity function, using a pre-learned distance estimator."""
-    # Assumes that 'distance_estimator' lives in global, making things fast
-    global distance_estimator
+    # Assumes that 'affinity_engine' lives in global, making things fast
+    global affinity_engine
+    global affinity_cascade
+    global affinity_version
+    global distance_store
+
+    block = current_block()
+    start = time.time()
+
+    if distance_store is None or block is None:
+        distances = affinity_engine.distances(X, step=step,
+                                              cascade=affinity_cascade)
+    else:
+        distances = distance_store.distances(
+            "%s/%s" % (affinity_version, block), X,
+            lambda i, j: affinity_engine.pair_distances(
+                X, i, j, step=step, cascade=affinity_cascade))
+
+    add_block_stat('affinity_time', time.time() - start)
 
-    all_i, all_j = np.triu_indices(len(X), k=1)
-    n_pairs = len(all_i)
-    distances = np.zeros(n_pairs, dtype=np.float64)
+    return distances
 
-    for start in range(0, n_pairs, step):
-        end = min(n_pairs, start+step)
-        Xt = np.empty((end-start, 2), dtype=np.object)
 
-        for k, (i, j) in enumerate(zip(all_i[start:end],
-                                       all_j[start:end])):
-            Xt[k, 0], Xt[k, 1] = X[i, 0], X[j, 0]
+def _pair_affinity(X, i, j, step=10000):
+    """Custom affinity function of the given pairs of signatures."""
+    # Assumes that 'affinity_engine' lives in global, making things fast
+    global affinity_engine
+    global affinity_cascade
 
-        Xt = distance_estimator.predict_proba(Xt)[:, 1]
-        distances[start:end] = Xt[:]
+    start = time.time()
+    distances = affinity_engine.pair_distances(X, i, j, step=step,
+                                               cascade=affinity_cascade)
+    add_block_stat('affinity_time', time.time() - start)
 
     return distances
 
 
+def _duplicates(X):
+    """Group the signatures which are identical for the distance model."""
+    # Assumes that 'affinity_engine' lives in global, making things fast
+    global affinity_engine
+
+    return affinity_engine.duplicates(X)
+
+
+def _given_blocks(X, blocks):
+    """Look the blocks of the signatures up by their identifiers."""
+    return np.array([blocks[signature['signature_id']]
+                     for signature in X[:, 0]])
+
+
+def _timed_blocking(X, blocking):
+    """Apply the blocking function as a stage of the run."""
+    with instrumentation.stage('blocking'):
+        return blocking(X)
+
+
+def _serialized(func):
+    """Run the function in one thread of the process at a time."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with _affinity_lock:
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@_serialized
 def clustering(input_signatures, input_records, distance_model,
                input_clusters=None, verbose=1, n_jobs=-1,
                clustering_method="average", train_signatures_file=None,
                clustering_threshold=None, results_file=None,
                blocking_function="block_phonetic",
-               blocking_threshold=1, blocking_phonetic_alg="nysiis"):
+               blocking_threshold=1, blocking_phonetic_alg="nysiis",
+               clustering_mode="full", sparse_block_size=2000,
+               cascade=None, max_block_size=None, store=None,
+               deduplicate=False, blocks=None, columnar=False):
     """Cluster signatures using a pretrained distance model.
 
+    The model, the cascade and the distance store of the run are kept in
+    globals for the affinity functions, thus concurrent calls from several
+    threads of a process are run one after the other.
+
     Parameters
     ----------
     :param input_signatures: string
@@ -118,7 +197,8 @@ def clustering(input_signatures, input_records, distance_model,
         If not zero, function will output scores on stdout.
 
     :param n_jobs: int
-        Parameter passed to joblib. Number of threads to be used.
+        Number of processes used to cluster the blocks. Negative values
+        are interpreted as in joblib, -1 meaning all the cores.
 
     :param clustering_method: string
         Parameter passed to ``ScipyHierarchicalClustering``. Used only if
@@ -153,33 +233,103 @@ def clustering(input_signatures, input_records, distance_model,
         -  "double_metaphone"
         -  "nysiis" (only for Python 2)
         -  "soundex" (only for Python 2)
+
+    :param clustering_mode: string
+        How the blocks are clustered. Options:
+        -  "full": average linkage on all the pairs of a block
+        -  "sparse": blocks larger than ``sparse_block_size`` are clustered
+           with average linkage on the pairs sharing the name, a coauthor
+           or an affiliation only. It requires ``clustering_threshold``.
+
+    :param sparse_block_size: int
+        In the "sparse" mode, the size of the largest block still clustered
+        on all its pairs.
+
+    :param cascade: Cascade or None
+        If given, the pairs it prunes get a fixed distance instead of being
+        scored by the distance model. Its counters hold the number of pruned
+        pairs of the blocks clustered in this process.
+
+    :param max_block_size: int or None
+        If not None, blocks larger than this size are split by first
+        initial, given names and coauthors. Clusters of the sub-blocks of
+        a block are then linked if they are closer than
+        ``clustering_threshold``.
+
+    :param store: DistanceStore or None
+        If given, the distance matrices of the blocks are kept in the
+        store and only the distances of new or changed signatures are
+        computed when a block is clustered again.
+
+    :param deduplicate: bool
+        If True, in the "full" mode, signatures identical for the distance
+        model are clustered as a single weighted representative.
+
+    :param blocks: dict or None
+        If given, the block of each signature id, e.g. computed on a larger
+        payload, instead of blocking the signatures with
+        ``blocking_function``.
+
+    :param columnar: bool
+        If True, the signatures and records are kept in a
+        ``SignatureStore`` instead of dictionaries. It uses less memory
+        and evaluates the getters once per distinct value, but takes
+        longer to load.
     """
-    # Assumes that 'distance_estimator' lives in global, making things fast
-    global distance_estimator
-    distance_estimator = pickle.load(open(distance_model, "rb"))
-
-    try:
-        distance_estimator.steps[-1][1].set_params(n_jobs=1)
-    except:
-        pass
-
-    signatures, records = load_signatures(input_signatures,
-                                          input_records)
-
-    indices = {}
-    X = np.empty((len(signatures), 1), dtype=np.object)
-    for i, signature in enumerate(sorted(signatures.values(),
-                                         key=lambda s: s["signature_id"])):
-        X[i, 0] = signature
-        indices[signature["signature_id"]] = i
-
-    if blocking_function == "block_last_name_first_initial":
+    if clustering_mode not in ("full", "sparse"):
+        raise ValueError("Unknown clustering mode: %s" % clustering_mode)
+
+    if clustering_mode == "sparse" and clustering_threshold is None:
+        raise ValueError("The sparse clustering mode requires a threshold.")
+
+    # Assumes that 'affinity_engine' lives in global, making things fast
+    global affinity_engine
+    global affinity_cascade
+    global affinity_version
+    global distance_store
+    cached_before = feature_cache.stats()
+
+    with instrumentation.stage('load_model'):
+        affinity_engine = get_affinity_engine(distance_model)
+        affinity_version = affinity_engine.model_version
+
+    affinity_cascade = cascade
+    distance_store = store
+
+    if cascade is not None:
+        # Pruned pairs have other distances than scored ones.
+        affinity_version += ":cascade:%r:%r" % (cascade.distance,
+                                                cascade.min_year_gap)
+
+    with instrumentation.stage('load_signatures'):
+        if columnar:
+            signatures = SignatureStore(input_signatures, input_records)
+            signature_ids = signatures.signature_ids
+            X = signatures.array()
+        else:
+            signatures, _ = load_signatures(input_signatures, input_records)
+            signature_ids = sorted(signatures)
+            X = as_column([signatures[signature_id]
+                           for signature_id in signature_ids])
+
+    indices = dict((signature_id, i) for i, signature_id in
+                   enumerate(signature_ids))
+
+    if blocks is not None:
+        block_function = partial(_given_blocks, blocks=blocks)
+    elif blocking_function == "block_last_name_first_initial":
         block_function = block_last_name_first_initial
     else:
         block_function = partial(block_phonetic,
                                  threshold=blocking_threshold,
                                  phonetic_algorithm=blocking_phonetic_alg)
 
+    if max_block_size is not None:
+        block_function = partial(block_size_aware, blocking=block_function,
+                                 max_block_size=max_block_size)
+
+    block_function = partial(_timed_blocking, blocking=block_function)
+
     # Semi-supervised block clustering
     if input_clusters:
         y_true = -np.ones(len(X), dtype=np.int)
@@ -201,17 +351,75 @@ def clustering(input_signatures, input_records, distance_model,
     else:
         y = None
 
-    clusterer = BlockClustering(
-        blocking=block_function,
-        base_estimator=ScipyHierarchicalClustering(
-            affinity=_affinity,
+    base_estimator = ScipyHierarchicalClustering(
+        affinity=_affinity,
+        threshold=clustering_threshold,
+        method=clustering_method,
+        supervised_scoring=b3_f_score)
+
+    if deduplicate and clustering_mode == "full":
+        base_estimator = DeduplicatedLinkage(
+            base_estimator=base_estimator,
+            duplicates=_duplicates,
+            affinity=_pair_affinity,
+            threshold=clustering_threshold)
+
+    if clustering_mode == "sparse":
+        base_estimator = SparseAverageLinkage(
+            affinity=_pair_affinity,
             threshold=clustering_threshold,
-            method=clustering_method,
-            supervised_scoring=b3_f_score),
-        verbose=verbose,
-        n_jobs=n_jobs).fit(X, y)
+            dense_estimator=base_estimator,
+            max_dense_size=sparse_block_size)
+
+    if cascade is not None:
+        n_pairs, n_pruned = cascade.n_pairs, cascade.n_pruned
+
+    with instrumentation.stage('block_clustering'):
+        clusterer = ParallelBlockClustering(
+            blocking=block_function,
+            base_estimator=base_estimator,
+            verbose=verbose,
+            n_jobs=n_jobs).fit(X, y)
 
     labels = clusterer.labels_
+    log_block_sizes(clusterer.blocks_)
+
+    for block, stats in clusterer.block_stats_.items():
+        instrumentation.record_block(
+            block, stats['size'], stats['pairs'], stats['time'],
+            affinity_time=stats.get('affinity_time', 0.0))
+
+    if cascade is not None:
+        # Blocks fitted by worker processes updated copies of the cascade.
+        block_stats = clusterer.block_stats_.values()
+        cascade.n_pairs = n_pairs + sum(
+            stats.get('cascade_pairs', 0) for stats in block_stats)
+        cascade.n_pruned = n_pruned + sum(
+            stats.get('cascade_pruned', 0) for stats in block_stats)
+
+    if max_block_size is not None and clustering_threshold is not None:
+        with instrumentation.stage('link_subblocks'):
+            labels = link_subblocks(X, labels, clusterer.blocks_,
+                                    _pair_affinity, clustering_threshold)
+
+    if cascade is not None and cascade.n_pairs:
+        logger.info("Cascade pruned %(pruned)d of %(pairs)d pairs.",
+                    cascade.stats())
+        instrumentation.count('pruned_pairs', cascade.n_pruned)
+
+    logger.info("Name forms: %(hits)d hits, %(misses)d misses.",
+                name_cache.stats())
+    logger.info("Models: %(hits)d hits, %(misses)d misses, %(load_time).2fs "
+                "loading.", registry.stats())
+
+    # Blocks fitted by worker processes use copies of the cache.
+    cached = feature_cache.stats()
+    feature_hits = cached['hits'] - cached_before['hits']
+    feature_misses = cached['misses'] - cached_before['misses']
+    logger.info("Features: %d hits, %d misses, %d bytes cached.",
+                feature_hits, feature_misses, cached['size'])
+    instrumentation.count('feature_cache_hits', feature_hits)
+    instrumentation.count('feature_cache_misses', feature_misses)
 
     # Save predicted clusters
     clusters = {}
@@ -0,0 +1,664 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Columnar storage of signatures and records.
+
+``load_signatures`` attaches the dictionary of its record to every
+signature dictionary. ``SignatureStore`` keeps instead one column per
+field: scalar values are interned in a single table and referred to by
+int32 indices, lists of values (e.g. the authors of a record) are stored
+once per record as int32 indices with offsets.
+
+``SignatureView`` and ``RecordView`` expose a row of the store as a read
+only mapping, thus the getters of ``beard_utils`` and the blocking
+functions work unchanged on an array of views. ``SignatureStore.bulk``
+evaluates a getter for many signatures at once, only once per distinct
+value of the field it depends on.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from collections import Mapping
+from itertools import chain
+from operator import attrgetter
+from operator import itemgetter
+
+import numpy as np
+
+from .beard_utils import get_abstract
+from .beard_utils import get_author_affiliation
+from .beard_utils import get_author_full_name
+from .beard_utils import get_author_initials
+from .beard_utils import get_author_other_names
+from .beard_utils import get_coauthors
+from .beard_utils import get_coauthors_from_range
+from .beard_utils import get_collaborations
+from .beard_utils import get_first_given_name
+from .beard_utils import get_first_initial
+from .beard_utils import get_journal
+from .beard_utils import get_keywords
+from .beard_utils import get_references
+from .beard_utils import get_second_given_name
+from .beard_utils import get_second_initial
+from .beard_utils import get_surname
+from .beard_utils import get_title
+from .beard_utils import get_topics
+from .beard_utils import get_year
+
+# Getters depending on a single field of the signature.
+SIGNATURE_FIELD_GETTERS = {
+    get_author_full_name: 'author_name',
+    get_author_other_names: 'author_name',
+    get_author_initials: 'author_name',
+    get_surname: 'author_name',
+    get_first_initial: 'author_name',
+    get_second_initial: 'author_name',
+    get_first_given_name: 'author_name',
+    get_second_given_name: 'author_name',
+    get_author_affiliation: 'author_affiliation',
+}
+
+# Getters depending on a single field of the record.
+RECORD_FIELD_GETTERS = {
+    get_title: 'title',
+    get_journal: 'journal',
+    get_abstract: 'abstract',
+    get_year: 'year',
+    get_coauthors: 'authors',
+    get_keywords: 'keywords',
+    get_topics: 'topics',
+    get_collaborations: 'collaborations',
+    get_references: 'references',
+}
+
+# Getters joining a list field of the record with spaces.
+JOINED_FIELD_GETTERS = {
+    get_coauthors: 'authors',
+    get_keywords: 'keywords',
+    get_collaborations: 'collaborations',
+}
+
+MISSING = -1
+UNKNOWN = -2
+
+# Marks the fields missing from a row.
+_ABSENT = object()
+
+
+class ValueTable(object):
+    """Interned values, each stored once and referred to by an index."""
+
+    def __init__(self):
+        """Initialize an empty table."""
+        self.values = []
+        # One dictionary per type, so that e.g. 1 and True stay apart.
+        self._indices = {}
+
+    def intern(self, values):
+        """Return the indices of hashable values, adding the new ones."""
+        values = list(values)
+        types = set(map(type, values))
+
+        if len(types) > 1:
+            # E.g. strings and None, interned type by type.
+            kinds = np.array(list(map(type, values)), dtype=np.object)
+            result = np.empty(len(values), dtype=np.int64)
+
+            for kind in types:
+                rows = np.flatnonzero(kinds == kind)
+                result[rows] = self.intern([values[row]
+                                            for row in rows.tolist()])
+
+            return result.tolist()
+
+        indices = self._indices.setdefault(types.pop(), {}) if types else {}
+
+        # Only the distinct new values are added one by one.
+        for value in set(values).difference(indices):
+            indices[value] = len(self.values)
+            self.values.append(value)
+
+        return list(map(indices.__getitem__, values))
+
+    def freeze(self):
+        """Drop the index of the values; no value can be added anymore."""
+        self._indices = None
+
+    def __len__(self):
+        """Return the number of distinct values."""
+        return len(self.values)
+
+
+_SCALAR_TYPES = frozenset((type(None), bool, int, long, float, str,
+                           unicode))
+
+
+def _are_scalars(values):
+    return set(map(type, values)) <= _SCALAR_TYPES
+
+
+class _Column(object):
+    """One field of a table: interned scalars, lists of them or objects."""
+
+    def __init__(self, rows, field, table):
+        """Store the field of the given rows."""
+        values = [row.get(field, _ABSENT) for row in rows]
+        present = [value for value in values if value is not _ABSENT]
+
+        if len(present) < len(values):
+            mask = np.array([value is not _ABSENT for value in values],
+                            dtype=np.bool)
+        else:
+            mask = slice(None)
+
+        if _are_scalars(present):
+            self.kind = 'scalar'
+            self.data = np.empty(len(values), dtype=np.int32)
+            self.data.fill(MISSING)
+            self.data[mask] = table.intern(present)
+
+        elif set(map(type, present)) <= set([list]) and \
+                _are_scalars(chain.from_iterable(present)):
+            self.kind = 'list'
+            lengths = np.empty(len(values), dtype=np.int32)
+            lengths.fill(MISSING)
+            lengths[mask] = list(map(len, present))
+            self.lengths = lengths
+            self.offsets = np.concatenate((
+                [0], np.cumsum(np.maximum(lengths, 0)))).astype(np.int64)
+            self.data = np.array(table.intern(
+                list(chain.from_iterable(present))), dtype=np.int32)
+
+        else:
+            self.kind = 'object'
+            self.data = values
+
+    def decode(self, rows, table):
+        """Return the values of the given rows, ``_ABSENT`` if missing."""
+        values = table.values
+
+        if self.kind == 'scalar':
+            return [_ABSENT if key == MISSING else values[key]
+                    for key in self.data[rows].tolist()]
+
+        if self.kind == 'list':
+            lengths = self.lengths[rows]
+            sizes = np.maximum(lengths, 0)
+            ends = np.cumsum(sizes)
+
+            # Gather the items of all the rows at once.
+            items = np.arange(ends[-1] if len(ends) else 0) + np.repeat(
+                self.offsets[rows] - ends + sizes, sizes)
+            items = [values[key] for key in self.data[items].tolist()]
+
+            return [_ABSENT if length == MISSING else
+                    items[end - length:end]
+                    for length, end in zip(lengths.tolist(), ends.tolist())]
+
+        return [self.data[row] for row in rows]
+
+    def has(self, row):
+        if self.kind == 'scalar':
+            return self.data[row] != MISSING
+        if self.kind == 'list':
+            return self.lengths[row] != MISSING
+        return self.data[row] is not _ABSENT
+
+    def get(self, row, table):
+        if self.kind == 'scalar':
+            return table.values[self.data[row]]
+
+        if self.kind == 'list':
+            start, end = self.offsets[row], self.offsets[row + 1]
+            return [table.values[index] for index in self.data[start:end]]
+
+        return self.data[row]
+
+
+class _Table(object):
+    """Columns of a list of dictionaries."""
+
+    def __init__(self, rows, table, exclude=()):
+        """Split the rows into columns, but the excluded fields."""
+        fields = []
+        seen = set(exclude)
+
+        for row in rows:
+            if not seen.issuperset(row):
+                for field in row:
+                    if field not in seen:
+                        seen.add(field)
+                        fields.append(field)
+
+        self.n_rows = len(rows)
+        self.fields = fields
+        self.columns = dict((field, _Column(rows, field, table))
+                            for field in fields)
+
+    def decode(self, rows, table):
+        """Return the given rows as a list of dictionaries."""
+        decoded = [{} for _ in rows]
+
+        for field in self.fields:
+            for row, value in zip(decoded, self.columns[field].decode(
+                    rows, table)):
+                if value is not _ABSENT:
+                    row[field] = value
+
+        return decoded
+
+
+class _JoinedColumn(object):
+    """A list column of strings, joined with spaces once per row.
+
+    ``starts`` holds the position of every item in the joined string of
+    its row, thus any run of consecutive items is a slice of it.
+    """
+
+    def __init__(self, column, table):
+        """Join the items of every row of the column."""
+        values = table.values
+        items = [values[key] for key in column.data.tolist()]
+        sizes = np.maximum(column.lengths, 0)
+
+        self.column = column
+        # Joined as by the getters, with a byte string separator.
+        self.joined = [b" ".join(items[start:start + size]) for start, size
+                       in zip(column.offsets[:-1].tolist(), sizes.tolist())]
+
+        # Each item is followed by a space.
+        widths = np.array([len(item) + 1 for item in items], dtype=np.int64)
+        ends = np.cumsum(widths)
+        self.starts = (ends - widths - np.repeat(
+            (ends - widths)[column.offsets[:-1][sizes > 0]],
+            sizes[sizes > 0])).astype(np.int32)
+
+    @classmethod
+    def build(cls, column, table):
+        """Return the joined column, or None if it cannot be joined."""
+        if column is None or column.kind != 'list':
+            return None
+
+        # Mixed types would be joined into another type than some windows.
+        types = set(type(table.values[key])
+                    for key in np.unique(column.data).tolist())
+
+        if len(types) > 1 or not types <= set((str, unicode)):
+            return None
+
+        return cls(column, table)
+
+    def window(self, row, start, end):
+        """Return the items ``start`` to ``end`` of a row, joined."""
+        offset = self.column.offsets[row]
+        joined = self.joined[row]
+
+        if end < self.column.lengths[row]:
+            # Up to the space before the next item.
+            return joined[self.starts[offset + start]:
+                          self.starts[offset + end] - 1]
+
+        return joined[self.starts[offset + start]:]
+
+
+class RecordView(Mapping):
+    """Read only mapping of a record of a ``SignatureStore``."""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        """Point to a record of the store."""
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        """Return the value of a field of the record."""
+        column = self.store.records.columns.get(key)
+
+        if column is None or not column.has(self.index):
+            raise KeyError(key)
+
+        return column.get(self.index, self.store.values)
+
+    def __iter__(self):
+        """Iterate over the fields of the record."""
+        records = self.store.records
+
+        return (field for field in records.fields
+                if records.columns[field].has(self.index))
+
+    def __len__(self):
+        """Return the number of fields of the record."""
+        return sum(1 for _ in self)
+
+
+class SignatureView(Mapping):
+    """Read only mapping of a signature of a ``SignatureStore``.
+
+    The ``publication`` field is the ``RecordView`` of its record, as
+    attached by ``load_signatures``.
+    """
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        """Point to a signature of the store."""
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        """Return the value of a field of the signature."""
+        if key == 'publication':
+            return RecordView(self.store, self.store.record_of[self.index])
+
+        column = self.store.signatures.columns.get(key)
+
+        if column is None or not column.has(self.index):
+            raise KeyError(key)
+
+        return column.get(self.index, self.store.values)
+
+    def __iter__(self):
+        """Iterate over the fields of the signature."""
+        signatures = self.store.signatures
+
+        for field in signatures.fields:
+            if signatures.columns[field].has(self.index):
+                yield field
+
+        yield 'publication'
+
+    def __len__(self):
+        """Return the number of fields of the signature."""
+        return sum(1 for _ in self)
+
+
+class SignatureStore(object):
+    """Signatures and their records, stored by columns.
+
+    :param signatures:
+        A list of signatures, or a dictionary of them by identifier, as
+        accepted by ``load_signatures``.
+
+    :param records:
+        A list of records, or a dictionary of them by publication
+        identifier.
+
+    Signatures are stored sorted by identifier.
+    """
+
+    def __init__(self, signatures, records):
+        """Build the columns of the signatures and of the records."""
+        # Later duplicates of an identifier win, as in ``load_signatures``.
+        if isinstance(signatures, list):
+            signatures = dict((s['signature_id'], s) for s in signatures)
+
+        if isinstance(records, list):
+            records = dict((r['publication_id'], r) for r in records)
+
+        signatures = sorted(signatures.values(),
+                            key=itemgetter('signature_id'))
+        records = list(records.values())
+
+        self.values = ValueTable()
+        # Records are attached by ``load_signatures``; they are stored
+        # separately.
+        self.signatures = _Table(signatures, self.values,
+                                 exclude=('publication',))
+        self.records = _Table(records, self.values)
+        self.values.freeze()
+
+        positions = dict((record['publication_id'], index)
+                         for index, record in enumerate(records))
+        self.record_of = np.array([positions[s['publication_id']]
+                                   for s in signatures], dtype=np.int32)
+        self.signature_ids = [s['signature_id'] for s in signatures]
+
+        # Built once here, shared by all the signatures of a record.
+        self.joined = dict((field, _JoinedColumn.build(
+            self.records.columns.get(field), self.values))
+            for field in set(JOINED_FIELD_GETTERS.values()))
+        self.author_positions = self._author_positions()
+
+    def _author_positions(self):
+        """Find the position of every signature in the authors of its record.
+
+        The position is the one found by ``list.index``, ``MISSING`` if the
+        name is not in the list and ``UNKNOWN`` if either field is missing.
+        """
+        positions = np.empty(len(self.signature_ids), dtype=np.int32)
+        positions.fill(UNKNOWN)
+
+        names = self.signatures.columns.get('author_name')
+        authors = self.records.columns.get('authors')
+
+        if names is None or names.kind != 'scalar' or \
+                authors is None or authors.kind != 'list':
+            return positions
+
+        values = self.values.values
+        # Equal values of different types, e.g. byte and unicode strings,
+        # are the same for ``list.index``: they get the same key.
+        canonical = {}
+        keys = np.arange(len(values), dtype=np.int64)
+
+        for key in np.unique(np.concatenate((names.data,
+                                             authors.data))).tolist():
+            if key != MISSING:
+                keys[key] = canonical.setdefault(values[key], key)
+
+        # Every author of every record, as a (record, key) pair.
+        sizes = np.maximum(authors.lengths, 0)
+        starts = np.repeat(authors.offsets[:-1], sizes)
+        pairs = np.repeat(np.arange(len(sizes), dtype=np.int64),
+                          sizes) * len(values) + keys[authors.data]
+
+        # The first position of each author in its record, as found by
+        # ``list.index``, since ``np.unique`` sorts stably.
+        pairs, first = np.unique(pairs, return_index=True)
+
+        known = (names.data != MISSING) & \
+            (authors.lengths[self.record_of] != MISSING)
+        wanted = self.record_of[known].astype(np.int64) * len(values) + \
+            keys[names.data[known]]
+
+        positions[known] = MISSING
+
+        if not len(pairs):
+            return positions
+
+        found = np.minimum(np.searchsorted(pairs, wanted), len(pairs) - 1)
+        items = first[found]
+        positions[known] = np.where(pairs[found] == wanted,
+                                    items - starts[items], MISSING)
+
+        return positions
+
+    def __len__(self):
+        """Return the number of signatures."""
+        return len(self.signature_ids)
+
+    def view(self, index):
+        """Return the ``SignatureView`` of a signature."""
+        return SignatureView(self, index)
+
+    def array(self, indices=None):
+        """Return an array of shape (n, 1) of views of the signatures.
+
+        :param indices:
+            The indices of the signatures, all of them by default.
+        """
+        if indices is None:
+            indices = range(len(self))
+
+        X = np.empty((len(indices), 1), dtype=np.object)
+
+        for row, index in enumerate(indices):
+            X[row, 0] = SignatureView(self, index)
+
+        return X
+
+    def bulk(self, getter, indices, dtype=np.object):
+        """Evaluate a getter on many signatures.
+
+        Getters of ``beard_utils`` depending on a single field of the
+        signature or of its record are evaluated once per distinct value
+        of that field. Other functions are called on every signature.
+
+        :param getter:
+            A function of a signature, e.g. ``get_author_full_name``.
+
+        :param indices:
+            The indices of the signatures.
+
+        :param dtype:
+            The type of the values returned by the getter.
+
+        :return:
+            An array of the values of the getter.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+
+        if getter in SIGNATURE_FIELD_GETTERS:
+            field = SIGNATURE_FIELD_GETTERS[getter]
+            column = self.signatures.columns.get(field)
+
+            if column is not None and column.kind == 'scalar':
+                keys, inverse = np.unique(column.data[indices],
+                                          return_inverse=True)
+                values = self.values.values
+                # The getter fails on missing fields as on the signature.
+                results = [getter({field: values[key]} if key != MISSING
+                                  else {})
+                           for key in keys.tolist()]
+
+                return _as_array(results, dtype)[inverse]
+
+        if getter is get_coauthors_from_range:
+            authors = self.joined['authors']
+            positions = self.author_positions[indices]
+
+            if authors is not None and (positions != UNKNOWN).all():
+                return self._coauthors_from_range(
+                    authors, self.record_of[indices], positions, dtype)
+
+        if getter in JOINED_FIELD_GETTERS:
+            joined = self.joined[JOINED_FIELD_GETTERS[getter]]
+
+            if joined is not None and \
+                    (joined.column.lengths != MISSING).all():
+                return _as_array([joined.joined[record] for record in
+                                  self.record_of[indices].tolist()], dtype)
+
+        if getter in RECORD_FIELD_GETTERS:
+            field = RECORD_FIELD_GETTERS[getter]
+            column = self.records.columns.get(field)
+            # Records are shared by the signatures of a publication.
+            records, inverse = np.unique(self.record_of[indices],
+                                         return_inverse=True)
+
+            if column is None:
+                values = [_ABSENT] * len(records)
+            else:
+                values = column.decode(records, self.values)
+
+            results = [getter({'publication': {field: value}
+                               if value is not _ABSENT else {}})
+                       for value in values]
+
+            return _as_array(results, dtype)[inverse]
+
+        # Other getters get a dictionary refilled for every signature, with
+        # the fields decoded column by column.
+        records, inverse = np.unique(self.record_of[indices],
+                                     return_inverse=True)
+        publications = self.records.decode(records, self.values)
+        columns = [(field, self.signatures.columns[field].decode(
+            indices, self.values)) for field in self.signatures.fields]
+        signature = {}
+        results = []
+
+        for row, position in enumerate(inverse.tolist()):
+            for field, values in columns:
+                if values[row] is _ABSENT:
+                    signature.pop(field, None)
+                else:
+                    signature[field] = values[row]
+
+            signature['publication'] = publications[position]
+            results.append(getter(signature))
+
+        return _as_array(results, dtype)
+
+    def _coauthors_from_range(self, authors, records, positions, dtype,
+                              distance=10):
+        """Evaluate ``get_coauthors_from_range`` on joined authors."""
+        sizes = authors.column.lengths[records].tolist()
+        results = []
+
+        for record, position, size in zip(records.tolist(),
+                                          positions.tolist(), sizes):
+            if position == MISSING:
+                results.append(authors.joined[record])
+            else:
+                results.append(authors.window(
+                    record, max(0, position - distance),
+                    min(size, position + distance)))
+
+        return _as_array(results, dtype)
+
+
+def _as_array(values, dtype):
+    """Build a flat array of values, which may be lists themselves."""
+    array = np.empty(len(values), dtype=dtype)
+
+    for position, value in enumerate(values):
+        array[position] = value
+
+    return array
+
+
+def store_of(X):
+    """Return the store of an array of views, or None."""
+    if X.ndim != 2 or X.shape[1] != 1 or len(X) == 0:
+        return None
+
+    try:
+        stores = set(map(attrgetter('store'), X[:, 0]))
+    except AttributeError:
+        return None
+
+    if len(stores) != 1:
+        return None
+
+    store = stores.pop()
+
+    return store if isinstance(store, SignatureStore) else None
+
+
+def view_indices(X):
+    """Return the indices in their store of an array of views."""
+    return np.fromiter(map(attrgetter('index'), X[:, 0]), dtype=np.int64,
+                       count=len(X))
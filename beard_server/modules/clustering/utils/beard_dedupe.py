@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Clustering of blocks with many identical signatures.
+
+Signatures of large collaborations often look the same to the distance
+model: same name, affiliation, coauthor window, title and year. All their
+pairs with another signature get the same distance. ``DeduplicatedLinkage``
+keeps a single representative of such signatures, weighted by their
+number, and runs average linkage on the representatives only. The number
+of scored pairs drops by the square of the duplication factor.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import logging
+
+import numpy as np
+
+from sklearn.base import BaseEstimator
+from sklearn.base import ClusterMixin
+from sklearn.base import clone
+
+from .beard_sparse import sparse_average_linkage
+
+logger = logging.getLogger(__name__)
+
+
+class DeduplicatedLinkage(BaseEstimator, ClusterMixin):
+    """Average linkage on weighted representatives of identical signatures.
+
+    Identical signatures start in the same cluster, unless the distance
+    model puts them further apart than the threshold. The other merges are
+    the ones of average linkage on all the signatures.
+
+    Attributes
+    ----------
+    labels_ : ndarray, shape (n_samples,)
+        Array of labels assigned to the input data.
+
+    n_representatives_ : int
+        The number of signatures actually clustered.
+    """
+
+    def __init__(self, base_estimator=None, duplicates=None, affinity=None,
+                 threshold=None):
+        """Initialize.
+
+        Parameters
+        ----------
+        :param base_estimator: estimator
+            The estimator fitted on blocks without identical signatures,
+            or if no threshold is given.
+
+        :param duplicates: callable
+            A function ``duplicates(X)`` returning the group of identical
+            signatures of each signature, numbered in order of appearance.
+
+        :param affinity: callable
+            A function ``affinity(X, i, j)`` returning the distances of the
+            pairs of signatures ``(X[i], X[j])``.
+
+        :param threshold: float
+            The threshold at which flat clusters are formed.
+        """
+        self.base_estimator = base_estimator
+        self.duplicates = duplicates
+        self.affinity = affinity
+        self.threshold = threshold
+
+    def _fit_base_estimator(self, X, y):
+        estimator = clone(self.base_estimator)
+
+        try:
+            estimator.fit(X, y=y)
+        except TypeError:
+            estimator.fit(X)
+
+        self.labels_ = np.asarray(estimator.labels_)
+        self.n_representatives_ = len(X)
+
+        return self
+
+    def fit(self, X, y=None):
+        """Perform average linkage on the representatives of X.
+
+        Parameters
+        ----------
+        :param X: array-like, shape (n_samples, 1)
+            Input signatures.
+
+        :param y: array-like, shape (n_samples, )
+            Input labels. If some are known, the threshold is estimated
+            by ``base_estimator`` on all the signatures.
+
+        Returns
+        -------
+        :returns: self
+        """
+        X = np.array(X)
+
+        if self.threshold is None or \
+                (y is not None and np.any(np.array(y) != -1)):
+            return self._fit_base_estimator(X, y)
+
+        groups = self.duplicates(X)
+
+        # Identical signatures the model does not consider as the same
+        # author are clustered separately.
+        representatives, sizes = _representatives(groups)
+        shared = np.flatnonzero(sizes > 1)
+
+        if len(shared):
+            first = representatives[shared]
+            far = self.affinity(X, first, first) > self.threshold
+
+            for group in shared[far]:
+                members = np.flatnonzero(groups == group)
+                groups[members[1:]] = groups.max() + 1 + \
+                    np.arange(len(members) - 1)
+
+            representatives, sizes = _representatives(groups)
+
+        n_representatives = len(representatives)
+
+        if n_representatives == len(X):
+            return self._fit_base_estimator(X, y)
+
+        i, j = np.triu_indices(n_representatives, k=1)
+
+        if len(i):
+            distances = self.affinity(X, representatives[i],
+                                      representatives[j])
+        else:
+            distances = np.zeros(0, dtype=np.float64)
+
+        labels = sparse_average_linkage(n_representatives, i, j, distances,
+                                        self.threshold, sizes=sizes)
+
+        self.labels_ = labels[np.searchsorted(np.unique(groups), groups)]
+        self.n_representatives_ = n_representatives
+
+        logger.debug("Clustered %d representatives of %d signatures.",
+                     n_representatives, len(X))
+
+        return self
+
+
+def _representatives(groups):
+    """Return the first member and the size of each group."""
+    _, representatives, sizes = np.unique(groups, return_index=True,
+                                          return_counts=True)
+
+    return representatives, sizes
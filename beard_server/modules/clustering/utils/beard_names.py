@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Derived forms of author names, computed once per name.
+
+The getters of the distance model and the blocking functions derive the
+normalized name, the initials, the given names and the phonetic tokens
+of the same author names over and over. ``name_forms`` returns a
+``NameForms`` object holding all of them for a raw name string. Each form
+is computed with the functions of Beard on first use and kept on the
+object. The objects are kept in a bounded cache, shared by all the call
+sites of the process.
+
+``block_phonetic`` is the phonetic blocking of Beard, with the tokens and
+the initials read from the name forms.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+
+from beard.clustering.blocking_funcs import _Block
+from beard.utils import given_name
+from beard.utils import given_name_initial
+from beard.utils import name_initials
+from beard.utils import normalize_name
+from beard.utils.names import phonetic_tokenize_name
+
+from beard_server import config
+
+
+class NameForms(object):
+    """The derived forms of an author name.
+
+    :param name:
+        The raw name, as in the ``author_name`` field of a signature.
+
+        Example:
+            name = 'Wang, Yi-Nan'
+    """
+
+    __slots__ = ('name', '_full_name', '_other_names', '_initials',
+                 '_surname', '_first_given_name', '_second_given_name',
+                 '_first_initial', '_second_initial', '_phonetic')
+
+    def __init__(self, name):
+        """Hold the forms of the given name."""
+        self.name = name
+        self._phonetic = {}
+
+    # Each form is computed on first access, thus a name failing for one
+    # form (e.g. None) raises as the corresponding getter did.
+
+    @property
+    def full_name(self):
+        """The normalized name, e.g. 'wang, yi nan'."""
+        try:
+            return self._full_name
+        except AttributeError:
+            self._full_name = normalize_name(self.name) if self.name else ""
+            return self._full_name
+
+    @property
+    def other_names(self):
+        """The normalized names after the comma, e.g. 'nan yi'."""
+        try:
+            return self._other_names
+        except AttributeError:
+            names = self.name.split(",", 1)
+            self._other_names = normalize_name(names[1]) \
+                if len(names) == 2 else ""
+            return self._other_names
+
+    @property
+    def initials(self):
+        """The initials, not separated."""
+        try:
+            return self._initials
+        except AttributeError:
+            self._initials = "".join(name_initials(
+                self.name if self.name else ""))
+            return self._initials
+
+    @property
+    def surname(self):
+        """The first word of the name, without the comma."""
+        try:
+            return self._surname
+        except AttributeError:
+            self._surname = self.name.split(" ")[0].split(",")[0]
+            return self._surname
+
+    @property
+    def first_given_name(self):
+        """The first given name."""
+        try:
+            return self._first_given_name
+        except AttributeError:
+            self._first_given_name = given_name(self.name, 0)
+            return self._first_given_name
+
+    @property
+    def second_given_name(self):
+        """The second given name."""
+        try:
+            return self._second_given_name
+        except AttributeError:
+            self._second_given_name = given_name(self.name, 1)
+            return self._second_given_name
+
+    @property
+    def first_initial(self):
+        """The initial of the first given name."""
+        try:
+            return self._first_initial
+        except AttributeError:
+            self._first_initial = given_name_initial(self.name, 0)
+            return self._first_initial
+
+    @property
+    def second_initial(self):
+        """The initial of the second given name."""
+        try:
+            return self._second_initial
+        except AttributeError:
+            self._second_initial = given_name_initial(self.name, 1)
+            return self._second_initial
+
+    def phonetic(self, algorithm='double_metaphone'):
+        """Return the phonetic tokens of the surnames and the given names.
+
+        :param algorithm:
+            "double_metaphone", "nysiis" or "soundex", as accepted by
+            ``phonetic_tokenize_name``.
+        """
+        try:
+            return self._phonetic[algorithm]
+        except KeyError:
+            tokens = phonetic_tokenize_name(self.name,
+                                            phonetic_algorithm=algorithm)
+            self._phonetic[algorithm] = tokens
+            return tokens
+
+
+class NameCache(object):
+    """A bounded cache of name forms with two generations.
+
+    New entries go to the young generation. When it holds ``max_size // 2``
+    entries, it becomes the old generation and the former old one is
+    dropped. Entries found in the old generation are moved back to the
+    young one, thus names in use survive. Dictionary operations make it
+    cheaper than ``LRUCache`` for such small values, and safe without a
+    lock: concurrent misses only compute the same forms twice.
+
+    :param max_size:
+        The maximum number of names. Zero disables the cache.
+    """
+
+    def __init__(self, max_size):
+        """Initialize an empty cache."""
+        self.max_size = max_size
+        self._young = {}
+        self._old = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name):
+        """Return the ``NameForms`` of a name."""
+        forms = self._young.get(name)
+
+        if forms is not None:
+            self.hits += 1
+            return forms
+
+        forms = self._old.pop(name, None)
+
+        if forms is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            forms = NameForms(name)
+
+        if self.max_size > 0:
+            if len(self._young) >= max(1, self.max_size // 2):
+                self.evictions += len(self._old)
+                self._old, self._young = self._young, {}
+
+            self._young[name] = forms
+
+        return forms
+
+    def __len__(self):
+        """Return the number of cached names."""
+        return len(self._young) + len(self._old)
+
+    def clear(self):
+        """Drop all the entries and reset the counters."""
+        self._young = {}
+        self._old = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Return the counters of the cache.
+
+        :return:
+            A dictionary of counters.
+
+            Example:
+                {'entries': 1200, 'max_size': 100000, 'hits': 9000,
+                 'misses': 1200, 'hit_rate': 0.88, 'evictions': 0}
+        """
+        requests = self.hits + self.misses
+
+        return {
+            'entries': len(self),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+name_cache = NameCache(config.BEARD_SERVER_NAME_FORMS_CACHE_SIZE)
+
+
+def name_forms(name):
+    """Return the ``NameForms`` of a raw name from the process-wide cache."""
+    cache = name_cache
+    forms = cache._young.get(name)
+
+    if forms is None:
+        return cache.get(name)
+
+    cache.hits += 1
+
+    return forms
+
+
+def block_phonetic(X, threshold=1000, phonetic_algorithm="double_metaphone"):
+    """Block the signatures by the phonetic tokens of their surnames.
+
+    Same algorithm and results as ``beard.clustering.block_phonetic``, with
+    the tokens and the initials taken from ``name_forms``.
+
+    :param X:
+        An array of shape (n_signatures, 1) of signatures.
+
+    :param threshold:
+        Size above which the blocks are split by first initial.
+
+    :param phonetic_algorithm:
+        "double_metaphone", "nysiis" (only for Python 2) or "soundex" (only
+        for Python 2).
+
+    :return:
+        An array with the string ids of the blocks, in the order of ``X``.
+    """
+    forms = [name_forms(signature['author_name']) for signature in X[:, 0]]
+    id_to_block = {}
+    ordered_tokens = []
+
+    # Signatures with a single surname create the blocks.
+    for name in forms:
+        tokens = name.phonetic(phonetic_algorithm)
+        surname_tokens = tokens[0]
+
+        if len(surname_tokens) == 1:
+            surname = surname_tokens[0]
+
+            if surname not in id_to_block:
+                id_to_block[surname] = _Block(*tokens)
+            else:
+                id_to_block[surname].add_signature(*tokens)
+
+            ordered_tokens.append((surname, tokens))
+        else:
+            ordered_tokens.append((None, tokens))
+
+    # Signatures with multiple surnames join the block of the first or of
+    # the last surname.
+    blocks = []
+
+    for surname, tokens in ordered_tokens:
+        if surname is not None:
+            blocks.append(id_to_block[surname])
+            continue
+
+        blocks.append(_multiple_surnames_block(id_to_block, tokens))
+
+    sizes = {}
+
+    for block in blocks:
+        sizes[block._name] = sizes.get(block._name, 0) + 1
+
+    return np.array([block._name + name.first_initial
+                     if sizes[block._name] > threshold else block._name
+                     for block, name in zip(blocks, forms)])
+
+
+def _multiple_surnames_block(id_to_block, tokens):
+    """Find the block of a signature with multiple surnames."""
+    surnames = tokens[0]
+    first = id_to_block.get(surnames[0])
+    last = id_to_block.get(surnames[-1])
+
+    # This combination of surnames was already seen.
+    if first is not None and first.contains(surnames):
+        first.add_signature(*tokens)
+        return first
+
+    if last is not None:
+        if last.contains(surnames):
+            last.add_signature(*tokens)
+            return last
+
+        # Some of the first surnames are the last given names of the
+        # signatures of the block. It fails if the last surname alone is
+        # not in the block.
+        try:
+            for index in range(len(surnames) - 1, 0, -1):
+                if last.compare_tokens_from_last(surnames[:index],
+                                                 (surnames[-1],)):
+                    last.add_signature(*tokens)
+                    return last
+        except KeyError:
+            pass
+
+    if first is not None:
+        first.add_signature(*tokens)
+        return first
+
+    if surnames[-1] not in id_to_block:
+        id_to_block[surnames[-1]] = _Block(*tokens)
+
+    return id_to_block[surnames[-1]]
@@ -41,9 +41,10 @@ import math
 import numpy as np
 import random
 
-from beard.clustering import block_phonetic
 from beard.clustering import block_last_name_first_initial
 
+from .beard_names import block_phonetic
+
 
 def _noblocking_sampling(sample_size, train_signatures, clusters_reversed):
     pairs = []
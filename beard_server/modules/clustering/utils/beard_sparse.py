@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Average linkage on a sparse graph of candidate pairs.
+
+``ScipyHierarchicalClustering`` needs the condensed matrix of all the
+n * (n - 1) / 2 distances of a block, which does not fit in memory for the
+largest phonetic blocks. ``SparseAverageLinkage`` scores only the pairs of
+signatures sharing a cheap key (same name, same coauthor, ...) and treats
+every other pair as being at distance 1.
+
+Average linkage is then run on the sparse graph with a heap of the linked
+clusters. As the average distance of a merged cluster lies between the
+averages of its parts, the merges below the threshold are exactly the ones
+of a full average linkage, in which the missing distances are 1, cut with
+``fcluster(..., criterion='distance')``.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import heapq
+import logging
+
+import numpy as np
+
+from sklearn.base import BaseEstimator
+from sklearn.base import ClusterMixin
+from sklearn.base import clone
+
+from .beard_utils import get_author_affiliation
+from .beard_utils import get_author_full_name
+from .beard_utils import get_first_initial
+from .beard_utils import get_year
+
+logger = logging.getLogger(__name__)
+
+
+def _candidate_keys(signature):
+    """Return the keys under which pairs of signatures are scored."""
+    initial = get_first_initial(signature)
+    keys = [('name', get_author_full_name(signature))]
+
+    affiliation = get_author_affiliation(signature)
+
+    if affiliation:
+        keys.append(('affiliation', initial, affiliation))
+
+    author_name = signature['author_name']
+
+    for coauthor in signature['publication']['authors']:
+        if coauthor != author_name:
+            keys.append(('coauthor', initial, coauthor))
+
+    return keys
+
+
+def _bucket_pairs(bucket, max_bucket_size, window, years):
+    """Return the pairs of the signatures of a bucket.
+
+    Buckets up to ``max_bucket_size`` signatures give all their pairs.
+    Larger buckets are sorted by year and each signature is paired with the
+    ``window`` following ones.
+    """
+    bucket = np.asarray(bucket, dtype=np.int64)
+
+    if len(bucket) <= max_bucket_size:
+        i, j = np.triu_indices(len(bucket), k=1)
+        return bucket[i], bucket[j]
+
+    bucket = bucket[np.argsort(years[bucket], kind='mergesort')]
+    offsets = range(1, min(window, len(bucket) - 1) + 1)
+
+    return (np.concatenate([bucket[:-offset] for offset in offsets]),
+            np.concatenate([bucket[offset:] for offset in offsets]))
+
+
+def candidate_pairs(X, max_bucket_size=200, window=50):
+    """Find the pairs of signatures worth scoring.
+
+    Two signatures are a candidate pair if they share the normalized full
+    name of the author, or the first initial together with the affiliation
+    or with a coauthor.
+
+    :param X:
+        An array of shape (n_signatures, 1) of signatures.
+
+    :param max_bucket_size:
+        The size above which the signatures sharing a key are paired with
+        a sliding window only.
+
+    :param window:
+        The number of neighbours, in order of publication year, of each
+        signature of a large bucket.
+
+    :return:
+        A tuple of two arrays ``(i, j)`` of indices, with ``i < j`` and
+        without duplicate pairs.
+    """
+    n_samples = len(X)
+    buckets = {}
+
+    for index, signature in enumerate(X[:, 0]):
+        for key in _candidate_keys(signature):
+            buckets.setdefault(key, []).append(index)
+
+    years = np.array([get_year(signature) for signature in X[:, 0]],
+                     dtype=np.int64)
+    pairs = [np.zeros(0, dtype=np.int64)]
+
+    for bucket in buckets.values():
+        if len(bucket) > 1:
+            i, j = _bucket_pairs(bucket, max_bucket_size, window, years)
+            pairs.append(np.minimum(i, j) * n_samples + np.maximum(i, j))
+
+    pairs = np.unique(np.concatenate(pairs))
+    i, j = np.divmod(pairs, n_samples)
+    keep = i != j
+
+    return i[keep], j[keep]
+
+
+def sparse_average_linkage(n_samples, i, j, distances, threshold,
+                           sizes=None):
+    """Cluster a sparse graph of distances with average linkage.
+
+    :param n_samples:
+        The number of samples.
+
+    :param i:
+        An array of indices of the left samples of the pairs.
+
+    :param j:
+        An array of indices of the right samples, without duplicate pairs.
+
+    :param distances:
+        The distances of the pairs, in [0, 1]. Missing pairs are at
+        distance 1.
+
+    :param threshold:
+        The largest average distance at which two clusters are merged.
+
+    :param sizes:
+        An optional number of identical samples represented by each sample.
+        The distance of a pair then stands for all the pairs of the
+        samples they represent.
+
+    :return:
+        An array of ``n_samples`` labels, numbered from 0.
+    """
+    if sizes is None:
+        sizes = [1] * n_samples
+    else:
+        sizes = [int(size) for size in sizes]
+    versions = [0] * n_samples
+    parents = list(range(n_samples))
+    # For each cluster, the sum and the number of the known distances to
+    # its neighbours. Both ends of an edge share the same list.
+    neighbours = [{} for _ in range(n_samples)]
+    heap = []
+
+    for a, b, distance in zip(i.tolist(), j.tolist(), distances.tolist()):
+        n_pairs = sizes[a] * sizes[b]
+        link = [distance * n_pairs, n_pairs]
+        neighbours[a][b] = link
+        neighbours[b][a] = link
+
+        if distance <= threshold:
+            heap.append((distance, a, b, 0, 0))
+
+    heapq.heapify(heap)
+
+    while heap:
+        _, a, b, version_a, version_b = heapq.heappop(heap)
+
+        if versions[a] != version_a or versions[b] != version_b:
+            continue
+
+        # The cluster with more neighbours absorbs the other one.
+        if len(neighbours[a]) < len(neighbours[b]):
+            a, b = b, a
+
+        kept = neighbours[a]
+        merged = neighbours[b]
+        del kept[b]
+        del merged[a]
+
+        for c, link in merged.items():
+            del neighbours[c][b]
+            existing = kept.get(c)
+
+            if existing is None:
+                kept[c] = link
+                neighbours[c][a] = link
+            else:
+                existing[0] += link[0]
+                existing[1] += link[1]
+
+        neighbours[b] = None
+        parents[b] = a
+        sizes[a] += sizes[b]
+        versions[a] += 1
+        versions[b] += 1
+
+        for c, (total, count) in kept.items():
+            n_pairs = sizes[a] * sizes[c]
+            average = (total + n_pairs - count) / n_pairs
+
+            if average <= threshold:
+                heapq.heappush(heap, (average, a, c, versions[a],
+                                      versions[c]))
+
+    roots = np.array(parents)
+
+    # Each absorbed cluster points to a cluster absorbed later, or to a root.
+    while True:
+        grand_parents = roots[roots]
+
+        if np.array_equal(grand_parents, roots):
+            break
+
+        roots = grand_parents
+
+    return np.unique(roots, return_inverse=True)[1]
+
+
+class SparseAverageLinkage(BaseEstimator, ClusterMixin):
+    """Average linkage over the candidate pairs of a block.
+
+    Attributes
+    ----------
+    labels_ : ndarray, shape (n_samples,)
+        Array of labels assigned to the input data.
+
+    n_pairs_ : int
+        The number of pairs scored.
+    """
+
+    def __init__(self, affinity=None, threshold=None,
+                 candidates=candidate_pairs, dense_estimator=None,
+                 max_dense_size=0):
+        """Initialize.
+
+        Parameters
+        ----------
+        :param affinity: callable
+            A function ``affinity(X, i, j)`` returning the distances of the
+            pairs of signatures ``(X[i], X[j])``.
+
+        :param threshold: float
+            The threshold at which flat clusters are formed.
+
+        :param candidates: callable
+            A function ``candidates(X)`` returning the pairs to score.
+
+        :param dense_estimator: estimator or None
+            An estimator fitted instead on the blocks of at most
+            ``max_dense_size`` signatures.
+
+        :param max_dense_size: int
+            The size of the largest block given to ``dense_estimator``.
+        """
+        self.affinity = affinity
+        self.threshold = threshold
+        self.candidates = candidates
+        self.dense_estimator = dense_estimator
+        self.max_dense_size = max_dense_size
+
+    def fit(self, X, y=None):
+        """Perform average linkage on the candidate pairs of X.
+
+        Parameters
+        ----------
+        :param X: array-like, shape (n_samples, 1)
+            Input signatures.
+
+        :param y: array-like, shape (n_samples, )
+            Input labels, only used by ``dense_estimator``.
+
+        Returns
+        -------
+        :returns: self
+        """
+        X = np.array(X)
+        n_samples = len(X)
+
+        if self.dense_estimator is not None and \
+                n_samples <= self.max_dense_size:
+            estimator = clone(self.dense_estimator)
+
+            try:
+                estimator.fit(X, y=y)
+            except TypeError:
+                estimator.fit(X)
+
+            self.labels_ = np.asarray(estimator.labels_)
+            self.n_pairs_ = n_samples * (n_samples - 1) // 2
+
+            return self
+
+        if self.threshold is None:
+            raise ValueError("A threshold is required for sparse linkage.")
+
+        i, j = self.candidates(X)
+
+        if len(i):
+            distances = self.affinity(X, i, j)
+        else:
+            distances = np.zeros(0, dtype=np.float64)
+
+        self.labels_ = sparse_average_linkage(n_samples, i, j, distances,
+                                              self.threshold)
+        self.n_pairs_ = len(i)
+
+        logger.debug("Scored %d of %d pairs of a block of %d signatures.",
+                     self.n_pairs_, n_samples * (n_samples - 1) // 2,
+                     n_samples)
+
+        return self
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Persistent condensed distance matrices of blocks.
+
+Clustering a block again after a few signatures were added or changed
+recomputes all its pairwise distances. ``DistanceStore`` keeps the
+condensed distance matrix of each block on disk, as a float32 ``.npy``
+file opened as a memory map, together with the content keys of its
+signatures. The next time the block is clustered, only the pairs of new
+or changed signatures are scored and spliced with the stored distances.
+
+Each entry is made of two files: ``<digest>.keys`` holds the signature
+keys and ``<digest>-<token>.npy`` the matrix, where ``token`` is the hash
+of the keys. A reader thus never pairs keys with the matrix of another
+version of the block. Files are written to temporary files and renamed.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import errno
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from .beard_affinity import signature_key
+
+
+def _condensed_index(n_samples, i, j):
+    """Return the position of the pairs ``i < j`` in a condensed matrix."""
+    return n_samples * i - i * (i + 1) // 2 + j - i - 1
+
+
+def splice_distances(keys, old_keys, old_distances, compute):
+    """Build a condensed matrix from stored distances and new scores.
+
+    :param keys:
+        The content keys of the signatures of the block.
+
+    :param old_keys:
+        The keys of the signatures of the stored matrix.
+
+    :param old_distances:
+        The stored condensed matrix.
+
+    :param compute:
+        A function ``compute(i, j)`` scoring the pairs ``(i, j)`` of the
+        block which are not in the stored matrix.
+
+    :return:
+        A tuple of the condensed matrix of the block, with float32
+        precision, and the number of pairs computed.
+    """
+    n_samples = len(keys)
+    n_old = len(old_keys)
+    positions = dict((key, position) for position, key in
+                     enumerate(old_keys))
+    old = np.array([positions.get(key, -1) for key in keys],
+                   dtype=np.int64)
+
+    distances = np.empty(n_samples * (n_samples - 1) // 2, dtype=np.float64)
+    missing_i = []
+    missing_j = []
+
+    for i in range(n_samples - 1):
+        start = _condensed_index(n_samples, i, i + 1)
+        j = np.arange(i + 1, n_samples)
+
+        if old[i] < 0:
+            missing_i.append(np.repeat(i, len(j)))
+            missing_j.append(j)
+            continue
+
+        old_j = old[i + 1:]
+        known = old_j >= 0
+        a = np.minimum(old[i], old_j[known])
+        b = np.maximum(old[i], old_j[known])
+        distances[start + np.flatnonzero(known)] = old_distances[
+            _condensed_index(n_old, a, b)]
+
+        missing_i.append(np.repeat(i, len(j) - len(a)))
+        missing_j.append(j[~known])
+
+    n_computed = 0
+
+    if missing_i:
+        missing_i = np.concatenate(missing_i)
+        missing_j = np.concatenate(missing_j)
+        n_computed = len(missing_i)
+
+        if n_computed:
+            # Computed distances are rounded as the stored ones, so that
+            # the result does not depend on the content of the store.
+            distances[_condensed_index(n_samples, missing_i, missing_j)] = \
+                compute(missing_i, missing_j).astype(np.float32)
+
+    return distances, n_computed
+
+
+class DistanceStore(object):
+    """Condensed distance matrices of blocks, stored in a directory.
+
+    The modification times of the files are refreshed on each hit, so that
+    the least recently used entries are evicted first once the total size
+    of the directory exceeds ``max_size``.
+
+    :param directory:
+        The directory holding the files. It is created if needed.
+
+    :param max_size:
+        The maximum total size of the files, in bytes.
+    """
+
+    def __init__(self, directory, max_size):
+        """Initialize the store in the given directory."""
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.computed_pairs = 0
+        self.reused_pairs = 0
+
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    def _digest(self, key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _keys_path(self, digest):
+        return os.path.join(self.directory, digest + '.keys')
+
+    def _matrix_path(self, digest, keys):
+        token = hashlib.sha1('\n'.join(keys).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory,
+                            '{0}-{1}.npy'.format(digest, token))
+
+    def load(self, key):
+        """Return the signature keys and the memory-mapped matrix of a key.
+
+        :return:
+            A tuple ``(keys, distances)``, or None if the key is missing.
+        """
+        digest = self._digest(key)
+        keys_path = self._keys_path(digest)
+
+        try:
+            with open(keys_path, 'rb') as fp:
+                keys = fp.read().decode('utf-8').split('\n')
+
+            matrix_path = self._matrix_path(digest, keys)
+            distances = np.load(matrix_path, mmap_mode='r')
+
+            os.utime(keys_path, None)
+            os.utime(matrix_path, None)
+        except (IOError, OSError, ValueError):
+            # Missing, or replaced by another process meanwhile.
+            return None
+
+        if len(distances) != len(keys) * (len(keys) - 1) // 2:
+            return None
+
+        return keys, distances
+
+    def save(self, key, keys, distances):
+        """Store the matrix of a key and evict the least recently used ones.
+
+        :param keys:
+            The content keys of the signatures, as strings.
+
+        :param distances:
+            The condensed distance matrix, stored as float32.
+        """
+        digest = self._digest(key)
+        matrix_path = self._matrix_path(digest, keys)
+
+        self._write(matrix_path, lambda fp: np.save(
+            fp, np.asarray(distances, dtype=np.float32)))
+        self._write(self._keys_path(digest),
+                    lambda fp: fp.write('\n'.join(keys).encode('utf-8')))
+
+        # Matrices of previous versions of the block.
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+
+            if name.startswith(digest + '-') and path != matrix_path:
+                self._remove(path)
+
+        self._evict()
+
+    def _write(self, path, write):
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                write(fp)
+
+            os.rename(temporary, path)
+        except:
+            os.remove(temporary)
+            raise
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """List the entries as (mtime, size, paths) tuples."""
+        entries = {}
+
+        for name in os.listdir(self.directory):
+            if not name.endswith(('.keys', '.npy')):
+                continue
+
+            path = os.path.join(self.directory, name)
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another process meanwhile.
+                continue
+
+            digest = name.split('-')[0].split('.')[0]
+            mtime, size, paths = entries.get(digest, (0, 0, []))
+            entries[digest] = (max(mtime, stat.st_mtime),
+                               size + stat.st_size, paths + [path])
+
+        return list(entries.values())
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, paths in entries:
+            if total <= self.max_size:
+                break
+
+            for path in paths:
+                self._remove(path)
+
+            total -= size
+
+    def distances(self, key, X, compute):
+        """Return the condensed distance matrix of a block.
+
+        :param key:
+            The key of the block, which must change with the distance model.
+
+        :param X:
+            An array of shape (n_signatures, 1) of signatures.
+
+        :param compute:
+            A function ``compute(i, j)`` scoring pairs of signatures of X.
+
+        :return:
+            The condensed distance matrix, with float32 precision.
+        """
+        record_keys = {}
+        keys = [signature_key(signature, record_keys)
+                for signature in X[:, 0]]
+        stored = self.load(key)
+
+        if stored is None:
+            self.misses += 1
+            stored = ([], np.zeros(0, dtype=np.float32))
+        else:
+            self.hits += 1
+
+        distances, n_computed = splice_distances(keys, stored[0], stored[1],
+                                                 compute)
+
+        self.computed_pairs += n_computed
+        self.reused_pairs += len(distances) - n_computed
+
+        if keys != stored[0]:
+            self.save(key, keys, distances)
+
+        return distances
+
+    def clear(self):
+        """Remove all the entries and reset the counters."""
+        for _, _, paths in self._entries():
+            for path in paths:
+                self._remove(path)
+
+        self.hits = 0
+        self.misses = 0
+        self.computed_pairs = 0
+        self.reused_pairs = 0
+
+    def stats(self):
+        """Return the counters of the store.
+
+        Example:
+            {'entries': 3, 'size': 1200, 'max_size': 10000, 'hits': 2,
+             'misses': 1, 'computed_pairs': 40, 'reused_pairs': 300}
+        """
+        entries = self._entries()
+
+        return {
+            'entries': len(entries),
+            'size': sum(size for _, size, _ in entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'computed_pairs': self.computed_pairs,
+            'reused_pairs': self.reused_pairs,
+        }
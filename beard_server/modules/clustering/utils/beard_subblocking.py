@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Size-aware blocking of the signatures.
+
+Phonetic blocking puts all the signatures of a frequent surname into the
+same block, whose clustering has a quadratic cost. ``block_size_aware``
+splits the blocks larger than a given size, by first initial, then by
+given names and finally by groups of signatures connected through their
+coauthors or collaborations, until they are small enough.
+
+The clusters of a block split this way may belong to the same author, e.g.
+"Wang, Y." and "Wang, Yi". ``link_subblocks`` compares, for a bounded
+number of pairs of signatures, the clusters of compatible sub-blocks of the
+same block and merges the ones which are close enough.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import heapq
+import logging
+
+import numpy as np
+import scipy.sparse as sp
+
+from scipy.sparse.csgraph import connected_components
+
+from .beard_cascade import _coauthor_matrix
+from .beard_utils import get_author_other_names
+from .beard_utils import get_first_initial
+
+logger = logging.getLogger(__name__)
+
+# Separator of the levels of the sub-block keys.
+SEPARATOR = "\t"
+
+
+def _first_initials(X):
+    """Sub-block keys from the first initials."""
+    return [get_first_initial(signature) for signature in X[:, 0]]
+
+
+def _given_names(X):
+    """Sub-block keys from the given names."""
+    return [get_author_other_names(signature) for signature in X[:, 0]]
+
+
+def _coauthor_groups(X):
+    """Sub-block keys from the groups of signatures sharing coauthors.
+
+    Two signatures are in the same group if they are connected through
+    a chain of common coauthors or collaborations.
+    """
+    incidence = _coauthor_matrix(X, collaborations=True)
+    n_samples, n_coauthors = incidence.shape
+
+    # Bipartite graph of the signatures and their coauthors.
+    incidence = incidence.tocoo()
+    graph = sp.coo_matrix((incidence.data,
+                           (incidence.row, incidence.col + n_samples)),
+                          shape=(n_samples + n_coauthors,) * 2)
+
+    _, components = connected_components(graph, directed=False)
+
+    return ["%d" % component for component in components[:n_samples]]
+
+
+LEVELS = [_first_initials, _given_names, _coauthor_groups]
+
+
+def block_size_aware(X, blocking, max_block_size, split_coauthors=True):
+    """Block the signatures, splitting the blocks which are too large.
+
+    :param X:
+        An array of shape (n_signatures, 1) of signatures.
+
+    :param blocking:
+        The blocking function applied first, e.g. ``block_phonetic``.
+
+    :param max_block_size:
+        The size above which a block is split at the next level.
+
+    :param split_coauthors:
+        If False, blocks are only split by initials and given names.
+
+    :return:
+        An array of block keys. Keys of split blocks are made of the key of
+        the block and of the key of each level, joined by ``SEPARATOR``.
+    """
+    keys = np.array([unicode(key) for key in blocking(X)], dtype=np.object)
+    levels = LEVELS if split_coauthors else LEVELS[:-1]
+
+    pending = [(members, 0) for members in
+               _group(keys, np.arange(len(X)))]
+
+    while pending:
+        members, level = pending.pop()
+
+        if len(members) <= max_block_size or level == len(levels):
+            continue
+
+        values = levels[level](X[members])
+        keys[members] += SEPARATOR
+        keys[members] += np.array(values, dtype=np.object)
+
+        pending.extend((group, level + 1)
+                       for group in _group(keys, members))
+
+    return keys
+
+
+def _group(keys, members):
+    """Group the given samples by their keys."""
+    groups = {}
+
+    for member in members:
+        groups.setdefault(keys[member], []).append(member)
+
+    return [np.array(group) for group in groups.values()]
+
+
+def _tokens_compatible(a, b):
+    """Check if two tokens are equal or one is the initial of the other."""
+    return (a == b or (len(a) == 1 and b.startswith(a)) or
+            (len(b) == 1 and a.startswith(b)))
+
+
+def _names_compatible(a, b):
+    """Check if two normalized given names may be of the same person.
+
+    Names are compatible if each token of the shorter name matches its own
+    token of the other name, being equal or an initial of it, e.g. "y" and
+    "nan yi". Normalized names have sorted tokens, so the order of the
+    tokens is not taken into account.
+    """
+    tokens_a = a.split()
+    tokens_b = b.split()
+
+    if len(tokens_a) > len(tokens_b):
+        tokens_a, tokens_b = tokens_b, tokens_a
+
+    # Full tokens are matched before initials.
+    for token in sorted(tokens_a, key=len, reverse=True):
+        for other in tokens_b:
+            if _tokens_compatible(token, other):
+                tokens_b.remove(other)
+                break
+        else:
+            return False
+
+    return True
+
+
+def _keys_compatible(a, b):
+    """Check if two sub-blocks of the same block may share an author."""
+    levels_a = a.split(SEPARATOR)[1:]
+    levels_b = b.split(SEPARATOR)[1:]
+
+    for level, (value_a, value_b) in enumerate(zip(levels_a, levels_b)):
+        if level == 2:
+            # Coauthor groups only divide the signatures by size.
+            continue
+
+        if value_a and value_b and not _names_compatible(value_a, value_b):
+            return False
+
+    return True
+
+
+def _representatives(members, n_representatives):
+    """Pick evenly spread members of a cluster."""
+    if len(members) <= n_representatives:
+        return members
+
+    positions = np.linspace(0, len(members) - 1, n_representatives)
+
+    return members[positions.astype(np.int64)]
+
+
+def _cluster_pairs(keys, clusters):
+    """Iterate over the pairs of clusters of compatible sub-blocks."""
+    for position, key_a in enumerate(keys):
+        for key_b in keys[position + 1:]:
+            if _keys_compatible(key_a, key_b):
+                for members_a in clusters[key_a]:
+                    for members_b in clusters[key_b]:
+                        yield members_a, members_b
+
+
+def _average_linkage(linked, sums, counts, threshold):
+    """Merge the compared clusters by average linkage.
+
+    Groups of clusters are merged by increasing average distance of their
+    representatives, while it is at most ``threshold``. A merged group is
+    only compared with the groups compared with all its clusters, thus
+    merges do not chain clusters which were not compared, e.g. "Yi" and
+    "Yan" through "Y".
+
+    :param linked:
+        The pairs of labels of the compared clusters.
+
+    :param sums:
+        The sums of the distances of the pairs of representatives.
+
+    :param counts:
+        The numbers of pairs of representatives.
+
+    :return:
+        A dict of the labels of the merged clusters to the smallest label
+        of their group.
+    """
+    groups = {}
+    edges = {}
+    heap = []
+
+    for (label_a, label_b), total, count in zip(linked, sums, counts):
+        groups.setdefault(label_a, [label_a])
+        groups.setdefault(label_b, [label_b])
+        edges.setdefault(label_a, {})[label_b] = (total, count)
+        edges.setdefault(label_b, {})[label_a] = (total, count)
+        heap.append((total / count, label_a, label_b))
+
+    heapq.heapify(heap)
+    # Merged groups get new ids, which outdates the entries of their parts.
+    next_id = max(groups) + 1
+
+    while heap:
+        average, group_a, group_b = heapq.heappop(heap)
+
+        if average > threshold:
+            break
+
+        if group_a not in groups or group_b not in groups:
+            continue
+
+        merged = next_id
+        next_id += 1
+        groups[merged] = groups.pop(group_a) + groups.pop(group_b)
+        edges_a = edges.pop(group_a)
+        edges_b = edges.pop(group_b)
+        edges[merged] = {}
+
+        for other in set(edges_a) | set(edges_b):
+            if other in (group_a, group_b):
+                continue
+
+            edges[other].pop(group_a, None)
+            edges[other].pop(group_b, None)
+
+            if other in edges_a and other in edges_b:
+                total = edges_a[other][0] + edges_b[other][0]
+                count = edges_a[other][1] + edges_b[other][1]
+                edges[merged][other] = edges[other][merged] = (total, count)
+                heapq.heappush(heap, (total / count, merged, other))
+
+    return dict((label, min(members))
+                for members in groups.values() if len(members) > 1
+                for label in members)
+
+
+def link_subblocks(X, labels, blocks, affinity, threshold,
+                   n_representatives=5, max_pairs=100000):
+    """Merge the clusters of the sub-blocks of a block.
+
+    :param X:
+        An array of shape (n_signatures, 1) of signatures.
+
+    :param labels:
+        The cluster labels of the signatures.
+
+    :param blocks:
+        The block keys returned by ``block_size_aware``.
+
+    :param affinity:
+        A function ``affinity(X, i, j)`` returning the distances of the
+        pairs of signatures ``(X[i], X[j])``.
+
+    :param threshold:
+        The largest average distance at which two clusters are merged.
+        Clusters are merged by average linkage over their representatives,
+        see ``_average_linkage``.
+
+    :param n_representatives:
+        The number of signatures of a cluster compared with the signatures
+        of other clusters.
+
+    :param max_pairs:
+        The maximum number of pairs of signatures scored in a block.
+
+    :return:
+        An array of labels. Merged clusters take the smallest of their
+        labels, the other labels are unchanged.
+    """
+    labels = np.asarray(labels)
+    blocks = np.asarray(blocks, dtype=np.object)
+    merged = {}
+
+    by_block = {}
+
+    for index, key in enumerate(blocks):
+        if SEPARATOR in key:
+            base = key.split(SEPARATOR, 1)[0]
+            by_block.setdefault(base, {}).setdefault(key, []).append(index)
+
+    for base, sub_blocks in sorted(by_block.items()):
+        if len(sub_blocks) < 2:
+            continue
+
+        keys = sorted(sub_blocks)
+        clusters = {}
+
+        for key in keys:
+            members = np.array(sub_blocks[key])
+            for label in np.unique(labels[members]):
+                clusters.setdefault(key, []).append(_representatives(
+                    members[labels[members] == label], n_representatives))
+
+        pair_i = []
+        pair_j = []
+        pair_ids = []
+        linked = []
+        budget = max_pairs
+
+        for members_a, members_b in _cluster_pairs(keys, clusters):
+            n_pairs = len(members_a) * len(members_b)
+
+            if n_pairs > budget:
+                logger.warning("Linking of the sub-blocks of %s stopped "
+                               "after %d pairs.", base, max_pairs - budget)
+                break
+
+            budget -= n_pairs
+            a, b = np.meshgrid(members_a, members_b)
+            pair_i.append(a.ravel())
+            pair_j.append(b.ravel())
+            pair_ids.append(np.repeat(len(linked), n_pairs))
+            linked.append((labels[members_a[0]], labels[members_b[0]]))
+
+        if not linked:
+            continue
+
+        pair_i = np.concatenate(pair_i)
+        pair_j = np.concatenate(pair_j)
+        pair_ids = np.concatenate(pair_ids)
+
+        # Only the representatives are passed to the affinity.
+        representatives, inverse = np.unique(
+            np.concatenate((pair_i, pair_j)), return_inverse=True)
+        distances = affinity(X[representatives], inverse[:len(pair_i)],
+                             inverse[len(pair_i):])
+        merged.update(_average_linkage(
+            linked, np.bincount(pair_ids, weights=distances),
+            np.bincount(pair_ids), threshold))
+
+    return np.array([merged.get(label, label) for label in labels],
+                    dtype=labels.dtype)
+
+
+def block_histogram(blocks):
+    """Count the blocks by size, in powers of two.
+
+    :return:
+        A sorted list of ``(smallest size, number of blocks)`` tuples, where
+        each bucket holds the blocks of sizes up to twice its smallest size.
+
+        Example:
+            [(1, 120), (2, 31), (4, 12), (1024, 1)]
+    """
+    _, sizes = np.unique(np.asarray(blocks, dtype=np.object),
+                         return_counts=True)
+    buckets = 2 ** np.floor(np.log2(sizes)).astype(np.int64)
+    values, counts = np.unique(buckets, return_counts=True)
+
+    return list(zip(values.tolist(), counts.tolist()))
+
+
+def log_block_sizes(blocks, name="blocks"):
+    """Log the histogram of the sizes of the blocks."""
+    if len(blocks) == 0:
+        return
+
+    histogram = block_histogram(blocks)
+    logger.info("Sizes of %d %s: %s", sum(count for _, count in histogram),
+                name, ", ".join("%d-%d: %d" % (size, 2 * size - 1, count)
+                                for size, count in histogram))
@@ -14,10 +14,76 @@
 
 """
 
-from beard.utils import given_name
-from beard.utils import name_initials
+import numpy as np
+
 from beard.utils import normalize_name
-from beard.utils import given_name_initial
+
+from .beard_names import name_forms
+
+
+class IndexedRecord(dict):
+    """A record, with the strings read by the getters computed once.
+
+    ``load_signatures`` attaches it to every signature of the record, thus
+    the getters do not join its lists nor search its authors again for
+    every signature. It is equal to the record and serialized as it; its
+    fields must not change once read by the getters.
+    """
+
+    def __init__(self, record):
+        """Copy the fields of the record."""
+        super(IndexedRecord, self).__init__(record)
+        self._joined = {}
+        self._positions = None
+        self._windows = {}
+
+    def __reduce__(self):
+        """Copy and pickle the fields only."""
+        return IndexedRecord, (dict(self),)
+
+    def joined(self, field):
+        """Return the items of a list field, joined with spaces."""
+        try:
+            return self._joined[field]
+        except KeyError:
+            joined = self._joined[field] = " ".join(self[field])
+            return joined
+
+    def coauthors(self, author_name, range):
+        """Return the authors around the first position of an author.
+
+        All the authors are returned if the author is not in the list.
+        """
+        if self._positions is None:
+            positions = {}
+            for position, name in enumerate(self["authors"]):
+                positions.setdefault(name, position)
+            self._positions = positions
+
+        index = self._positions.get(author_name)
+
+        if index is None:
+            return self.joined("authors")
+
+        key = (index, range)
+
+        try:
+            return self._windows[key]
+        except KeyError:
+            v = self["authors"]
+            window = self._windows[key] = " ".join(
+                v[max(0, index-range):min(len(v), index+range)])
+            return window
+
+
+def _joined(s, field):
+    """Join the items of a field of the publication with spaces."""
+    record = s["publication"]
+
+    if isinstance(record, IndexedRecord):
+        return record.joined(field)
+
+    return " ".join(record[field])
 
 
 def load_signatures(signatures_filename, records_filename):
@@ -34,7 +100,8 @@ def load_signatures(signatures_filename, records_filename):
     Returns
     -------
     :returns: tuple
-        Signatures and records. Both are lists of dictionaries.
+        Signatures and records. Both are dictionaries, by identifier.
+        Records are ``IndexedRecord`` copies of the given ones.
     """
     signatures = signatures_filename
     records = records_filename
@@ -43,7 +110,10 @@ def load_signatures(signatures_filename, records_filename):
         signatures = {s["signature_id"]: s for s in signatures}
 
     if isinstance(records, list):
-        records = {r["publication_id"]: r for r in records}
+        records = {r["publication_id"]: IndexedRecord(r) for r in records}
+    else:
+        records = {publication_id: IndexedRecord(r)
+                   for publication_id, r in records.items()}
 
     for signature_id, signature in signatures.items():
         signature["publication"] = records[signature["publication_id"]]
@@ -51,6 +121,27 @@ def load_signatures(signatures_filename, records_filename):
     return signatures, records
 
 
+def as_column(signatures):
+    """Put the signatures into an object array of shape (n, 1).
+
+    Parameters
+    ----------
+    :param signatures: list
+        Signatures, as dictionaries.
+
+    Returns
+    -------
+    :returns: numpy array
+        The array expected by the getters and the blocking functions.
+    """
+    X = np.empty((len(signatures), 1), dtype=np.object)
+
+    for index, signature in enumerate(signatures):
+        X[index, 0] = signature
+
+    return X
+
+
 def get_author_full_name(s):
     """Get author full name from the signature.
 
@@ -64,8 +155,7 @@ def get_author_full_name(s):
     :returns: string
         Normalized author name
     """
-    v = s["author_name"]
-    v = normalize_name(v) if v else ""
+    v = name_forms(s["author_name"]).full_name
     return v
 
 
@@ -82,7 +172,7 @@ def get_first_given_name(s):
     :returns: string
         Author's first given name
     """
-    v = given_name(s["author_name"], 0)
+    v = name_forms(s["author_name"]).first_given_name
     return v
 
 
@@ -99,16 +189,16 @@ def get_second_given_name(s):
     :returns: string
         Author's second given name
     """
-    v = given_name(s["author_name"], 1)
+    v = name_forms(s["author_name"]).second_given_name
     return v
 
 
 def get_surname(s):
-    return s['author_name'].split(" ")[0].split(",")[0]
+    return name_forms(s['author_name']).surname
 
 
 def get_first_initial(s):
-    v = given_name_initial(s["author_name"], 0)
+    v = name_forms(s["author_name"]).first_initial
     try:
         return v
     except IndexError:
@@ -128,7 +218,7 @@ def get_second_initial(s):
     :returns: string
         Second given name's initial. Empty string in case it's not available.
     """
-    v = given_name_initial(s["author_name"], 1)
+    v = name_forms(s["author_name"]).second_initial
     try:
         return v
     except IndexError:
@@ -148,9 +238,7 @@ def get_author_other_names(s):
     :returns: string
         Normalized other author names
     """
-    v = s["author_name"]
-    v = v.split(",", 1)
-    v = normalize_name(v[1]) if len(v) == 2 else ""
+    v = name_forms(s["author_name"]).other_names
     return v
 
 
@@ -167,9 +255,7 @@ def get_author_initials(s):
     :returns: string
         Initials, not separated
     """
-    v = s["author_name"]
-    v = v if v else ""
-    v = "".join(name_initials(v))
+    v = name_forms(s["author_name"]).initials
     return v
 
 
@@ -258,8 +344,7 @@ def get_coauthors(s):
     :returns: string
         Coauthors ids separated by a space
     """
-    v = s["publication"]["authors"]
-    v = " ".join(v)
+    v = _joined(s, "authors")
     return v
 
 
@@ -287,7 +372,11 @@ def get_coauthors_from_range(s, range=10):
     :returns: string
         Coauthors ids separated by a space
     """
-    v = s["publication"]["authors"]
+    record = s["publication"]
+    if isinstance(record, IndexedRecord):
+        return record.coauthors(s["author_name"], range)
+
+    v = record["authors"]
     try:
         index = v.index(s["author_name"])
         v = " ".join(v[max(0, index-range):min(len(v), index+range)])
@@ -310,8 +399,7 @@ def get_keywords(s):
     :returns: string
         Keywords separated by a space
     """
-    v = s["publication"]["keywords"]
-    v = " ".join(v)
+    v = _joined(s, "keywords")
     return v
 
 
@@ -346,8 +434,7 @@ def get_collaborations(s):
     :returns: string
         Collaboations separated by a space
     """
-    v = s["publication"]["collaborations"]
-    v = " ".join(v)
+    v = _joined(s, "collaborations")
     return v
 
 
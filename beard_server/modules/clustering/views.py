@@ -29,6 +29,10 @@ from __future__ import absolute_import, division, print_function, \
 
 from flask import abort, Blueprint, jsonify, request
 
+from beard_server.jobs import respond_async, submit_response
+from beard_server.records import MissingRecords, record_store, \
+    resolve_records
+
 from .beard import predict as clustering
 from .beard import train as learn_model
 
@@ -147,6 +151,47 @@ def available_methods():
                     "success": True
                 }
             }
+        },
+        "records": {
+            "path": "/api/clustering/records",
+            "method": "[POST]",
+            "example": {
+                "body": {
+                    "records": [{
+                        "title": "".join(["Towards graphene-based detectors",
+                                "for dark matter directional detection"]),
+                        "year": 2015,
+                        "publication_id": 1395222,
+                        "authors": ["Wang, Shang-Yung"]
+                    }]
+                },
+                "header": {
+                    "Accept": "application/json",
+                    "Content-Type": "application/json"
+                },
+                "response": {
+                    "refs": [{
+                        "publication_id": 1395222,
+                        "record_hash": "<SHA-1 of the record>"
+                    }]
+                }
+            }
+        },
+        "missing_records": {
+            "path": "/api/clustering/records/missing",
+            "method": "[POST]",
+            "example": {
+                "body": {
+                    "hashes": ["<SHA-1 of the record>"]
+                },
+                "header": {
+                    "Accept": "application/json",
+                    "Content-Type": "application/json"
+                },
+                "response": {
+                    "missing": ["<SHA-1 of the record>"]
+                }
+            }
         }
     }
 
@@ -165,6 +210,16 @@ def make_clusters():
         # Missing data.
         abort(400)
 
+    try:
+        records = resolve_records(records, store=record_store)
+    except (MissingRecords, ValueError):
+        # Referenced records were not uploaded.
+        abort(400)
+
+    if respond_async():
+        return submit_response('clustering.clusters', clustering, records,
+                               signatures)
+
     try:
         return jsonify(clustering(records, signatures))
     except IOError:  # pragma: no cover
@@ -185,11 +240,54 @@ def train_model():
         # Missing data.
         abort(400)
 
-    try:
-        learn_model(clusters, records, signatures)
+    if respond_async():
+        return submit_response('clustering.train', _train, clusters,
+                               records, signatures)
 
+    try:
         # Acknowledge successful training.
-        return jsonify({"success": True})
+        return jsonify(_train(clusters, records, signatures))
     except:
         # Training of a new model has failed.
         abort(500)
+
+
+@blueprint.route('/records', methods=['POST'])
+def put_records():
+    """Store records and return their references."""
+    data = request.get_json(silent=True)
+
+    if record_store is None:
+        abort(404)
+
+    try:
+        records = data['records']
+    except (KeyError, TypeError):
+        # Missing data.
+        abort(400)
+
+    return jsonify({"refs": record_store.put_many(records)})
+
+
+@blueprint.route('/records/missing', methods=['POST'])
+def missing_records():
+    """Return the hashes of the records which are not stored yet."""
+    data = request.get_json(silent=True)
+
+    if record_store is None:
+        abort(404)
+
+    try:
+        missing = record_store.missing(data['hashes'])
+    except (KeyError, TypeError, ValueError):
+        # Missing data or invalid hashes.
+        abort(400)
+
+    return jsonify({"missing": missing})
+
+
+def _train(clusters, records, signatures):
+    """Train a model, as a job."""
+    learn_model(clusters, records, signatures)
+
+    return {"success": True}
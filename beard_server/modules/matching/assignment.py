@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Methods to solve matching problem as an assignment problem."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+import scipy.sparse as sp
+
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse.csgraph import connected_components
+
+from .cost import _cost_from_counts, _overlaps
+
+
+def _components(intersections):
+    """Label the connected components of the graph of overlapping clusters.
+
+    :return:
+        A tuple of the number of components and of the component labels of
+        the clusters before and of the clusters after.
+    """
+    n_before, n_after = intersections.shape
+    graph = sp.bmat([[None, intersections], [intersections.T, None]],
+                    format='csr')
+    n_labels, labels = connected_components(graph, directed=False)
+
+    return n_labels, labels[:n_before], labels[n_before:]
+
+
+def _group(labels, n_labels):
+    """Group the indices by label.
+
+    :return:
+        A tuple of the indices sorted by label, the offsets of the labels in
+        them and the position of each index within its label.
+    """
+    order = np.argsort(labels, kind='mergesort')
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(
+        labels, minlength=n_labels))))
+    positions = np.empty(len(labels), dtype=np.int64)
+    positions[order] = np.arange(len(labels)) - offsets[labels[order]]
+
+    return order, offsets, positions
+
+
+def _solve_component(rows, columns, counts, sizes_before, sizes_after):
+    """Assign the clusters after of a component, as ``_solve_clusters``.
+
+    :param rows:
+        Positions of the clusters before of the overlaps in the component.
+
+    :param columns:
+        Positions of the clusters after of the overlaps in the component.
+
+    :param counts:
+        Numbers of common signatures of the overlaps.
+
+    :return:
+        For each cluster after, the position of its cluster before, or -1
+        if it is assigned to a virtual cluster.
+    """
+    n_before = len(sizes_before)
+    n_after = len(sizes_after)
+
+    # One virtual (empty) cluster per cluster after.
+    sizes_before = np.concatenate((sizes_before,
+                                   np.zeros(n_after, dtype=np.int64)))
+
+    cost = _cost_from_counts(rows, columns, counts,
+                             sizes_before, sizes_after)
+
+    # Each row of the transposed matrix, a cluster after, is assigned.
+    _, matched = linear_sum_assignment(cost.T)
+
+    return np.where(matched < n_before, matched, -1)
+
+
+def _solve_clusters(clusters_before, clusters_after):
+    """Solve the matching problem as a minimum cost assignment.
+
+    Each cluster from the-state-after is assigned to exactly one of the
+    clusters from the-state-before or to one of the virtual (empty)
+    clusters, while each cluster from the-state-before is assigned to at
+    most one cluster. This is the problem solved by the simplex method in
+    ``simplex._solve_clusters``, solved here with the Hungarian algorithm
+    on the rectangular cost matrix, without building the constraints of
+    the linear program.
+
+    Clusters without common signatures are never matched, as the virtual
+    cluster has a lower cost. The assignment is thus solved for each
+    connected component of the overlaps separately, with a dense cost
+    matrix of the size of the component only. A single component
+    spanning most of the clusters still needs a dense matrix of the
+    clusters of the component.
+
+    :param clusters_before:
+        A dictionary of sets representing clusters from the-state-before.
+
+        Example:
+            clusters_before = {1: set(['A', 'B']), 2: set(['C'])}
+
+    :param clusters_after:
+        A dictionary of sets representing clusters from the-state-after.
+
+        Example:
+            clusters_after = {3: set(['B']), 4: set(['A', 'C'])}
+
+    :return:
+        A tuple containing three buckets, representing **keys** of matched
+        clusters (as pairs), new ones and removed.
+
+        Example:
+            ([(1, 2)], [3], [])
+    """
+    len_before = len(clusters_before)
+    len_after = len(clusters_after)
+
+    # Copies of the given dictionaries, as dictionaries with enumerated keys.
+    clusters_before_copy = {}
+    cluster_after_copy = {}
+    key_map = []
+
+    for index, key in enumerate(clusters_before):
+        clusters_before_copy[index] = clusters_before[key]
+        key_map.append(key)
+
+    for index, key in enumerate(clusters_after):
+        cluster_after_copy[index] = clusters_after[key]
+        key_map.append(key)
+
+    bucket_pairs = []
+    bucket_new = []
+    bucket_remove = []
+
+    # Cluster from the-state-before (or virtual one) matched with each
+    # cluster from the-state-after.
+    matched = np.empty(len_after, dtype=np.int64)
+
+    if len_after:
+        intersections, sizes_before, sizes_after = _overlaps(
+            clusters_before_copy, cluster_after_copy)
+        n_labels, labels_before, labels_after = _components(intersections)
+
+        # Clusters and overlaps of each component, grouped at once rather
+        # than slicing the sparse matrix for every component.
+        order_before, offsets_before, positions_before = _group(
+            labels_before, n_labels)
+        order_after, offsets_after, positions_after = _group(
+            labels_after, n_labels)
+
+        overlaps = intersections.tocoo()
+        labels = labels_after[overlaps.col]
+        order = np.argsort(labels, kind='mergesort')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(
+            labels, minlength=n_labels))))
+        rows = positions_before[overlaps.row[order]]
+        columns = positions_after[overlaps.col[order]]
+        counts = overlaps.data[order]
+
+        matched[:] = len_before
+
+        for label in np.unique(labels_after):
+            before = order_before[offsets_before[label]:
+                                  offsets_before[label + 1]]
+            after = order_after[offsets_after[label]:
+                                offsets_after[label + 1]]
+            overlap = slice(offsets[label], offsets[label + 1])
+
+            if not len(before):
+                continue
+
+            assigned = _solve_component(
+                rows[overlap], columns[overlap], counts[overlap],
+                sizes_before[before], sizes_after[after])
+            found = assigned >= 0
+            matched[after[found]] = before[assigned[found]]
+
+    matched_before = {}
+
+    for index_after, index_first in enumerate(matched):
+        if index_first < len_before:
+            matched_before[index_first] = index_after
+        else:
+            # All the virtual clusters are equivalent, thus new clusters
+            # are listed in the order of the-state-after.
+            bucket_new.append(key_map[len_before + index_after])
+
+    for index_first in range(len_before):
+        if index_first in matched_before:
+            bucket_pairs.append((
+                key_map[index_first],
+                key_map[len_before + matched_before[index_first]]))
+        else:
+            bucket_remove.append(key_map[index_first])
+
+    return bucket_pairs, bucket_new, bucket_remove
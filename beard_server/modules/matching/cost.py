@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Methods to compute the costs of matching clusters."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def _incidence(clusters, signature_index):
+    """Build a sparse matrix of clusters (rows) by signatures (columns).
+
+    Signatures missing from ``signature_index`` are added to it.
+    """
+    rows = []
+    columns = []
+
+    for index in range(len(clusters)):
+        for signature in set(clusters[index]):
+            rows.append(index)
+            columns.append(signature_index.setdefault(signature,
+                                                      len(signature_index)))
+
+    return rows, columns
+
+
+def _overlaps(clusters_before, clusters_after):
+    """Count the signatures shared by the clusters.
+
+    The counts are computed from an inverted signature -> cluster index,
+    thus only for the pairs of clusters which share at least one signature.
+
+    :param clusters_before:
+        A dictionary of sets representing clusters from the-state-before,
+        with enumerated keys.
+
+        Example:
+            clusters_before = {0: set(['A', 'B']), 1: set(['C'])}
+
+    :param clusters_after:
+        A dictionary of sets representing clusters from the-state-after,
+        with enumerated keys.
+
+        Example:
+            clusters_after = {0: set(['B']), 1: set(['A', 'C'])}
+
+    :return:
+        A tuple of the sparse matrix of intersection sizes (in CSR format)
+        and of the sizes of the clusters before and after.
+
+        Example:
+            (<2x2 sparse matrix with 3 stored elements>,
+             array([2, 1]), array([1, 2]))
+    """
+    signature_index = {}
+    rows_before, columns_before = _incidence(clusters_before,
+                                             signature_index)
+    rows_after, columns_after = _incidence(clusters_after, signature_index)
+
+    n_signatures = len(signature_index)
+    before = sp.csr_matrix(
+        (np.ones(len(rows_before), dtype=np.int64),
+         (rows_before, columns_before)),
+        shape=(len(clusters_before), n_signatures))
+    after = sp.csr_matrix(
+        (np.ones(len(rows_after), dtype=np.int64),
+         (rows_after, columns_after)),
+        shape=(len(clusters_after), n_signatures))
+
+    intersections = (before * after.T).tocsr()
+    intersections.eliminate_zeros()
+
+    return (intersections,
+            np.asarray(before.sum(axis=1)).ravel(),
+            np.asarray(after.sum(axis=1)).ravel())
+
+
+def _cost_from_counts(rows, columns, counts, sizes_before, sizes_after):
+    """Compute the cost matrix from the overlapping pairs of clusters.
+
+    The cost of a pair of clusters is minus the size of their intersection
+    and a tie-breaking term, inversely proportional to the size of their
+    symmetric difference. Pairs without common signatures get the closed
+    form ``-1 / (n_after * (1 + |before| + |after|))``.
+
+    :param rows:
+        Indices of the clusters before of the overlapping pairs.
+
+    :param columns:
+        Indices of the clusters after of the overlapping pairs.
+
+    :param counts:
+        Numbers of common signatures of the overlapping pairs.
+    """
+    n_after = len(sizes_after)
+
+    sizes = sizes_before[:, np.newaxis] + sizes_after[np.newaxis, :]
+    cost = -1. / (n_after * (1 + sizes))
+
+    symmetric_difference = sizes[rows, columns] - 2 * counts
+    cost[rows, columns] = -counts - 1. / (n_after *
+                                          (1 + symmetric_difference))
+
+    return cost
+
+
+def _cost_from_overlaps(intersections, sizes_before, sizes_after):
+    """Compute the cost matrix from the output of ``_overlaps``."""
+    overlaps = intersections.tocoo()
+
+    return _cost_from_counts(overlaps.row, overlaps.col, overlaps.data,
+                             sizes_before, sizes_after)
+
+
+def _cost_matrix(clusters_before, clusters_after):
+    """Compute costs for the matching solver.
+
+    Receives two partitions representing clusters in the state before
+    and after. Each the-state-before cluster is being used to calculate
+    the cost function against each of cluster from the the-state-after.
+    The cost function is calculating the overlap between members of the
+    two given sets.
+
+    :param clusters_before:
+        A dictionary of sets representing clusters from the-state-before,
+        with enumerated keys.
+
+        Example:
+            clusters_before = {0: set(['A', 'B']), 1: set(['C'])}
+
+    :param clusters_after:
+        A dictionary of sets representing clusters from the-state-after,
+        with enumerated keys.
+
+        Example:
+            clusters_after = {0: set(['B']), 1: set(['A', 'C'])}
+
+    :return:
+        A matrix of (clusters_before + clusters_after) x (clusters_after)
+        size containing all costs values for each pair of clusters.
+
+        Example:
+            [[-1.25       -1.16666667]
+             [-0.16666667 -1.25      ]
+             [-0.25       -0.16666667]
+             [-0.25       -0.16666667]]
+    """
+    return _cost_from_overlaps(*_overlaps(clusters_before, clusters_after))
@@ -27,7 +27,7 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from .simplex import _solve_clusters
+from .assignment import _solve_clusters
 
 from .subproblems import _divide_into_subproblems
 
@@ -30,52 +30,7 @@ from __future__ import absolute_import, division, print_function, \
 import numpy as np
 from scipy.optimize import linprog
 
-
-def _cost_matrix(clusters_before, clusters_after):
-    """Compute costs for the matching solver.
-
-    Receives two partitions representing clusters in the state before
-    and after. Each the-state-before cluster is being used to calculate
-    the cost function against each of cluster from the the-state-after.
-    The cost function is calculating the overlap between members of the
-    two given sets.
-
-    :param clusters_before:
-        A dictionary of sets representing clusters from the-state-before,
-        with enumerated keys.
-
-        Example:
-            clusters_before = {1: set(['A', 'B']), 2: set(['C'])}
-
-    :param clusters_after:
-        A dictionary of sets representing clusters from the-state-after,
-        with enumerated keys.
-
-        Example:
-            clusters_after = {1: set(['B']), 2: set(['A', 'C'])}
-
-    :return:
-        A matrix of (clusters_before + clusters_after) x (clusters_after)
-        size containing all costs values for each pair of clusters.
-
-        Example:
-            [[-1.25       -1.16666667]
-             [-0.16666667 -1.25      ]
-             [-0.25       -0.16666667]
-             [-0.25       -0.16666667]]
-    """
-    cost = np.zeros((len(clusters_before), len(clusters_after)))
-
-    for index_before, cluster_before in clusters_before.items():
-        for index_after, cluster_after in clusters_after.items():
-            cost[index_before, index_after] = -len(
-                set.intersection(
-                    set(cluster_before), set(cluster_after))) - 1. / \
-                (len(clusters_after) * (1 + len(
-                    set.symmetric_difference(set(cluster_before),
-                                             set(cluster_after)))))
-
-    return cost
+from .cost import _cost_matrix
 
 
 def _solve_clusters(clusters_before, clusters_after, maxiter=5000):
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Coreness model kept in memory by each web worker.
+
+The pipeline is taken from the model registry once and then handed out
+without touching the file. Only every ``check_interval`` seconds the
+registry compares the file with the loaded model and reloads it if it
+changed, e.g. when another worker trained a new one. The current model
+is a single attribute, replaced at once, thus requests never wait for a
+lock, nor see a half-loaded model.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+import time
+
+from collections import deque
+
+from beard_server import config
+from beard_server.registry import registry
+
+
+class LatencyStats(object):
+    """Count and summarize durations, e.g. of requests.
+
+    :param window:
+        The number of latest durations used for the percentiles.
+    """
+
+    def __init__(self, window=1000):
+        """Initialize empty statistics."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.latest = deque(maxlen=window)
+
+    def add(self, duration):
+        """Record a duration, in seconds."""
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.latest.append(duration)
+
+    def as_dict(self):
+        """Return the count, mean, median, 99th percentile and maximum."""
+        latest = sorted(self.latest)
+
+        def percentile(q):
+            if not latest:
+                return None
+
+            return latest[min(len(latest) - 1, int(q * len(latest)))]
+
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': percentile(0.5),
+            'p99': percentile(0.99),
+            'max': self.max if self.count else None,
+        }
+
+
+class CachedModel(object):
+    """A model of the registry checked for changes at most periodically.
+
+    :param path:
+        The path of the pickled model.
+
+    :param check_interval:
+        The number of seconds during which the model is handed out without
+        checking its file.
+    """
+
+    def __init__(self, path, check_interval):
+        """Initialize without loading the model."""
+        self.path = os.path.abspath(path)
+        self.check_interval = check_interval
+        # The model and the time of the next check.
+        self._current = None
+        self.loads = {'cold': LatencyStats(), 'reload': LatencyStats()}
+
+    def load(self):
+        """Return the model and how it was obtained.
+
+        :return:
+            A tuple of the model and of None if it was already loaded,
+            ``'cold'`` if it was loaded for the first time or ``'reload'``
+            if it was reloaded.
+        """
+        current = self._current
+
+        if current is not None and time.time() < current[1]:
+            return current[0], None
+
+        start = time.time()
+        model = registry.load(self.path)
+        elapsed = time.time() - start
+        event = None
+
+        if current is None:
+            event = 'cold'
+        elif model is not current[0]:
+            event = 'reload'
+
+        if event is not None:
+            self.loads[event].add(elapsed)
+
+        self._current = (model, time.time() + self.check_interval)
+
+        return model, event
+
+    def get(self):
+        """Return the model."""
+        return self.load()[0]
+
+    def publish(self, model):
+        """Store a new model and hand it out at once."""
+        registry.publish(self.path, model)
+        self._current = (model, time.time() + self.check_interval)
+
+    def stats(self):
+        """Return the loading times of the model."""
+        current = self._current
+
+        return {
+            'path': self.path,
+            'loaded': current is not None,
+            'check_interval': self.check_interval,
+            'loads': dict((event, stats.as_dict())
+                          for event, stats in self.loads.items()),
+        }
+
+
+coreness_model = CachedModel(
+    os.path.join(os.path.dirname(__file__), 'classifiers', 'linkage.dat'),
+    config.BEARD_SERVER_PREDICTOR_CHECK_INTERVAL)
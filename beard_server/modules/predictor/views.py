@@ -27,8 +27,7 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-import cPickle as pickle
-import os
+import time
 
 from flask import (
     abort,
@@ -36,9 +35,12 @@ from flask import (
     jsonify,
     request)
 
+from beard_server.jobs import respond_async, submit_response
+
 from .arxiv import (
     train as learn_model,
     predict as coreness)
+from .model import coreness_model, LatencyStats
 
 blueprint = Blueprint(
     'beard_server_predictor',
@@ -46,6 +48,13 @@ blueprint = Blueprint(
     url_prefix='/api/predictor',
 )
 
+# Latencies of the coreness requests, by how the model was obtained.
+latencies = {
+    'warm': LatencyStats(),
+    'cold': LatencyStats(),
+    'reload': LatencyStats(),
+}
+
 
 @blueprint.route('/', methods=['GET'])
 def available_methods():
@@ -147,6 +156,33 @@ def available_methods():
                     "success": True
                 }
             }
+        },
+        "stats": {
+            "path": "/api/predictor/stats",
+            "method": "[GET]",
+            "example": {
+                "response": {
+                    "requests": {
+                        "warm": {"count": 120, "mean": 0.003, "p50": 0.003,
+                                 "p99": 0.006, "max": 0.009},
+                        "cold": {"count": 1, "mean": 0.4, "p50": 0.4,
+                                 "p99": 0.4, "max": 0.4},
+                        "reload": {"count": 0, "mean": None, "p50": None,
+                                   "p99": None, "max": None}
+                    },
+                    "model": {
+                        "path": "/path/to/classifiers/linkage.dat",
+                        "loaded": True,
+                        "check_interval": 1.0,
+                        "loads": {"cold": {"count": 1, "mean": 0.39,
+                                           "p50": 0.39, "p99": 0.39,
+                                           "max": 0.39},
+                                  "reload": {"count": 0, "mean": None,
+                                             "p50": None, "p99": None,
+                                             "max": None}}
+                    }
+                }
+            }
         }
     }
 
@@ -161,22 +197,31 @@ def guess_coreness():
         # Missing data.
         abort(400)
 
-    try:
-        # Paths, where the model is stored.
-        distance_model_path = os.path.abspath(os.path.join(os.path.dirname(
-            __file__), 'classifiers/linkage.dat'))
+    start = time.time()
 
-        distance_model = pickle.load(open(distance_model_path, 'rb'))
+    try:
+        pipeline, event = coreness_model.load()
     except IOError:  # pragma: no cover
         # Probably the file does not exist, ie. the model was not trained.
         abort(404)
 
-    decision, scores = coreness(distance_model, coreness_data)
+    decision, scores = coreness(pipeline, coreness_data)
+    latencies[event or 'warm'].add(time.time() - start)
 
     return jsonify({"decision": decision,
                     "scores": scores.tolist()})
 
 
+@blueprint.route('/stats', methods=['GET'])
+def stats():
+    """Latencies of the coreness requests and loading times of the model."""
+    return jsonify({
+        "requests": dict((event, latency.as_dict())
+                         for event, latency in latencies.items()),
+        "model": coreness_model.stats(),
+    })
+
+
 @blueprint.route('/train', methods=['POST'])
 def train_model():
     training_data = request.get_json(silent=True)
@@ -185,16 +230,19 @@ def train_model():
         # Missing data.
         abort(400)
 
-    # Path, where model will be stored.
-    distance_model = os.path.abspath(os.path.join(os.path.dirname(
-        __file__), 'classifiers/linkage.dat'))
+    if respond_async():
+        return submit_response('predictor.train', _train, training_data)
 
     try:
-        pipeline = learn_model(training_data)
-        pickle.dump(pipeline, open(distance_model, 'w'))
-
         # Acknowledge successful training.
-        return jsonify({"success": True})
+        return jsonify(_train(training_data))
     except:
         # Training of a new model has failed.
         abort(500)
+
+
+def _train(training_data):
+    """Train a model and publish it."""
+    coreness_model.publish(learn_model(training_data))
+
+    return {"success": True}
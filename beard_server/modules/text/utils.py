@@ -29,7 +29,8 @@ from __future__ import absolute_import, division, print_function, \
 
 import numpy as np
 
-from beard.clustering import block_phonetic
+from beard_server.modules.clustering.utils.beard_names import \
+    block_phonetic
 
 
 def phonetic_blocks(full_names, phonetic_algorithm='nysiis'):
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Content-addressed store of records.
+
+Tasks may receive references to records instead of the records
+themselves::
+
+    {"publication_id": 1395222,
+     "record_hash": "2fd4e1c67a2d28fced849ee1bb76e7391b93eb12"}
+
+``record_hash`` is the ``content_hash`` of the record, i.e. the SHA-1
+digest of its JSON serialization with sorted keys and no whitespace. The
+same publication is thus sent once to the store and then referenced by
+all the tasks and blocks it belongs to. Clients ask which hashes are
+``missing`` and upload only those records with ``put_many``.
+
+Two backends are available: ``FilesystemRecordStore``, a directory of
+JSON files, and ``SQLiteRecordStore``, a single database file. Both may
+be shared by all the processes of a host.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import errno
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+
+from beard_server import config
+from beard_server.cache import content_hash
+
+_HASH = re.compile(r'^[0-9a-f]{40}$')
+
+
+class MissingRecords(KeyError):
+    """Some referenced records are not in the store.
+
+    :param hashes:
+        The hashes of the missing records.
+    """
+
+    def __init__(self, hashes):
+        """Keep the hashes of the missing records."""
+        super(MissingRecords, self).__init__(
+            "{0:d} records are missing from the store.".format(len(hashes)))
+        self.hashes = hashes
+
+
+def record_ref(record):
+    """Return the reference of a record.
+
+    :return:
+        Example:
+            {'publication_id': 1395222,
+             'record_hash': '2fd4e1c67a2d28fced849ee1bb76e7391b93eb12'}
+    """
+    return {
+        'publication_id': record.get('publication_id'),
+        'record_hash': content_hash(record),
+    }
+
+
+def is_ref(record):
+    """Tell if a record is a reference to a stored record."""
+    return 'record_hash' in record and len(record) <= 2
+
+
+class _RecordStore(object):
+    """Methods shared by the backends."""
+
+    def put_many(self, records):
+        """Store records, skipping the ones already stored.
+
+        :return:
+            The references of the records, in the same order.
+        """
+        refs = [record_ref(record) for record in records]
+        self._put([(ref['record_hash'], json.dumps(record))
+                   for ref, record in zip(refs, records)])
+
+        return refs
+
+    def get_many(self, hashes):
+        """Return the stored records with the given hashes.
+
+        :raises MissingRecords:
+            If some of the records are not in the store.
+
+        :return:
+            A list of the records, in the order of ``hashes``.
+        """
+        found = self._get(set(hashes))
+        missing = [h for h in hashes if h not in found]
+
+        if missing:
+            raise MissingRecords(missing)
+
+        # Each occurrence gets its own copy.
+        return [json.loads(found[h]) for h in hashes]
+
+    def missing(self, hashes):
+        """Return the hashes of records which are not in the store."""
+        found = self._contains(set(hashes))
+
+        return [h for h in hashes if h not in found]
+
+
+class FilesystemRecordStore(_RecordStore):
+    """Records stored as JSON files named after their hashes.
+
+    Files are written to temporary files and renamed, thus readers never
+    see partial files.
+
+    :param directory:
+        The directory holding the files. It is created if needed.
+    """
+
+    suffix = '.json'
+
+    def __init__(self, directory):
+        """Initialize the store in the given directory."""
+        self.directory = directory
+
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    def _path(self, record_hash):
+        # Hashes come from clients and name files.
+        if not _HASH.match(record_hash):
+            raise ValueError("Invalid record hash: {0}.".format(record_hash))
+
+        return os.path.join(self.directory, record_hash + self.suffix)
+
+    def _put(self, items):
+        for record_hash, data in items:
+            path = self._path(record_hash)
+
+            if os.path.exists(path):
+                continue
+
+            fd, temporary = tempfile.mkstemp(dir=self.directory,
+                                             suffix='.tmp')
+
+            try:
+                with os.fdopen(fd, 'wb') as fp:
+                    fp.write(data.encode('utf-8'))
+
+                os.rename(temporary, path)
+            except:
+                os.remove(temporary)
+                raise
+
+    def _get(self, hashes):
+        found = {}
+
+        for record_hash in hashes:
+            try:
+                with open(self._path(record_hash), 'rb') as fp:
+                    found[record_hash] = fp.read().decode('utf-8')
+            except (IOError, OSError):
+                pass
+
+        return found
+
+    def _contains(self, hashes):
+        return set(h for h in hashes if os.path.exists(self._path(h)))
+
+
+class SQLiteRecordStore(_RecordStore):
+    """Records stored in a table of an SQLite database.
+
+    Each thread of each process opens its own connection when it first
+    uses the store, so that connections are never shared with forked
+    processes. Records are inserted and selected in batches of
+    ``batch_size``.
+
+    :param path:
+        The path of the database file. It is created if needed.
+    """
+
+    def __init__(self, path, batch_size=500):
+        """Initialize the store, without opening the database yet."""
+        self.path = path
+        self.batch_size = batch_size
+        self._local = threading.local()
+
+    def _connection(self):
+        # Thread locals are inherited by forked children, hence the pid.
+        pid = os.getpid()
+
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(self.path, timeout=60)
+
+            with connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS records '
+                    '(hash TEXT PRIMARY KEY, data TEXT NOT NULL)')
+
+            self._local.connection = connection
+            self._local.pid = pid
+
+        return self._local.connection
+
+    def _select(self, columns, hashes):
+        hashes = list(hashes)
+        connection = self._connection()
+
+        for start in range(0, len(hashes), self.batch_size):
+            batch = hashes[start:start + self.batch_size]
+            query = 'SELECT {0} FROM records WHERE hash IN ({1})'.format(
+                columns, ','.join('?' * len(batch)))
+
+            for row in connection.execute(query, batch):
+                yield row
+
+    def _put(self, items):
+        with self._connection() as connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO records (hash, data) VALUES (?, ?)',
+                items)
+
+    def _get(self, hashes):
+        return dict(self._select('hash, data', hashes))
+
+    def _contains(self, hashes):
+        return set(row[0] for row in self._select('hash', hashes))
+
+
+def make_record_store(backend, path=None):
+    """Create a record store with the given backend.
+
+    :param backend:
+        ``'filesystem'`` for a ``FilesystemRecordStore``, ``'sqlite'``
+        for an ``SQLiteRecordStore`` or ``None`` for no store.
+
+    :param path:
+        The directory, respectively the database file, of the store.
+        Defaults to a location in the temporary directory.
+
+    :return:
+        The store, or ``None``.
+    """
+    if not backend:
+        return None
+
+    if backend == 'filesystem':
+        return FilesystemRecordStore(path or os.path.join(
+            tempfile.gettempdir(), 'beard-server-records'))
+
+    if backend == 'sqlite':
+        return SQLiteRecordStore(path or os.path.join(
+            tempfile.gettempdir(), 'beard-server-records.sqlite'))
+
+    raise ValueError("Unknown record store backend: {0}.".format(backend))
+
+
+record_store = make_record_store(config.BEARD_SERVER_RECORD_STORE,
+                                 config.BEARD_SERVER_RECORD_STORE_PATH)
+
+
+def resolve_records(records, store=None):
+    """Replace the references of a list of records by the stored records.
+
+    Records which are not references are kept as they are.
+
+    :param store:
+        The store to read from, by default the one of the process.
+
+    :raises MissingRecords:
+        If some of the referenced records are not in the store.
+    """
+    refs = [i for i, record in enumerate(records) if is_ref(record)]
+
+    if not refs:
+        return records
+
+    if store is None:
+        store = record_store
+
+    if store is None:
+        raise ValueError("Records are referenced, but no record store is "
+                         "configured.")
+
+    resolved = list(records)
+    stored = store.get_many([records[i]['record_hash'] for i in refs])
+
+    for i, record in zip(refs, stored):
+        resolved[i] = record
+
+    return resolved
+
+
+def store_records(records, store=None):
+    """Replace records by their references, storing them if needed.
+
+    :return:
+        The references, or the records unchanged if no store is
+        configured.
+    """
+    if store is None:
+        store = record_store
+
+    if store is None:
+        return records
+
+    full = [i for i, record in enumerate(records) if not is_ref(record)]
+    refs = list(records)
+
+    for i, ref in zip(full, store.put_many([records[i] for i in full])):
+        refs[i] = ref
+
+    return refs
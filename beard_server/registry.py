@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Process-wide registry of pickled models."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import cPickle as pickle
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from stat import S_IMODE as stat_mode
+
+
+def _file_digest(fp, chunk_size=1 << 20):
+    """Compute the MD5 digest of an opened file and rewind it."""
+    digest = hashlib.md5()
+
+    for chunk in iter(lambda: fp.read(chunk_size), b''):
+        digest.update(chunk)
+
+    fp.seek(0)
+
+    return digest.hexdigest()
+
+
+class _Entry(object):
+    """A model held by the registry together with its file metadata."""
+
+    def __init__(self, model, mtime, size, digest, load_time):
+        self.model = model
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.load_time = load_time
+        self.loaded_at = time.time()
+        self.derived = {}
+
+
+class ModelRegistry(object):
+    """Keep unpickled models in memory for the lifetime of the process.
+
+    Models are identified by the absolute path of their pickle. A model is
+    unpickled the first time it is requested and afterwards the very same
+    instance is handed out to every caller. On each request the modification
+    time and the size of the file are compared with the ones seen at load
+    time. Only if they differ, the content hash is computed and the model
+    is reloaded when the content has actually changed.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Not held while a model is unpickled.
+        self._counters_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit):
+        with self._counters_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def load(self, path):
+        """Return the model stored under the given path.
+
+        :param path:
+            A path to the pickled model.
+
+            Example:
+                path = '/path/to/classifiers/linkage.dat'
+
+        :return:
+            The unpickled model. Subsequent calls return the same instance
+            until the content of the file changes.
+        """
+        return self._entry(path).model
+
+    def _entry(self, path):
+        """Return the entry of the model, loading it if needed."""
+        path = os.path.abspath(path)
+
+        # Opening the file keeps the IOError semantics of a plain
+        # ``pickle.load(open(path))`` for callers handling missing models.
+        with open(path, 'rb') as fp:
+            stat = os.fstat(fp.fileno())
+            entry = self._entries.get(path)
+
+            if entry is not None and entry.mtime == stat.st_mtime and \
+                    entry.size == stat.st_size:
+                self._count(hit=True)
+                return entry
+
+            with self._lock:
+                # Another thread might have reloaded the model meanwhile.
+                entry = self._entries.get(path)
+                digest = _file_digest(fp)
+
+                if entry is not None and entry.digest == digest:
+                    # Touched, but not changed.
+                    entry.mtime = stat.st_mtime
+                    entry.size = stat.st_size
+                    self._count(hit=True)
+                    return entry
+
+                start = time.time()
+                model = pickle.load(fp)
+                load_time = time.time() - start
+
+                entry = self._entries[path] = _Entry(
+                    model, stat.st_mtime, stat.st_size, digest, load_time)
+                self._count(hit=False)
+
+                return entry
+
+    def derived(self, path, name, factory):
+        """Return an object built from the model stored under the given path.
+
+        The result of ``factory(model)`` is kept next to the model and
+        shared by every caller, until the model itself is reloaded.
+
+        :param path:
+            A path to the pickled model.
+
+        :param name:
+            A name under which the derived object is kept.
+
+        :param factory:
+            A callable building the derived object from the model and its
+            content hash.
+
+            Example:
+                factory = lambda model, digest: AffinityEngine(
+                    model, model_version=digest)
+        """
+        entry = self._entry(path)
+
+        try:
+            return entry.derived[name]
+        except KeyError:
+            with self._lock:
+                if name not in entry.derived:
+                    entry.derived[name] = factory(entry.model, entry.digest)
+
+                return entry.derived[name]
+
+    def publish(self, path, model):
+        """Store a model under the given path and hand it out from now on.
+
+        The pickle is written to a temporary file renamed over the path,
+        thus other processes never read a partial file; they reload the
+        model when they see the new file. This process keeps the given
+        instance instead of unpickling it again.
+        """
+        path = os.path.abspath(path)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path),
+                                         suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                pickle.dump(model, fp, pickle.HIGHEST_PROTOCOL)
+
+            with open(temporary, 'rb') as fp:
+                digest = _file_digest(fp)
+
+            # Temporary files are only readable by their owner.
+            try:
+                mode = stat_mode(os.stat(path).st_mode)
+            except OSError:
+                mode = 0o644
+
+            os.chmod(temporary, mode)
+
+            with self._lock:
+                os.rename(temporary, path)
+                stat = os.stat(path)
+                self._entries[path] = _Entry(model, stat.st_mtime,
+                                             stat.st_size, digest, 0.0)
+        except:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def fingerprint(self, path):
+        """Return the content hash of the model stored under the given path.
+
+        The model is loaded if it is not yet held by the registry, so
+        the fingerprint always describes the instance returned by ``load``.
+        """
+        return self._entry(path).digest
+
+    def clear(self):
+        """Drop all the models and reset the counters."""
+        with self._lock, self._counters_lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and load times of the held models.
+
+        :return:
+            A dictionary with global counters and per-model details.
+
+            Example:
+                {'hits': 12, 'misses': 1, 'load_time': 3.2,
+                 'models': {'/path/to/linkage.dat': {
+                     'digest': '9e107d9d372bb6826bd81d3542a419d6',
+                     'load_time': 3.2,
+                     'loaded_at': 1476783412.5}}}
+        """
+        models = {}
+
+        for path, entry in list(self._entries.items()):
+            models[path] = {
+                'digest': entry.digest,
+                'load_time': entry.load_time,
+                'loaded_at': entry.loaded_at,
+            }
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'load_time': sum(model['load_time'] for model in models.values()),
+            'models': models,
+        }
+
+
+registry = ModelRegistry()
+
+
+def load_model(path):
+    """Load a pickled model through the process-wide registry."""
+    return registry.load(path)
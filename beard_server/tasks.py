@@ -25,16 +25,22 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
+from celery import chord
+
+from . import config, instrumentation
 from .celery import app
 
+from .modules.clustering.beard import group_blocks
 from .modules.clustering.beard import predict as make_beard_clusters
+from .modules.clustering.beard import update as update_beard_clusters
 from .modules.clustering.recid import make_recid_clusters
 from .modules.clustering.resolver import solve_claims_conflict
 from .modules.matching import match_clusters
+from .records import resolve_records, store_records
 
 
-@app.task
-def make_clusters(records, signatures):
+@app.task(bind=True)
+def make_clusters(self, records, signatures):
     """Make clusters and match them with the current state of database.
 
     This method allows for dispatching Celery tasks, that create
@@ -45,18 +51,147 @@ def make_clusters(records, signatures):
     each other, to link an output of Beard with the current state of the
     database. The further logic of resolving conflicts is not the subject
     of this module and is proceed by the client (invenio-beard).
+
+    Payloads with more than ``BEARD_SERVER_FAN_OUT_SIZE`` signatures are
+    blocked up front. The task is then replaced by a chord of
+    ``cluster_block`` subtasks, one per group of blocks, whose clusters
+    are matched by ``merge_clusters``. The result is the same.
+
+    Records may be given as references to the records of the record
+    store. When fanning out, the records are stored, if a store is
+    configured, and only their references sent to the subtasks.
+
+    If ``BEARD_SERVER_INSTRUMENTATION_IN_RESULT`` is True, the profile of
+    the run is appended to the result.
+    """
+    fan_out_size = config.BEARD_SERVER_FAN_OUT_SIZE
+
+    if fan_out_size is not None and len(signatures) > fan_out_size and \
+            not self.request.called_directly:
+        groups = group_blocks(store_records(records), signatures,
+                              config.BEARD_SERVER_BLOCK_GROUP_SIZE)
+
+        if len(groups) > 1:
+            return self.replace(chord(
+                (cluster_block.s(*group) for group in groups),
+                merge_clusters.s(_recid_fields(signatures))))
+
+    with instrumentation.profile('make_clusters', records=len(records),
+                                 signatures=len(signatures)) as run:
+        with instrumentation.stage('resolve_records'):
+            records = resolve_records(records)
+
+        # Create clusters using Beard.
+        with instrumentation.stage('predict'):
+            beard_clusters = make_beard_clusters(records, signatures)
+
+        result = _split_by_profiles(beard_clusters, signatures)
+
+    return _with_profile(result, run)
+
+
+@app.task
+def cluster_block(records, signatures, blocks):
+    """Cluster a group of blocks of a ``make_clusters`` payload.
+
+    :param blocks:
+        The block of each signature, computed on the whole payload.
+
+    :return:
+        A dictionary of the Beard clusters of the group.
+    """
+    with instrumentation.profile('cluster_block', records=len(records),
+                                 signatures=len(signatures)):
+        with instrumentation.stage('resolve_records'):
+            records = resolve_records(records)
+
+        with instrumentation.stage('predict'):
+            return make_beard_clusters(records, signatures, blocks=blocks)
+
+
+@app.task
+def merge_clusters(results, signatures):
+    """Merge the clusters of the groups of blocks and match them.
+
+    :param results:
+        The clusters returned by the ``cluster_block`` subtasks.
+
+    :param signatures:
+        The signatures of the whole payload. Only ``signature_id`` and
+        ``author_recid`` are used.
+    """
+    with instrumentation.profile('merge_clusters', groups=len(results),
+                                 signatures=len(signatures)) as run:
+        beard_clusters = {}
+
+        # Labels are only unique within a group.
+        for clusters in results:
+            for label in sorted(clusters):
+                beard_clusters[str(len(beard_clusters))] = clusters[label]
+
+        result = _split_by_profiles(beard_clusters, signatures)
+
+    return _with_profile(result, run)
+
+
+def _recid_fields(signatures):
+    """Keep only the fields of the signatures used to match clusters."""
+    return [{key: signature[key] for key in ('signature_id', 'author_recid')
+             if key in signature} for signature in signatures]
+
+
+@app.task
+def update_clusters(records, signatures, clusters=None):
+    """Add new signatures to existing clusters and match them.
+
+    Instead of clustering the whole block again, the signatures which are
+    not part of ``clusters`` are assigned to the existing clusters or
+    clustered together. Blocks with too many new signatures, or new
+    signatures close to several clusters, are clustered from scratch.
+
+    The result is matched with the current state of database, as in
+    ``make_clusters``.
+
+    :param clusters:
+        A dictionary of the existing clusters, e.g. previous Beard
+        clusters. Defaults to the clusters of the signatures by recid.
     """
+    with instrumentation.profile('update_clusters', records=len(records),
+                                 signatures=len(signatures)) as run:
+        with instrumentation.stage('resolve_records'):
+            records = resolve_records(records)
+
+        if clusters is None:
+            clusters = make_recid_clusters(signatures)
+
+        with instrumentation.stage('update'):
+            beard_clusters = update_beard_clusters(records, signatures,
+                                                   clusters)
+
+        result = _split_by_profiles(beard_clusters, signatures)
 
-    # Create clusters using Beard.
-    beard_clusters = make_beard_clusters(records, signatures)
+    return _with_profile(result, run)
 
-    # Create clusters by author's recid.
-    recid_clusters = make_recid_clusters(signatures)
 
-    # Match Beard clusters with ones created by common recid.
-    # Note that the method returns keys of the clusters.
-    clusters_matched, clusters_created, _ = match_clusters(
-        recid_clusters, beard_clusters)
+def _with_profile(result, run):
+    """Append the profile of the run to the result, if configured."""
+    if run is None or not config.BEARD_SERVER_INSTRUMENTATION_IN_RESULT:
+        return result
+
+    return result + (run.as_dict(
+        config.BEARD_SERVER_INSTRUMENTATION_MAX_BLOCKS),)
+
+
+def _split_by_profiles(beard_clusters, signatures):
+    """Split Beard clusters into matched profiles and new clusters."""
+    with instrumentation.stage('match'):
+        # Create clusters by author's recid.
+        recid_clusters = make_recid_clusters(signatures)
+
+        # Match Beard clusters with ones created by common recid.
+        # Note that the method returns keys of the clusters.
+        clusters_matched, clusters_created, _ = match_clusters(
+            recid_clusters, beard_clusters)
 
     # Handle new clusters.
     clusters_with_no_profiles = {}
@@ -89,6 +224,10 @@ def solve_conflicts(claimed_signatures, not_claimed_signatures):
     The client (invenio-beard, check the docstrings from the method above)
     triggers this Celery task to assign each not-claimed signatures to one
     claimed signature.
+
+    Not-claimed signatures are scored in chunks of
+    ``BEARD_SERVER_CONFLICTS_BATCH_SIZE`` pairs.
     """
     return solve_claims_conflict(
-        claimed_signatures, not_claimed_signatures)
+        claimed_signatures, not_claimed_signatures,
+        batch_size=config.BEARD_SERVER_CONFLICTS_BATCH_SIZE)
@@ -27,7 +27,9 @@
 from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
-from flask import Blueprint, render_template
+from flask import abort, Blueprint, jsonify, render_template
+
+from .jobs import jobs
 
 blueprint = Blueprint(
     'beard_server',
@@ -48,3 +50,19 @@ def index():
 def ping():
     """Return OK if the server will be pinged."""
     return "OK"
+
+
+@blueprint.route("/api/jobs/<job_id>", methods=['GET'])
+def job_status(job_id):
+    """Return the status, the progress and the result of a job.
+
+    Jobs are kept in the memory of the web process which runs them, thus
+    the application must be served by a single process (``workers = 1``
+    in ``gunicorn.cfg``); other processes answer 404.
+    """
+    job = jobs.get(job_id)
+
+    if job is None:
+        abort(404)
+
+    return jsonify(job.as_dict())
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Preloading of the models in Celery workers.
+
+The models are unpickled lazily, by the first task needing them. With a
+prefork pool, each child process would load its own copy. Instead, the
+models are loaded by the parent process on ``worker_init``, before the
+pool is forked. The children inherit them from the model registry, as
+copy-on-write pages: the arrays of the models stay shared as long as they
+are not written to, only the pages of the Python objects whose reference
+counts change get copied.
+
+On ``worker_process_init`` each child logs the memory it shares with the
+parent, and the time to the end of the first task of a process is logged
+once.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import logging
+import os
+import time
+
+from celery.signals import task_postrun, worker_init, worker_process_init
+
+from beard_server import config
+from beard_server.registry import registry
+
+logger = logging.getLogger(__name__)
+
+_started = {}
+
+
+def model_paths():
+    """Return the paths of the models used by the tasks and the views.
+
+    :return:
+        A dictionary of the paths by model name.
+    """
+    modules = os.path.join(os.path.dirname(__file__), 'modules')
+
+    return {
+        'distance_model': os.path.join(
+            modules, 'clustering', 'classifiers', 'linkage.dat'),
+        'ethnicity_estimator': os.path.join(
+            modules, 'clustering', 'classifiers',
+            'ethnicity_estimator.pickle'),
+        'predictor_pipeline': os.path.join(
+            modules, 'predictor', 'classifiers', 'linkage.dat'),
+    }
+
+
+def preload(paths=None):
+    """Load the models into the registry of this process.
+
+    The affinity engine of the distance model is built as well. Missing
+    models, e.g. not trained yet, are skipped.
+
+    :param paths:
+        A dictionary of the paths by model name, by default
+        ``model_paths()``.
+
+    :return:
+        A dictionary of the loading times by model name.
+    """
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        get_affinity_engine
+
+    if paths is None:
+        paths = model_paths()
+
+    times = {}
+
+    for name, path in sorted(paths.items()):
+        start = time.time()
+
+        try:
+            registry.load(path)
+        except IOError:
+            logger.warning("Model %s not found in %s.", name, path)
+            continue
+
+        if name == 'distance_model':
+            get_affinity_engine(path)
+
+        times[name] = time.time() - start
+
+    return times
+
+
+def memory_sharing(pid='self'):
+    """Return the memory of a process shared with other ones, in bytes.
+
+    :return:
+        A dictionary with the resident memory, its part shared with other
+        processes, its private part and the proportional set size, i.e.
+        the private memory plus the fair share of the shared memory.
+        None if ``/proc`` is not available.
+    """
+    fields = {}
+
+    for name in ('smaps_rollup', 'smaps'):
+        try:
+            with open('/proc/{0}/{1}'.format(pid, name)) as fp:
+                for line in fp:
+                    parts = line.split()
+
+                    if len(parts) == 3 and parts[2] == 'kB':
+                        key = parts[0].rstrip(':')
+                        fields[key] = fields.get(key, 0) + int(parts[1])
+
+            break
+        except (IOError, OSError):
+            continue
+    else:
+        return None
+
+    return {
+        'rss': fields.get('Rss', 0) * 1024,
+        'pss': fields.get('Pss', 0) * 1024,
+        'shared': (fields.get('Shared_Clean', 0) +
+                   fields.get('Shared_Dirty', 0)) * 1024,
+        'private': (fields.get('Private_Clean', 0) +
+                    fields.get('Private_Dirty', 0)) * 1024,
+    }
+
+
+@worker_init.connect
+def _preload_models(**kwargs):
+    _started['worker'] = time.time()
+
+    if not config.BEARD_SERVER_PRELOAD_MODELS:
+        return
+
+    times = preload()
+    logger.info("Preloaded models in %.1f s: %s", sum(times.values()),
+                ", ".join("%s %.1f s" % item
+                          for item in sorted(times.items())))
+
+
+@worker_process_init.connect
+def _log_memory_sharing(**kwargs):
+    _started['process'] = time.time()
+    memory = memory_sharing()
+
+    if memory is not None:
+        logger.info("Worker process %d shares %d MB of %d MB with the "
+                    "parent, %d MB private.", os.getpid(),
+                    memory['shared'] >> 20, memory['rss'] >> 20,
+                    memory['private'] >> 20)
+
+
+@task_postrun.connect
+def _log_first_task(task=None, **kwargs):
+    if 'first_task' in _started:
+        return
+
+    _started['first_task'] = time.time()
+    start = _started.get('process', _started.get('worker'))
+
+    if start is not None:
+        logger.info("First task %s of process %d done %.1f s after its "
+                    "start.", task.name if task else None, os.getpid(),
+                    _started['first_task'] - start)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Measure the pairs pruned by the cascade and its impact on the clusters.
+
+The labelled signatures are clustered twice, with all the pairs scored by
+the distance model and with the cascade. The clusters are compared with
+the true ones using the B3 precision, recall and F-score.
+
+.. code-block:: console
+
+   $ python benchmarks/bench_cascade.py signatures.json records.json \\
+         clusters.json linkage.dat --min-year-gap 10
+
+The files hold the signatures, the records and the true clusters in the
+format of the ``clustering`` inputs.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from beard.metrics import b3_precision_recall_fscore
+
+from beard_server.modules.clustering.utils import clustering
+from beard_server.modules.clustering.utils.beard_cascade import Cascade
+
+
+def _labels(clusters, signature_ids):
+    """Return the label of each signature."""
+    label_of = {}
+
+    for label, members in clusters.items():
+        for signature_id in members:
+            label_of[signature_id] = label
+
+    return np.array([label_of.get(s, -1) for s in signature_ids])
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('signatures')
+    parser.add_argument('records')
+    parser.add_argument('clusters')
+    parser.add_argument('distance_model')
+    parser.add_argument('--threshold', type=float, default=0.709)
+    parser.add_argument('--distance', type=float, default=1.0)
+    parser.add_argument('--min-year-gap', type=int, default=None)
+    parser.add_argument('--blocking-threshold', type=int, default=0)
+    args = parser.parse_args()
+
+    signatures = json.load(open(args.signatures))
+    records = json.load(open(args.records))
+    true_clusters = json.load(open(args.clusters))
+
+    signature_ids = [s['signature_id'] for s in signatures]
+    labels_true = _labels(true_clusters, signature_ids)
+
+    print('{0:>8} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}'.format(
+        '', 'pruned', 'precision', 'recall', 'f-score', 'time [s]'))
+
+    for name, cascade in (('full', None),
+                          ('cascade', Cascade(
+                              distance=args.distance,
+                              min_year_gap=args.min_year_gap))):
+        start = time.time()
+        clusters = clustering(input_signatures=signatures,
+                              input_records=records,
+                              distance_model=args.distance_model,
+                              verbose=0, n_jobs=1,
+                              clustering_threshold=args.threshold,
+                              blocking_threshold=args.blocking_threshold,
+                              cascade=cascade)
+        elapsed = time.time() - start
+
+        precision, recall, f_score = b3_precision_recall_fscore(
+            labels_true, _labels(clusters, signature_ids))
+        pruned = cascade.stats()['pruned_fraction'] if cascade else 0.0
+
+        print('{0:>8} {1:10.3f} {2:10.4f} {3:10.4f} {4:10.4f} '
+              '{5:10.3f}'.format(name, pruned, precision, recall, f_score,
+                                 elapsed))
+
+
+if __name__ == '__main__':
+    main()
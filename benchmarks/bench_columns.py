@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Compare the columnar signature store with dictionaries of signatures.
+
+Synthetic signatures are loaded once as dictionaries, as done by
+``load_signatures``, and once into a ``SignatureStore``. For both, the
+memory used by the loaded signatures and the time needed to evaluate the
+getters of the distance model are reported.
+
+.. code-block:: console
+
+   $ python benchmarks/bench_columns.py --signatures 1000000
+
+Large collaborations are simulated with ``--authors 3000``.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from beard.utils import FuncTransformer
+
+from beard_server.modules.clustering.utils.beard_affinity import \
+    _transform_elements
+from beard_server.modules.clustering.utils.beard_columns import \
+    RECORD_FIELD_GETTERS
+from beard_server.modules.clustering.utils.beard_columns import \
+    SIGNATURE_FIELD_GETTERS
+from beard_server.modules.clustering.utils.beard_columns import \
+    SignatureStore
+from beard_server.modules.clustering.utils.beard_utils import \
+    get_coauthors_from_range
+from beard_server.modules.clustering.utils.beard_utils import \
+    load_signatures
+
+
+def _sizeof(root):
+    """Return the memory used by the objects reachable from ``root``."""
+    seen = set()
+    stack = [root]
+    size = 0
+
+    while stack:
+        obj = stack.pop()
+
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, np.ndarray):
+            if obj.dtype == np.object:
+                stack.extend(obj.ravel().tolist())
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        else:
+            stack.extend(getattr(obj, slot) for slot in
+                         getattr(type(obj), '__slots__', ()))
+            stack.extend(getattr(obj, '__dict__', {}).values())
+
+    return size
+
+
+def _make_data(n_signatures, n_authors=10, seed=0):
+    """Build signatures of records with ``n_authors`` authors each."""
+    random_state = np.random.RandomState(seed)
+    # Every author signs about ``n_authors`` records.
+    names = ['Surname%d, Given%d Other%d' % (k, k % 500, k % 7)
+             for k in range(n_signatures // n_authors + 1)]
+    affiliations = ['Institute %d' % k for k in range(2000)]
+    keywords = ['keyword %d' % k for k in range(5000)]
+
+    records = []
+    signatures = []
+
+    for publication_id in range(n_signatures // n_authors):
+        authors = [names[k] for k in
+                   random_state.randint(len(names), size=n_authors)]
+        records.append({
+            'publication_id': publication_id,
+            'title': 'Title of the publication %d' % publication_id,
+            'journal': 'Journal %d' % random_state.randint(300),
+            'abstract': 'Abstract of the publication %d' % publication_id,
+            'year': int(1970 + random_state.randint(47)),
+            'authors': authors,
+            'keywords': [keywords[k] for k in
+                         random_state.randint(len(keywords), size=5)],
+            'collaborations': [],
+            'references': [int(k) for k in
+                           random_state.randint(n_signatures, size=10)],
+            'topics': [],
+        })
+
+        for author in authors:
+            signatures.append({
+                'signature_id': len(signatures),
+                'publication_id': publication_id,
+                'author_name': author,
+                'author_affiliation': affiliations[
+                    random_state.randint(len(affiliations))],
+            })
+
+    # Distinct string objects, as decoded from the JSON inputs.
+    return json.loads(json.dumps(signatures)), json.loads(json.dumps(records))
+
+
+def _dicts(signatures, records):
+    signatures, _ = load_signatures(signatures, records)
+    X = np.empty((len(signatures), 1), dtype=np.object)
+
+    for i, signature_id in enumerate(sorted(signatures)):
+        X[i, 0] = signatures[signature_id]
+
+    return X
+
+
+def _columns(signatures, records):
+    return SignatureStore(signatures, records).array()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--signatures', type=int, default=1000000)
+    parser.add_argument('--authors', type=int, default=10,
+                        help='number of authors of each record')
+    args = parser.parse_args()
+
+    getters = list(SIGNATURE_FIELD_GETTERS) + \
+        list(RECORD_FIELD_GETTERS) + [get_coauthors_from_range]
+
+    print('{0:>8} {1:>12} {2:>10} {3:>12}'.format(
+        '', 'memory [MB]', 'load [s]', 'getters [s]'))
+
+    for name, load in (('dicts', _dicts), ('columns', _columns)):
+        signatures, records = _make_data(args.signatures, args.authors)
+
+        start = time.time()
+        X = load(signatures, records)
+        load_time = time.time() - start
+
+        del signatures, records
+        memory = _sizeof(X)
+
+        start = time.time()
+
+        for getter in getters:
+            _transform_elements(FuncTransformer(getter, dtype=np.object), X)
+
+        print('{0:>8} {1:12.1f} {2:10.2f} {3:12.2f}'.format(
+            name, memory / 2 ** 20, load_time, time.time() - start))
+
+        del X
+
+
+if __name__ == '__main__':
+    main()
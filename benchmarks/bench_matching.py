@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Compare the simplex and the assignment matching of clusters.
+
+Synthetic partitions are built by moving a fraction of the signatures of
+a random partition to other clusters, so that all the clusters form a
+single subproblem. Both solvers are run on the same partitions.
+
+.. code-block:: console
+
+   $ python benchmarks/bench_matching.py --sizes 10 20 40 80 160
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import time
+
+import numpy as np
+
+from beard_server.modules.matching import assignment
+from beard_server.modules.matching import simplex
+
+
+def make_partitions(n_clusters, cluster_size=5, moved=0.3, random_state=0):
+    """Build a partition and its perturbed version.
+
+    :param n_clusters:
+        The number of clusters in the-state-before.
+
+    :param cluster_size:
+        The average number of signatures in a cluster.
+
+    :param moved:
+        The fraction of signatures moved to another cluster.
+
+    :return:
+        Two dictionaries of sets, the-state-before and the-state-after.
+    """
+    random_state = np.random.RandomState(random_state)
+    n_signatures = n_clusters * cluster_size
+
+    labels_before = random_state.randint(n_clusters, size=n_signatures)
+    labels_after = labels_before.copy()
+
+    mask = random_state.rand(n_signatures) < moved
+    labels_after[mask] = random_state.randint(n_clusters + n_clusters // 10,
+                                              size=mask.sum())
+
+    clusters_before = {}
+    clusters_after = {}
+
+    for signature, (before, after) in enumerate(zip(labels_before,
+                                                    labels_after)):
+        clusters_before.setdefault('before_%d' % before, set()).add(signature)
+        clusters_after.setdefault('after_%d' % after, set()).add(signature)
+
+    return clusters_before, clusters_after
+
+
+def run(solver, clusters_before, clusters_after):
+    """Return the result of the solver and the time it took."""
+    start = time.time()
+    result = solver(clusters_before, clusters_after)
+
+    return result, time.time() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 20, 40, 80])
+    parser.add_argument('--max-simplex', type=int, default=80,
+                        help='largest size to run the simplex method on')
+    args = parser.parse_args()
+
+    print('{0:>8} {1:>12} {2:>12} {3:>6}'.format(
+        'clusters', 'simplex [s]', 'assign [s]', 'same'))
+
+    for size in args.sizes:
+        clusters_before, clusters_after = make_partitions(size)
+        result, assignment_time = run(assignment._solve_clusters,
+                                      clusters_before, clusters_after)
+
+        if size <= args.max_simplex:
+            expected, simplex_time = run(simplex._solve_clusters,
+                                         clusters_before, clusters_after)
+            same = all(set(a) == set(b) for a, b in zip(result, expected))
+            same = 'yes' if same else 'no'
+            simplex_time = '{0:12.3f}'.format(simplex_time)
+        else:
+            same = '-'
+            simplex_time = '{0:>12}'.format('-')
+
+        print('{0:8d} {1} {2:12.3f} {3:>6}'.format(
+            size, simplex_time, assignment_time, same))
+
+
+if __name__ == '__main__':
+    main()
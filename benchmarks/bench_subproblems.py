@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Measure the division of clusters into subproblems.
+
+Synthetic partitions of a growing number of signatures are built by moving
+a small fraction of the signatures of a random partition to other
+clusters, which gives many small subproblems and a few large ones.
+
+.. code-block:: console
+
+   $ python benchmarks/bench_subproblems.py --sizes 1000 10000 100000 1000000
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import time
+
+import numpy as np
+
+from beard_server.modules.matching import match_clusters
+from beard_server.modules.matching.subproblems import \
+    _divide_into_subproblems
+
+
+def make_partitions(n_signatures, cluster_size=5, moved=0.05,
+                    random_state=0):
+    """Build a partition and its perturbed version.
+
+    :param n_signatures:
+        The number of signatures.
+
+    :param cluster_size:
+        The average number of signatures in a cluster.
+
+    :param moved:
+        The fraction of signatures moved to another cluster.
+
+    :return:
+        Two dictionaries of lists, the-state-before and the-state-after.
+    """
+    random_state = np.random.RandomState(random_state)
+    n_clusters = max(1, n_signatures // cluster_size)
+
+    labels_before = random_state.randint(n_clusters, size=n_signatures)
+    labels_after = labels_before.copy()
+
+    mask = random_state.rand(n_signatures) < moved
+    labels_after[mask] = random_state.randint(n_clusters, size=mask.sum())
+
+    clusters_before = {}
+    clusters_after = {}
+
+    for signature, (before, after) in enumerate(zip(labels_before.tolist(),
+                                                    labels_after.tolist())):
+        clusters_before.setdefault(before, []).append(signature)
+        clusters_after.setdefault('after_%d' % after, []).append(signature)
+
+    return clusters_before, clusters_after
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--match', action='store_true',
+                        help='also time the whole match_clusters')
+    args = parser.parse_args()
+
+    print('{0:>10} {1:>12} {2:>14} {3:>10}'.format(
+        'signatures', 'subproblems', 'largest', 'time [s]'))
+
+    for size in args.sizes:
+        clusters_before, clusters_after = make_partitions(size)
+
+        start = time.time()
+        subproblems = _divide_into_subproblems(clusters_before,
+                                               clusters_after)
+        elapsed = time.time() - start
+
+        largest = max(len(before) + len(after)
+                      for before, after in subproblems)
+
+        print('{0:10d} {1:12d} {2:14d} {3:10.3f}'.format(
+            size, len(subproblems), largest, elapsed))
+
+        if args.match:
+            start = time.time()
+            match_clusters(clusters_before, clusters_after)
+            print('{0:>10} {1:>12} {2:>14} {3:10.3f}'.format(
+                '', '', 'match_clusters', time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -63,6 +63,7 @@ setup_requires = [
 
 install_requires = [
     'beard>=0.2',
+    'billiard>=3.3.0',
     'celery>=3.1.23',
     'Flask-BabelEx>=0.9.2',
     'gunicorn>=19.6.0',
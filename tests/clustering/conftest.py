@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Clustering test fixtures."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import cPickle as pickle
+import itertools
+
+import numpy as np
+import pytest
+
+AUTHORS = [
+    ("Wang, Shang-Yung", "Taiwan, Natl. Chiao Tung U.",
+     ["Kao, W.F.", "Chyi, Tzuu-Kang", "Dai, W.B."]),
+    ("Wang, Yi-Nan", "Peking U.",
+     ["Hohm, Olaf", "Taylor, Washington"]),
+    ("Wang, Yi", "CERN",
+     ["Ellis, John", "Mavromatos, Nick E."]),
+]
+
+TITLES = [
+    "Induced Einstein-Kalb-Ramond theory and the black hole",
+    "Towards graphene-based detectors for dark matter detection",
+    "F-theory on elliptically fibered Calabi-Yau manifolds",
+    "Six-dimensional supergravity and anomaly cancellation",
+    "Search for supersymmetry in proton collisions at the LHC",
+    "Quantum gravity phenomenology and Lorentz violation",
+]
+
+JOURNALS = ["Phys.Rev.", "Nucl.Phys.", "JHEP", "Phys.Lett."]
+
+COLLABORATIONS = [[], ["ATLAS"], ["CMS", "LHCb"]]
+
+TOPICS = ["Phenomenology-HEP", "Theory-HEP", "Experiment-HEP"]
+
+
+def _make_data():
+    """Create records and signatures of three authors named Wang."""
+    records = []
+    signatures = []
+    labels = []
+
+    for publication_id in range(18):
+        author = publication_id % len(AUTHORS)
+        name, affiliation, coauthors = AUTHORS[author]
+        authors = coauthors[:1 + publication_id % len(coauthors)] + [name]
+
+        records.append({
+            "publication_id": publication_id,
+            "title": TITLES[2 * author + publication_id % 2],
+            "year": 1995 + 10 * author + publication_id % 3,
+            "authors": authors,
+            "abstract": " ".join(TITLES[2 * author:2 * author + 2]),
+            "journal": JOURNALS[(author + publication_id) % len(JOURNALS)],
+            "keywords": TITLES[2 * author].lower().split()[:3],
+            "collaborations": COLLABORATIONS[author],
+            "references": [publication_id % 4, 10 + author],
+            "topics": [TOPICS[author], TOPICS[publication_id % 2]],
+        })
+        signatures.append({
+            "signature_id": "%s_%d" % (name.split(",")[0], publication_id),
+            "author_name": name,
+            "author_affiliation": affiliation,
+            "publication_id": publication_id,
+        })
+        labels.append(author)
+
+    return records, signatures, labels
+
+
+@pytest.fixture()
+def clustering_data():
+    """Records, signatures and true author labels."""
+    return _make_data()
+
+
+@pytest.fixture()
+def signatures_array(clustering_data):
+    """Signatures with their records, as an array of shape (n, 1)."""
+    from beard_server.modules.clustering.utils.beard_utils import \
+        load_signatures
+
+    records, signatures, _ = clustering_data
+    signatures, _ = load_signatures(signatures, records)
+
+    X = np.empty((len(signatures), 1), dtype=np.object)
+    for i, signature_id in enumerate(sorted(signatures)):
+        X[i, 0] = signatures[signature_id]
+
+    return X
+
+
+@pytest.fixture(scope="session")
+def distance_model(tmpdir_factory):
+    """Path of a small distance model trained on ``clustering_data``."""
+    from beard_server.modules.clustering.utils.beard_distance import \
+        _build_distance_estimator
+    from beard_server.modules.clustering.utils.beard_utils import \
+        load_signatures
+
+    records, signatures, labels = _make_data()
+    signatures, _ = load_signatures(signatures, records)
+    ordered = [signatures[s] for s in sorted(signatures)]
+    label_of = dict(zip([s["signature_id"] for s in _make_data()[1]],
+                        labels))
+
+    pairs = list(itertools.combinations(ordered, 2))
+    X = np.empty((len(pairs), 2), dtype=np.object)
+    y = np.empty(len(pairs), dtype=np.int)
+
+    for k, (s1, s2) in enumerate(pairs):
+        X[k, 0], X[k, 1] = s1, s2
+        y[k] = int(label_of[s1["signature_id"]] !=
+                   label_of[s2["signature_id"]])
+
+    estimator = _build_distance_estimator(X, y, fast=0)
+
+    path = str(tmpdir_factory.mktemp("classifiers").join("linkage.dat"))
+    with open(path, "wb") as fp:
+        pickle.dump(estimator, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return path
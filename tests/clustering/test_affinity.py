@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the affinity engine."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+
+
+def _pairwise_distances(distance_estimator, X):
+    """Score all pairs with the full pipeline."""
+    all_i, all_j = np.triu_indices(len(X), k=1)
+    Xt = np.empty((len(all_i), 2), dtype=np.object)
+
+    for k, (i, j) in enumerate(zip(all_i, all_j)):
+        Xt[k, 0], Xt[k, 1] = X[i, 0], X[j, 0]
+
+    return distance_estimator.predict_proba(Xt)[:, 1]
+
+
+def test_distances_match_pipeline(signatures_array, distance_model):
+    """Test if the engine gives the same distances as the pipeline."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        AffinityEngine
+    from beard_server.registry import load_model
+
+    distance_estimator = load_model(distance_model)
+    X = signatures_array
+
+    expected = _pairwise_distances(distance_estimator, X)
+    distances = AffinityEngine(distance_estimator).distances(X, step=7)
+
+    np.testing.assert_array_equal(distances, expected)
+
+
+def test_pair_matrix_matches_union(signatures_array, distance_model):
+    """Test if the pair matrix is the output of the feature union."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        AffinityEngine
+    from beard_server.registry import load_model
+
+    distance_estimator = load_model(distance_model)
+    X = signatures_array
+    engine = AffinityEngine(distance_estimator)
+
+    i = np.array([0, 3, 5])
+    j = np.array([1, 2, 17])
+    Xt = np.empty((len(i), 2), dtype=np.object)
+    Xt[:, 0], Xt[:, 1] = X[i, 0], X[j, 0]
+
+    features = engine.transform(X)
+    expected = distance_estimator.steps[0][1].transform(Xt)
+
+    assert len(features) == len(X)
+    np.testing.assert_array_equal(
+        engine.pair_matrix(features, i, features, j), expected)
+
+
+def test_cached_features(signatures_array, distance_model):
+    """Test if cached transformed signatures give the same distances."""
+    import copy
+
+    from beard_server.cache import LRUCache
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        AffinityEngine, _sizeof_rows
+    from beard_server.registry import load_model
+
+    distance_estimator = load_model(distance_model)
+    X = signatures_array
+    expected = AffinityEngine(distance_estimator).distances(X)
+
+    cache = LRUCache(1 << 30, sizeof=_sizeof_rows)
+    engine = AffinityEngine(distance_estimator, cache=cache,
+                            model_version='v1')
+
+    engine.transform(X[:7])
+    np.testing.assert_array_equal(engine.distances(X), expected)
+    assert cache.stats()['misses'] == len(X)
+    assert cache.stats()['hits'] == 7
+
+    # A change of the content of a signature is a cache miss.
+    X_changed = X.copy()
+    X_changed[0, 0] = copy.deepcopy(X[0, 0])
+    X_changed[0, 0]['author_affiliation'] = 'Somewhere else'
+    engine.transform(X_changed)
+
+    assert cache.stats()['misses'] == len(X) + 1
+    assert cache.stats()['size'] > 0
+
+    # So is a change of the content of its publication.
+    X_changed[1, 0] = copy.deepcopy(X[1, 0])
+    X_changed[1, 0]['publication']['title'] = 'Another title'
+    engine.transform(X_changed)
+
+    assert cache.stats()['misses'] == len(X) + 2
+
+
+def test_signature_key(signatures_array):
+    """Test if signatures are hashed by the fields read by the getters."""
+    import copy
+
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        signature_key
+
+    signature = signatures_array[0, 0]
+    key = signature_key(signature)
+
+    unread = dict(signature)
+    unread['author_claimed'] = not signature.get('author_claimed')
+    assert signature_key(unread) == key
+
+    record_keys = {}
+    assert signature_key(signature, record_keys) == key
+    assert signature_key(signature, record_keys) == key
+    assert list(record_keys) == [signature['publication_id']]
+
+    changed = copy.deepcopy(signature)
+    changed['publication']['year'] = 1900
+    assert signature_key(changed) != key
+
+    changed = copy.deepcopy(signature)
+    changed['author_name'] = 'Someone, Else'
+    assert signature_key(changed) != key
+
+
+def test_engine_is_looked_up_once(distance_model):
+    """Test if getting the engine looks the model up once."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        get_affinity_engine
+    from beard_server.registry import registry
+
+    engine = get_affinity_engine(distance_model)
+    lookups = registry.hits + registry.misses
+
+    assert get_affinity_engine(distance_model) is engine
+    assert registry.hits + registry.misses == lookups + 1
+    assert engine.model_version == registry.fingerprint(distance_model)
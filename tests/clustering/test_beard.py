@@ -87,3 +87,78 @@ def test_beard_known_clusters():
     result = {'0': ['Lin_428605'], '1': ['Wang_1395222', 'Wang_428605']}
 
     assert predict(records, signatures, clusters=True) == result
+
+
+def test_predict_block_cache(monkeypatch):
+    """Test if an unchanged block is not clustered again."""
+    from beard_server.cache import LRUCache
+    from beard_server.modules.clustering import beard
+
+    calls = []
+
+    def clustering(**kwargs):
+        calls.append(kwargs)
+        return {'0': [signature['signature_id']
+                      for signature in kwargs['input_signatures']]}
+
+    monkeypatch.setattr(beard, 'clustering', clustering)
+    monkeypatch.setattr(beard, 'block_cache', LRUCache(1 << 20, sizeof=len))
+    monkeypatch.setattr(beard.registry, 'fingerprint', lambda path: 'v1')
+
+    records = [{'publication_id': 1, 'authors': ['Wang, Yi']},
+               {'publication_id': 2, 'authors': ['Wang, Yi']}]
+    signatures = [{'signature_id': 'a', 'publication_id': 1,
+                   'author_name': 'Wang, Yi'},
+                  {'signature_id': 'b', 'publication_id': 2,
+                   'author_name': 'Wang, Yi'}]
+
+    result = beard.predict(records, signatures)
+    result['0'].append('mutated')
+
+    assert beard.predict(records[::-1], signatures[::-1]) == \
+        {'0': ['a', 'b']}
+    assert len(calls) == 1
+
+    beard.predict(records, signatures, clusters=True)
+
+    assert len(calls) == 2
+
+
+def test_update_falls_back_to_predict(monkeypatch):
+    """Test if an unstable block is clustered from scratch."""
+    from beard_server.modules.clustering import beard
+
+    monkeypatch.setattr(beard, 'assign_signatures',
+                        lambda *args, **kwargs: None)
+    monkeypatch.setattr(beard, 'predict',
+                        lambda records, signatures: {'0': ['a', 'b']})
+
+    assert beard.update([], [], {'0': ['a']}) == {'0': ['a', 'b']}
+
+    monkeypatch.setattr(beard, 'assign_signatures',
+                        lambda *args, **kwargs: {'0': ['a'], 'new_0': ['b']})
+
+    assert beard.update([], [], {'0': ['a']}) == {'0': ['a'],
+                                                  'new_0': ['b']}
+
+
+def test_group_blocks():
+    """Test if whole blocks are packed into groups with their records."""
+    from beard_server.modules.clustering.beard import group_blocks
+
+    names = ['Wang, Yi'] * 3 + ['Ellis, John'] * 2 + ['Kao, W.F.'] * 2
+    records = [{'publication_id': i, 'authors': [name]}
+               for i, name in enumerate(names)]
+    signatures = [{'signature_id': 's%d' % i, 'publication_id': i,
+                   'author_name': name} for i, name in enumerate(names)]
+
+    groups = group_blocks(records, signatures, 4)
+
+    assert [[s['signature_id'] for s in group[1]] for group in groups] == \
+        [['s0', 's1', 's2'], ['s3', 's4', 's5', 's6']]
+    assert [[r['publication_id'] for r in group[0]] for group in groups] == \
+        [[0, 1, 2], [3, 4, 5, 6]]
+    assert len(set(groups[0][2])) == 1
+    assert len(set(groups[1][2])) == 2
+
+    assert len(group_blocks(records, signatures, 1)) == 3
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test clustering with a pretrained distance model."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+
+def _partition(clusters):
+    return sorted(sorted(cluster) for cluster in clusters.values())
+
+
+def _true_partition(clustering_data):
+    _, signatures, labels = clustering_data
+    clusters = {}
+
+    for signature, label in zip(signatures, labels):
+        clusters.setdefault(label, []).append(signature["signature_id"])
+
+    return _partition(clusters)
+
+
+def test_clustering(clustering_data, distance_model):
+    """Test if the signatures of the three authors are separated."""
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+
+    clusters = clustering(input_signatures=signatures,
+                          input_records=records,
+                          distance_model=distance_model,
+                          verbose=0, n_jobs=1,
+                          clustering_threshold=0.709,
+                          blocking_threshold=0)
+
+    assert _partition(clusters) == _true_partition(clustering_data)
+
+
+def test_clustering_parallel(clustering_data, distance_model):
+    """Test if forked workers give the same clusters."""
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+    partitions = []
+
+    for n_jobs in (1, 2):
+        clusters = clustering(
+            input_signatures=signatures,
+            input_records=records,
+            distance_model=distance_model,
+            verbose=0, n_jobs=n_jobs,
+            clustering_threshold=0.709,
+            blocking_function="block_last_name_first_initial")
+        partitions.append(_partition(clusters))
+
+    assert partitions[0] == partitions[1]
+    assert len(partitions[0]) >= 3
+
+
+def test_clustering_threads(clustering_data, distance_model):
+    """Test if concurrent runs in threads give the same clusters."""
+    import threading
+
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+    partitions = []
+
+    def run():
+        clusters = clustering(
+            input_signatures=signatures,
+            input_records=records,
+            distance_model=distance_model,
+            verbose=0, n_jobs=2,
+            clustering_threshold=0.709,
+            blocking_function="block_last_name_first_initial")
+        partitions.append(_partition(clusters))
+
+    run()
+    threads = [threading.Thread(target=run) for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert partitions == [partitions[0]] * 5
+
+
+def test_clustering_sparse(clustering_data, distance_model):
+    """Test if the sparse mode separates the three authors too."""
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+
+    clusters = clustering(input_signatures=signatures,
+                          input_records=records,
+                          distance_model=distance_model,
+                          verbose=0, n_jobs=1,
+                          clustering_threshold=0.709,
+                          blocking_threshold=0,
+                          clustering_mode="sparse",
+                          sparse_block_size=0)
+
+    assert _partition(clusters) == _true_partition(clustering_data)
+
+
+def test_clustering_columnar(clustering_data, distance_model):
+    """Test if the columnar store gives the same clusters."""
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+    partitions = []
+
+    for columnar in (False, True):
+        clusters = clustering(input_signatures=signatures,
+                              input_records=records,
+                              distance_model=distance_model,
+                              verbose=0, n_jobs=1,
+                              clustering_threshold=0.709,
+                              blocking_threshold=0,
+                              columnar=columnar)
+        partitions.append(_partition(clusters))
+
+    assert partitions[0] == partitions[1]
+    assert partitions[0] == _true_partition(clustering_data)
+
+
+def test_clustering_profile(clustering_data, distance_model):
+    """Test if the stages and the blocks of clustering are profiled."""
+    from beard_server.instrumentation import profile
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+
+    with profile('run') as run:
+        clustering(input_signatures=signatures,
+                   input_records=records,
+                   distance_model=distance_model,
+                   verbose=0, n_jobs=2,
+                   clustering_threshold=0.709,
+                   blocking_threshold=0)
+
+    names = set(entry['name'] for entry in run.stages)
+
+    assert names == set(['load_model', 'load_signatures',
+                         'block_clustering', 'block_clustering/blocking'])
+    assert run.counters['signatures'] == len(signatures)
+    assert run.counters['blocks'] == len(run.blocks)
+    assert all(block['affinity_time'] <= block['time']
+               for block in run.blocks)
+
+
+def test_clustering_feature_cache_counters(clustering_data,
+                                           distance_model):
+    """Test if the hits of the feature cache are counted per run."""
+    from beard_server.instrumentation import profile
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+    runs = []
+
+    for _ in range(2):
+        with profile('run') as run:
+            clustering(input_signatures=signatures,
+                       input_records=records,
+                       distance_model=distance_model,
+                       verbose=0, n_jobs=1,
+                       clustering_threshold=0.709,
+                       blocking_threshold=0)
+
+        runs.append(run.counters)
+
+    assert runs[0]['feature_cache_hits'] + \
+        runs[0]['feature_cache_misses'] > 0
+    assert runs[1]['feature_cache_hits'] > 0
+    assert runs[1]['feature_cache_misses'] == 0
+
+
+def test_clustering_given_blocks(clustering_data, distance_model):
+    """Test if blocks computed beforehand replace the blocking."""
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, _ = clustering_data
+    blocks = dict((signature['signature_id'], 'WANG')
+                  for signature in signatures)
+
+    clusters = clustering(input_signatures=signatures,
+                          input_records=records,
+                          distance_model=distance_model,
+                          verbose=0, n_jobs=1,
+                          clustering_threshold=0.709,
+                          blocking_threshold=0,
+                          blocks=blocks)
+
+    assert _partition(clusters) == _true_partition(clustering_data)
+
+
+def test_clustering_cascade_counters(clustering_data, distance_model):
+    """Test if pairs pruned by worker processes are counted."""
+    from beard_server.modules.clustering.utils import clustering
+    from beard_server.modules.clustering.utils.beard_cascade import Cascade
+
+    records, signatures, _ = clustering_data
+    counters = []
+
+    for n_jobs in (1, 2):
+        cascade = Cascade()
+        clustering(input_signatures=signatures,
+                   input_records=records,
+                   distance_model=distance_model,
+                   verbose=0, n_jobs=n_jobs,
+                   clustering_threshold=0.709,
+                   blocking_function="block_last_name_first_initial",
+                   cascade=cascade)
+        counters.append(cascade.stats())
+
+    assert counters[0] == counters[1]
+    assert counters[0]['pairs'] > 0
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test block clustering on a pool of processes."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+
+import numpy as np
+
+from sklearn.base import BaseEstimator, ClusterMixin
+
+
+class _SlowClusterer(BaseEstimator, ClusterMixin):
+    """Put all the samples in one cluster, slowly, and keep the block."""
+
+    def fit(self, X, y=None):
+        from beard_server.modules.clustering.utils.beard_blocking import \
+            current_block
+
+        time.sleep(0.01)
+        self.block_ = current_block()
+        self.labels_ = np.zeros(len(X), dtype=np.int)
+
+        return self
+
+
+def _partition(labels):
+    clusters = {}
+
+    for i, label in enumerate(labels):
+        clusters.setdefault(label, []).append(i)
+
+    return sorted(clusters.values())
+
+
+def _points():
+    random_state = np.random.RandomState(0)
+    centers = random_state.rand(12, 2) * 100
+    X = np.vstack([center + random_state.rand(5, 2) for center in centers])
+    blocks = np.repeat(np.arange(6), 10)
+
+    return X, blocks
+
+
+def test_block_order():
+    """Test if the largest blocks come first."""
+    from beard_server.modules.clustering.utils.beard_blocking import \
+        _block_order
+
+    keys, indices = _block_order(np.array(['b', 'a', 'c', 'a', 'c', 'a']))
+
+    assert keys == ['a', 'c', 'b']
+    assert [list(block) for block in indices] == [[1, 3, 5], [2, 4], [0]]
+
+
+def test_parallel_matches_sequential():
+    """Test if the pool gives the same clusters as Beard."""
+    from beard.clustering import BlockClustering
+    from beard.clustering import ScipyHierarchicalClustering
+
+    from beard_server.modules.clustering.utils.beard_blocking import \
+        ParallelBlockClustering
+
+    X, blocks = _points()
+    base_estimator = ScipyHierarchicalClustering(threshold=10,
+                                                 method='average')
+
+    expected = BlockClustering(blocking='precomputed',
+                               base_estimator=base_estimator,
+                               n_jobs=1).fit(X, blocks=blocks)
+
+    for n_jobs in (1, 3):
+        clusterer = ParallelBlockClustering(blocking='precomputed',
+                                            base_estimator=base_estimator,
+                                            n_jobs=n_jobs)
+        clusterer.fit(X, blocks=blocks)
+
+        assert clusterer.n_jobs == n_jobs
+        assert sorted(clusterer.clusterers_) == list(range(6))
+        assert _partition(clusterer.labels_) == \
+            _partition(expected.labels_)
+
+
+class _ProcessClusterer(BaseEstimator, ClusterMixin):
+    """Put all the samples in one cluster and keep the process id."""
+
+    def fit(self, X, y=None):
+        import os
+
+        time.sleep(0.01)
+        self.pid_ = os.getpid()
+        self.labels_ = np.zeros(len(X), dtype=np.int)
+
+        return self
+
+
+def _fit_in_process(queue):
+    """Fit blocks on two processes and put the pids of the fits."""
+    import os
+
+    from beard_server.modules.clustering.utils.beard_blocking import \
+        ParallelBlockClustering
+
+    X, blocks = _points()
+    clusterer = ParallelBlockClustering(
+        blocking='precomputed', base_estimator=_ProcessClusterer(),
+        n_jobs=2).fit(X, blocks=blocks)
+
+    queue.put((os.getpid(), sorted(clusterer.clusterers_),
+               [fitted.pid_ for fitted in clusterer.clusterers_.values()]))
+
+
+def test_daemonic_process_is_parallel():
+    """Test if a daemonic process, as a Celery worker, forks a pool."""
+    import multiprocessing
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_fit_in_process,
+                                      args=(queue,))
+    process.daemon = True
+    process.start()
+
+    try:
+        pid, keys, pids = queue.get(timeout=60)
+    finally:
+        process.join()
+
+    assert keys == list(range(6))
+    assert pid not in pids
+
+
+def test_threads_fit_their_own_blocks():
+    """Test if threads fitting blocks at the same time do not mix them."""
+    import threading
+
+    from beard_server.modules.clustering.utils.beard_blocking import \
+        ParallelBlockClustering
+
+    X, blocks = _points()
+    clusterers = {}
+
+    def fit(offset):
+        clusterers[offset] = ParallelBlockClustering(
+            blocking='precomputed', base_estimator=_SlowClusterer(),
+            n_jobs=1).fit(X, blocks=blocks + offset)
+
+    threads = [threading.Thread(target=fit, args=(offset,))
+               for offset in (0, 100)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    for offset, clusterer in clusterers.items():
+        assert sorted(clusterer.clusterers_) == list(range(offset,
+                                                           offset + 6))
+        assert all(fitted.block_ == b
+                   for b, fitted in clusterer.clusterers_.items())
+
+    assert len(clusterers) == 2
+
+
+def test_multithreaded_process_is_sequential(monkeypatch):
+    """Test if a process running other threads does not fork a pool."""
+    import billiard
+    import threading
+
+    from beard_server.modules.clustering.utils.beard_blocking import \
+        ParallelBlockClustering
+
+    def fail(*args, **kwargs):
+        raise AssertionError("A pool was created.")
+
+    monkeypatch.setattr(billiard, 'Pool', fail)
+
+    X, blocks = _points()
+    done = threading.Event()
+    thread = threading.Thread(target=done.wait)
+    thread.start()
+
+    try:
+        clusterer = ParallelBlockClustering(
+            blocking='precomputed', base_estimator=_SlowClusterer(),
+            n_jobs=2).fit(X, blocks=blocks)
+    finally:
+        done.set()
+        thread.join()
+
+    assert sorted(clusterer.clusterers_) == list(range(6))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the cheap pruning of obviously different pairs."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+
+
+def _signature(name, authors, year):
+    return {"author_name": name,
+            "publication": {"authors": authors + [name], "year": year}}
+
+
+def _block(*signatures):
+    X = np.empty((len(signatures), 1), dtype=np.object)
+
+    for i, signature in enumerate(signatures):
+        X[i, 0] = signature
+
+    return X
+
+
+def test_prune():
+    """Test which pairs are recognized as different."""
+    from beard_server.modules.clustering.utils.beard_cascade import Cascade
+
+    X = _block(_signature("Wang, Shang-Yung", ["Kao, W.F."], 1995),
+               _signature("Wang, Yi-Nan", ["Hohm, Olaf"], 2005),
+               _signature("Wang, Yi", ["Ellis, John"], 2015),
+               _signature("Wang, Yi-Bo", ["Hohm, Olaf"], 2006),
+               _signature("Wang", ["Kao, W.F."], 2000))
+    i = np.array([0, 0, 1, 1, 1, 0])
+    j = np.array([1, 2, 2, 3, 4, 4])
+
+    cascade = Cascade()
+    pruned = cascade.prune(cascade.features(X), i, j)
+
+    # Different first initials, no common coauthor: pruned. Unknown
+    # initials and common coauthors are not enough to decide.
+    assert list(pruned) == [True, True, False, False, False, False]
+    assert cascade.stats() == {'pairs': 6, 'pruned': 2,
+                               'pruned_fraction': 2 / 6}
+
+    cascade = Cascade(min_year_gap=15)
+    pruned = cascade.prune(cascade.features(X), i, j)
+
+    assert list(pruned) == [False, True, False, False, False, False]
+
+
+def test_distances_with_cascade(signatures_array, distance_model):
+    """Test if only the pruned pairs get the fixed distance."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        get_affinity_engine
+    from beard_server.modules.clustering.utils.beard_cascade import Cascade
+
+    engine = get_affinity_engine(distance_model)
+    cascade = Cascade(distance=0.99)
+
+    expected = engine.distances(signatures_array, step=7)
+    distances = engine.distances(signatures_array, step=7, cascade=cascade)
+
+    i, j = np.triu_indices(len(signatures_array), k=1)
+    pruned = cascade.prune(cascade.features(signatures_array), i, j)
+
+    assert 0 < pruned.sum() < len(pruned)
+    assert np.all(distances[pruned] == 0.99)
+    assert np.array_equal(distances[~pruned], expected[~pruned])
@@ -117,3 +117,49 @@ def test_working_clustering(app):
 
         assert data == result
         assert res.status_code == 200
+
+
+def test_upload_missing_records(app, monkeypatch, tmpdir):
+    """Check if only missing records need to be uploaded."""
+    from beard_server.modules.clustering import views
+    from beard_server.records import FilesystemRecordStore, record_ref
+
+    monkeypatch.setattr(views, 'record_store',
+                        FilesystemRecordStore(str(tmpdir)))
+    records = [{"publication_id": 1, "title": "Graphene detectors"},
+               {"publication_id": 2, "title": "Black holes"}]
+    hashes = [record_ref(record)['record_hash'] for record in records]
+
+    with app.test_client() as client:
+        res = client.post(
+            "/api/clustering/records",
+            data=json.dumps({"records": records[:1]}),
+            headers={"Content-Type": "application/json"})
+
+        assert json.loads(res.data) == {"refs": [record_ref(records[0])]}
+
+        res = client.post(
+            "/api/clustering/records/missing",
+            data=json.dumps({"hashes": hashes}),
+            headers={"Content-Type": "application/json"})
+
+        assert json.loads(res.data) == {"missing": hashes[1:]}
+
+
+def test_missing_referenced_records(app, monkeypatch, tmpdir):
+    """Check if the API will return 400 for records not uploaded."""
+    from beard_server.modules.clustering import views
+    from beard_server.records import FilesystemRecordStore, record_ref
+
+    monkeypatch.setattr(views, 'record_store',
+                        FilesystemRecordStore(str(tmpdir)))
+
+    with app.test_client() as client:
+        res = client.post(
+            "/api/clustering/clusters",
+            data=json.dumps({
+                "records": [record_ref({"publication_id": 1})],
+                "signatures": []}),
+            headers={"Content-Type": "application/json"})
+
+        assert res.status_code == 400
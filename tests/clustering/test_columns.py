@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the columnar storage of signatures."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+import pytest
+
+
+def test_views(clustering_data, signatures_array):
+    """Test if views hold the content of the loaded signatures."""
+    from beard_server.modules.clustering.utils.beard_columns import \
+        SignatureStore
+
+    records, signatures, _ = clustering_data
+    X = SignatureStore(signatures, records).array()
+
+    assert X.shape == signatures_array.shape
+
+    for view, signature in zip(X[:, 0], signatures_array[:, 0]):
+        assert dict(view) == signature
+        assert dict(view["publication"]) == signature["publication"]
+
+    with pytest.raises(KeyError):
+        X[0, 0]["missing"]
+
+
+def test_bulk(clustering_data, signatures_array):
+    """Test if getters evaluated in bulk give the values of the dicts."""
+    from beard_server.modules.clustering.utils import beard_utils
+    from beard_server.modules.clustering.utils.beard_columns import \
+        RECORD_FIELD_GETTERS
+    from beard_server.modules.clustering.utils.beard_columns import \
+        SIGNATURE_FIELD_GETTERS
+    from beard_server.modules.clustering.utils.beard_columns import \
+        SignatureStore
+
+    records, signatures, _ = clustering_data
+    store = SignatureStore(signatures, records)
+    indices = [5, 0, 3, 3, 17]
+    getters = list(SIGNATURE_FIELD_GETTERS) + list(RECORD_FIELD_GETTERS) + \
+        [beard_utils.get_coauthors_from_range]
+
+    for getter in getters:
+        expected = [getter(signatures_array[index, 0]) for index in indices]
+        assert store.bulk(getter, indices).tolist() == expected
+
+
+def test_distances(clustering_data, signatures_array, distance_model):
+    """Test if distances on views are the ones on dicts."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        AffinityEngine
+    from beard_server.modules.clustering.utils.beard_columns import \
+        SignatureStore
+    from beard_server.registry import load_model
+
+    records, signatures, _ = clustering_data
+    X = SignatureStore(signatures, records).array()
+    engine = AffinityEngine(load_model(distance_model))
+
+    assert np.array_equal(engine.distances(X),
+                          engine.distances(signatures_array))
+
+
+def test_signature_key(clustering_data):
+    """Test if views are hashed by their content."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        signature_key
+    from beard_server.modules.clustering.utils.beard_columns import \
+        SignatureStore
+
+    records, signatures, _ = clustering_data
+    X = SignatureStore(signatures, records).array()
+    Y = SignatureStore(signatures, records).array()
+    keys = [signature_key(view) for view in X[:, 0]]
+
+    assert keys == [signature_key(view) for view in Y[:, 0]]
+    assert len(set(keys)) == len(keys)
+
+
+def test_coauthor_windows():
+    """Test if windows of joined authors are the ones of the getters."""
+    from beard_server.modules.clustering.utils import beard_utils
+    from beard_server.modules.clustering.utils.beard_columns import \
+        SignatureStore
+
+    authors = ["Author, %d" % k for k in range(40)] + ["Author, 3"]
+    records = [{"publication_id": 0, "authors": authors,
+                "keywords": ["a", "b"], "collaborations": []},
+               {"publication_id": 1, "authors": [],
+                "keywords": [], "collaborations": ["ATLAS"]}]
+    signatures = [{"signature_id": k, "publication_id": 0,
+                   "author_name": name}
+                  for k, name in enumerate(authors[::3] + ["Other, A"])]
+    signatures.append({"signature_id": 100, "publication_id": 1,
+                       "author_name": "Author, 1"})
+
+    store = SignatureStore(signatures, records)
+    indices = list(range(len(store)))
+
+    assert store.author_positions.tolist() == \
+        list(range(0, 40, 3)) + [-1, -1]
+
+    for getter in (beard_utils.get_coauthors_from_range,
+                   beard_utils.get_coauthors,
+                   beard_utils.get_keywords,
+                   beard_utils.get_collaborations):
+        expected = [getter(view) for view in store.array()[:, 0]]
+        assert store.bulk(getter, indices).tolist() == expected
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the clustering of weighted representatives."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import copy
+
+import numpy as np
+
+
+def _duplicated(clustering_data):
+    """Add a copy of each of the first six signatures."""
+    records, signatures, labels = clustering_data
+    copies = []
+
+    for signature in signatures[:6]:
+        signature = copy.deepcopy(signature)
+        signature["signature_id"] += "_copy"
+        copies.append(signature)
+
+    return records, signatures + copies, labels + labels[:6]
+
+
+def test_duplicates(clustering_data, distance_model):
+    """Test if copies of signatures are found."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        get_affinity_engine
+    from beard_server.modules.clustering.utils.beard_utils import \
+        load_signatures
+
+    records, signatures, _ = _duplicated(clustering_data)
+    signatures_by_id, _ = load_signatures(signatures, records)
+
+    X = np.empty((len(signatures), 1), dtype=np.object)
+    for i, signature in enumerate(signatures):
+        X[i, 0] = signatures_by_id[signature["signature_id"]]
+
+    groups = get_affinity_engine(distance_model).duplicates(X)
+
+    assert list(groups[18:]) == list(groups[:6])
+    assert list(np.unique(groups)) == list(range(groups.max() + 1))
+    assert groups.max() < 18
+
+
+def test_deduplicated_linkage():
+    """Test if representatives give the clusters of all the samples."""
+    import scipy.cluster.hierarchy as hac
+    from scipy.spatial.distance import squareform
+
+    from beard_server.modules.clustering.utils.beard_dedupe import \
+        DeduplicatedLinkage
+
+    random_state = np.random.RandomState(1)
+    n_groups = 30
+    # Samples 30 to 59 copy some of the first ones.
+    groups = np.concatenate((np.arange(n_groups),
+                             random_state.randint(0, 10, 30)))
+    authors = random_state.randint(0, 6, n_groups)
+
+    group_distances = np.where(authors[:, None] == authors[None, :],
+                               random_state.uniform(0.0, 0.6,
+                                                    (n_groups, n_groups)),
+                               random_state.uniform(0.5, 1.0,
+                                                    (n_groups, n_groups)))
+    group_distances = np.triu(group_distances, 1)
+    group_distances += group_distances.T
+    np.fill_diagonal(group_distances, 0.01)
+    distances = group_distances[groups[:, None], groups[None, :]]
+    np.fill_diagonal(distances, 0.0)
+
+    expected = hac.fcluster(hac.linkage(squareform(distances),
+                                        method='average'),
+                            0.55, criterion='distance')
+
+    X = np.arange(len(groups))[:, None]
+    clusterer = DeduplicatedLinkage(
+        duplicates=lambda X: groups.copy(),
+        affinity=lambda X, i, j: group_distances[groups[i], groups[j]],
+        threshold=0.55).fit(X)
+
+    assert clusterer.n_representatives_ == n_groups
+    assert len(set(zip(expected, clusterer.labels_))) == \
+        len(set(expected)) == len(set(clusterer.labels_))
+
+
+def test_clustering_deduplicate(clustering_data, distance_model):
+    """Test if copies end up with their originals."""
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, labels = _duplicated(clustering_data)
+    partitions = []
+
+    for deduplicate in (False, True):
+        clusters = clustering(input_signatures=signatures,
+                              input_records=records,
+                              distance_model=distance_model,
+                              verbose=0, n_jobs=1,
+                              clustering_threshold=0.709,
+                              blocking_threshold=0,
+                              deduplicate=deduplicate)
+        partitions.append(sorted(sorted(c) for c in clusters.values()))
+
+    assert partitions[0] == partitions[1]
+    assert len(partitions[1]) == 3
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the incremental assignment of new signatures."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+
+def _existing_clusters(signatures, labels, new_ids):
+    clusters = {}
+
+    for signature, label in zip(signatures, labels):
+        if signature["signature_id"] not in new_ids:
+            clusters.setdefault("%d" % label, []).append(
+                signature["signature_id"])
+
+    return clusters
+
+
+def test_assign_signatures(clustering_data, distance_model):
+    """Test if new signatures join the clusters of their authors."""
+    from beard_server.modules.clustering.incremental import \
+        assign_signatures
+
+    records, signatures, labels = clustering_data
+    new_ids = set(s["signature_id"] for s in signatures[-3:])
+    clusters = _existing_clusters(signatures, labels, new_ids)
+
+    result = assign_signatures(records, signatures, clusters,
+                               distance_model=distance_model,
+                               max_members=2, batch_size=5)
+
+    expected = _existing_clusters(signatures, labels, set())
+
+    assert (dict((k, sorted(v)) for k, v in result.items()) ==
+            dict((k, sorted(v)) for k, v in expected.items()))
+
+
+def test_assign_signatures_new_clusters(clustering_data, distance_model):
+    """Test if signatures far from all the clusters get new labels."""
+    from beard_server.modules.clustering.incremental import \
+        assign_signatures
+
+    records, signatures, labels = clustering_data
+    new_ids = set(s["signature_id"] for s in signatures[-2:])
+    clusters = _existing_clusters(signatures, labels, new_ids)
+    clusters["new_0"] = clusters.pop("0")
+
+    result = assign_signatures(records, signatures, clusters,
+                               distance_model=distance_model,
+                               clustering_threshold=0.0)
+
+    assert sorted(result) == ["1", "2", "new_0", "new_1", "new_2"]
+    assert sorted(result["new_1"] + result["new_2"]) == sorted(new_ids)
+
+
+def test_assign_signatures_fallback(clustering_data, distance_model):
+    """Test if unstable assignments are left to a full clustering."""
+    from beard_server.modules.clustering.incremental import \
+        assign_signatures
+
+    records, signatures, labels = clustering_data
+    new_ids = set(s["signature_id"] for s in signatures[-3:])
+    clusters = _existing_clusters(signatures, labels, new_ids)
+
+    assert assign_signatures(records, signatures, clusters,
+                             distance_model=distance_model,
+                             max_instability=-1) is None
+    assert assign_signatures(records, signatures, clusters,
+                             distance_model=distance_model,
+                             max_new_fraction=0.1) is None
+    assert assign_signatures(records, signatures, {},
+                             distance_model=distance_model) is None
+
+    clusters = _existing_clusters(signatures, labels, set())
+
+    assert assign_signatures(records, signatures, clusters,
+                             distance_model=distance_model) == clusters
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the derived forms of author names."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+import pytest
+
+NAMES = ["Wang, Yi-Nan", "Wang, Y.", "Sanchez-Gomez, Juan",
+         "Gomez, Juan Sanchez", "Gomez, J. Sanchez", "Sanchez Gomez, J.",
+         "de la Cruz, Maria", "Cruz, M.", "Smith", "Jones-Smith, Paul John",
+         "Smith, Paul", "O'Neil, Fay", "Smith Jones, A.", "Jones, A. Smith"]
+
+
+def test_name_forms():
+    """Test if the forms are the ones of the getters of Beard."""
+    from beard.utils import given_name
+    from beard.utils import given_name_initial
+    from beard.utils import normalize_name
+
+    from beard_server.modules.clustering.utils.beard_names import NameForms
+
+    for name in NAMES:
+        forms = NameForms(name)
+
+        assert forms.full_name == normalize_name(name)
+        assert forms.first_given_name == given_name(name, 0)
+        assert forms.second_given_name == given_name(name, 1)
+        assert forms.first_initial == given_name_initial(name, 0)
+        assert forms.second_initial == given_name_initial(name, 1)
+
+    assert NameForms("").full_name == ""
+    assert NameForms("Wang, Yi-Nan").other_names == normalize_name("Yi-Nan")
+
+
+@pytest.mark.parametrize("threshold", [0, 1, 1000])
+@pytest.mark.parametrize("algorithm", ["double_metaphone", "nysiis"])
+def test_block_phonetic(clustering_data, threshold, algorithm):
+    """Test if the blocks are the ones of Beard."""
+    from beard.clustering import block_phonetic as beard_block_phonetic
+
+    from beard_server.modules.clustering.utils.beard_names import \
+        block_phonetic
+
+    _, signatures, _ = clustering_data
+    names = [s["author_name"] for s in signatures] + NAMES
+    X = np.array([{"author_name": name} for name in names],
+                 dtype=np.object).reshape(-1, 1)
+
+    assert list(block_phonetic(X, threshold, algorithm)) == \
+        list(beard_block_phonetic(X, threshold, algorithm))
+
+
+def test_name_cache():
+    """Test if the cache is bounded and counts hits and misses."""
+    from beard_server.modules.clustering.utils.beard_names import NameCache
+
+    cache = NameCache(4)
+    forms = cache.get("Wang, Yi")
+
+    assert cache.get("Wang, Yi") is forms
+
+    for k in range(10):
+        cache.get("Name, %d" % k)
+
+    assert len(cache) <= 4
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 11
+    assert cache.get("Wang, Yi") is not forms
+
+    assert len(NameCache(0).get("Wang, Yi").full_name) > 0
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the resolution of claims conflicts."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+
+def test_solve_claims_conflict(clustering_data, signatures_array,
+                               distance_model):
+    """Test if not-claimed signatures go to the claimed ones of the author."""
+    from beard_server.modules.clustering.resolver import \
+        solve_claims_conflict
+
+    _, signatures, labels = clustering_data
+    label_of = dict(zip([s["signature_id"] for s in signatures], labels))
+
+    claimed_signatures = []
+    not_claimed_signatures = []
+    claimed_labels = set()
+
+    for signature in signatures_array[:, 0]:
+        label = label_of[signature["signature_id"]]
+
+        if label in claimed_labels:
+            not_claimed_signatures.append(signature)
+        else:
+            claimed_labels.add(label)
+            claimed_signatures.append(signature)
+
+    results = solve_claims_conflict(claimed_signatures,
+                                    not_claimed_signatures,
+                                    distance_model=distance_model)
+
+    assert sorted(results) == sorted(s["signature_id"]
+                                     for s in claimed_signatures)
+
+    for claimed_id, not_claimed_ids in results.items():
+        for not_claimed_id in not_claimed_ids:
+            assert label_of[not_claimed_id] == label_of[claimed_id]
+
+    assert sum(len(ids) for ids in results.values()) == \
+        len(not_claimed_signatures)
+
+
+def test_batch_size_does_not_change_results(signatures_array,
+                                            distance_model):
+    """Test if chunks of any size give the same assignments."""
+    from beard_server.modules.clustering.resolver import \
+        iter_claims_assignments
+
+    signatures = list(signatures_array[:, 0])
+    claimed_signatures = signatures[:4]
+    not_claimed_signatures = signatures[4:]
+
+    expected = list(iter_claims_assignments(claimed_signatures,
+                                            not_claimed_signatures,
+                                            distance_model=distance_model,
+                                            batch_size=1))
+
+    assert [not_claimed_id for not_claimed_id, _ in expected] == \
+        [signature['signature_id'] for signature in not_claimed_signatures]
+
+    for batch_size in (12, 1000):
+        assignments = iter_claims_assignments(
+            claimed_signatures, iter(not_claimed_signatures),
+            distance_model=distance_model, batch_size=batch_size)
+
+        assert list(assignments) == expected
+
+
+def test_no_claimed_signatures(signatures_array, distance_model):
+    """Test if nothing is assigned without claimed signatures."""
+    from beard_server.modules.clustering.resolver import \
+        solve_claims_conflict
+
+    assert solve_claims_conflict([], list(signatures_array[:, 0]),
+                                 distance_model=distance_model) == {}
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test average linkage on sparse graphs."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+
+
+def _same_partition(labels_a, labels_b):
+    pairs = set(zip(labels_a, labels_b))
+
+    return len(pairs) == len(set(labels_a)) == len(set(labels_b))
+
+
+def test_sparse_average_linkage():
+    """Test if the clusters are the ones of a full average linkage."""
+    import scipy.cluster.hierarchy as hac
+
+    from beard_server.modules.clustering.utils.beard_sparse import \
+        sparse_average_linkage
+
+    random_state = np.random.RandomState(0)
+    n_samples = 60
+    groups = random_state.randint(0, 8, n_samples)
+
+    i, j = np.triu_indices(n_samples, k=1)
+    distances = np.where(groups[i] == groups[j],
+                         random_state.uniform(0.0, 0.6, len(i)),
+                         random_state.uniform(0.5, 1.0, len(i)))
+    # A third of the pairs are missing from the sparse graph.
+    known = random_state.rand(len(i)) < 0.66
+    dense = np.where(known, distances, 1.0)
+
+    expected = hac.fcluster(hac.linkage(dense, method='average'), 0.55,
+                            criterion='distance')
+    labels = sparse_average_linkage(n_samples, i[known], j[known],
+                                    distances[known], 0.55)
+
+    assert _same_partition(expected, labels)
+    assert labels.min() == 0
+    assert labels.max() == len(set(labels)) - 1
+
+
+def test_sparse_average_linkage_without_pairs():
+    """Test if samples without known distances stay alone."""
+    from beard_server.modules.clustering.utils.beard_sparse import \
+        sparse_average_linkage
+
+    empty = np.zeros(0, dtype=np.int64)
+    labels = sparse_average_linkage(3, empty, empty, np.zeros(0), 0.5)
+
+    assert sorted(labels) == [0, 1, 2]
+
+
+def test_candidate_pairs(signatures_array):
+    """Test if candidate pairs are unique and ordered."""
+    from beard_server.modules.clustering.utils.beard_sparse import \
+        candidate_pairs
+
+    n_samples = len(signatures_array)
+    i, j = candidate_pairs(signatures_array)
+
+    assert np.all(i < j)
+    assert len(set(zip(i, j))) == len(i)
+    assert 0 < len(i) <= n_samples * (n_samples - 1) // 2
+
+    # A window of one pairs only consecutive signatures of large buckets.
+    i_small, _ = candidate_pairs(signatures_array, max_bucket_size=1,
+                                 window=1)
+
+    assert len(i_small) <= len(i)
+
+
+def test_dense_estimator(signatures_array):
+    """Test if small blocks are given to the dense estimator."""
+    from beard.clustering import ScipyHierarchicalClustering
+
+    from beard_server.modules.clustering.utils.beard_sparse import \
+        SparseAverageLinkage
+
+    def affinity(X):
+        return np.zeros(len(X) * (len(X) - 1) // 2)
+
+    clusterer = SparseAverageLinkage(
+        threshold=0.5,
+        dense_estimator=ScipyHierarchicalClustering(affinity=affinity,
+                                                    threshold=0.5,
+                                                    method='average'),
+        max_dense_size=len(signatures_array)).fit(signatures_array)
+
+    assert len(set(clusterer.labels_)) == 1
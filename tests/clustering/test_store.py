@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the persistent distance matrices of blocks."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+
+
+def _distance(a, b):
+    a, b = sorted((a, b))
+    return (hash((a, b)) % 1000) / 1000
+
+
+def _condensed(keys):
+    i, j = np.triu_indices(len(keys), k=1)
+    return np.array([_distance(keys[a], keys[b]) for a, b in zip(i, j)])
+
+
+def test_splice_distances():
+    """Test if stored and computed distances are put at their places."""
+    from beard_server.modules.clustering.utils.beard_store import \
+        splice_distances
+
+    old_keys = ['a', 'b', 'c', 'd', 'e']
+    keys = ['d', 'x', 'b', 'e', 'y', 'a']
+    computed = []
+
+    def compute(i, j):
+        computed.extend(zip(i, j))
+        return np.array([_distance(keys[a], keys[b]) for a, b in zip(i, j)])
+
+    distances, n_computed = splice_distances(
+        keys, old_keys, _condensed(old_keys).astype(np.float32), compute)
+
+    assert np.array_equal(distances,
+                          _condensed(keys).astype(np.float32))
+    # Pairs of the two new signatures with the five others and each other.
+    assert n_computed == len(computed) == 9
+    assert all(keys[a] in 'xy' or keys[b] in 'xy' for a, b in computed)
+
+
+def test_distance_store(tmpdir, signatures_array, distance_model):
+    """Test if only the distances of new signatures are computed."""
+    from beard_server.modules.clustering.utils.beard_affinity import \
+        get_affinity_engine
+    from beard_server.modules.clustering.utils.beard_store import \
+        DistanceStore
+
+    engine = get_affinity_engine(distance_model)
+    store = DistanceStore(str(tmpdir.join('store')), 1 << 20)
+
+    def distances(X):
+        return store.distances('v1/WANGy', X, lambda i, j:
+                               engine.pair_distances(X, i, j))
+
+    X = signatures_array[:10]
+    expected = engine.distances(X).astype(np.float32)
+
+    assert np.array_equal(distances(X), expected)
+    assert store.stats()['computed_pairs'] == 45
+
+    assert np.array_equal(distances(X), expected)
+    assert store.stats()['computed_pairs'] == 45
+    assert store.stats()['hits'] == 1
+
+    X = signatures_array[:11]
+    assert np.array_equal(distances(X),
+                          engine.distances(X).astype(np.float32))
+    assert store.stats()['computed_pairs'] == 55
+    assert store.stats()['reused_pairs'] == 90
+    assert store.stats()['entries'] == 1
+
+    keys, stored = store.load('v1/WANGy')
+    assert len(keys) == 11
+    assert len(stored) == 55
+
+
+def test_distance_store_eviction(tmpdir):
+    """Test if the least recently used matrices are removed."""
+    import os
+
+    from beard_server.modules.clustering.utils.beard_store import \
+        DistanceStore
+
+    store = DistanceStore(str(tmpdir), 2000)
+    keys = ['%d' % i for i in range(20)]
+    distances = np.zeros(190)
+
+    store.save('a', keys, distances)
+    store.save('b', keys, distances)
+    assert store.stats()['entries'] == 2
+
+    for name in os.listdir(str(tmpdir)):
+        os.utime(str(tmpdir.join(name)), (0, 0))
+
+    # Only the files of "a" are refreshed.
+    store.load('a')
+    store.save('c', keys, distances)
+
+    assert store.load('a') is not None
+    assert store.load('b') is None
+    assert store.load('c') is not None
+
+    store.clear()
+    assert store.stats()['entries'] == 0
+
+
+def test_clustering_with_store(tmpdir, clustering_data, distance_model):
+    """Test if stored matrices give the same clusters."""
+    from beard_server.modules.clustering.utils import clustering
+    from beard_server.modules.clustering.utils.beard_store import \
+        DistanceStore
+
+    records, signatures, _ = clustering_data
+    store = DistanceStore(str(tmpdir), 1 << 20)
+    partitions = []
+
+    for _ in range(2):
+        clusters = clustering(input_signatures=signatures,
+                              input_records=records,
+                              distance_model=distance_model,
+                              verbose=0, n_jobs=1,
+                              clustering_threshold=0.709,
+                              blocking_threshold=0,
+                              store=store)
+        partitions.append(sorted(sorted(c) for c in clusters.values()))
+
+    assert partitions[0] == partitions[1]
+    assert len(partitions[0]) == 3
+    assert store.stats()['hits'] == 2
+    assert store.stats()['reused_pairs'] == store.stats()['computed_pairs']
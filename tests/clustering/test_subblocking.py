@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the size-aware blocking."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+
+
+def _phonetic(X):
+    from beard.clustering import block_phonetic
+
+    return block_phonetic(X, threshold=0, phonetic_algorithm="nysiis")
+
+
+def test_block_size_aware(signatures_array):
+    """Test if only the blocks above the size are split."""
+    from beard_server.modules.clustering.utils.beard_subblocking import \
+        SEPARATOR, block_size_aware
+
+    expected = _phonetic(signatures_array)
+    blocks = block_size_aware(signatures_array, _phonetic, 100)
+
+    assert list(blocks) == list(expected)
+
+    blocks = block_size_aware(signatures_array, _phonetic, 1)
+
+    assert [key.split(SEPARATOR)[0] for key in blocks] == list(expected)
+    # Three authors, each with connected coauthors.
+    assert len(set(blocks)) == 3
+
+    blocks = block_size_aware(signatures_array, _phonetic, 1,
+                              split_coauthors=False)
+
+    assert all(len(key.split(SEPARATOR)) == 3 for key in blocks)
+
+
+def test_names_compatible():
+    """Test which given names may belong to the same person."""
+    from beard_server.modules.clustering.utils.beard_subblocking import \
+        _names_compatible
+
+    assert _names_compatible("y", "nan yi")
+    assert _names_compatible("yi", "nan yi")
+    assert _names_compatible("n y", "nan yi")
+    assert _names_compatible("", "nan yi")
+    assert not _names_compatible("yi", "yu")
+    assert not _names_compatible("b y", "nan yi")
+
+
+def test_link_subblocks(signatures_array):
+    """Test if clusters of compatible sub-blocks are merged."""
+    from beard_server.modules.clustering.utils.beard_subblocking import \
+        block_size_aware, link_subblocks
+
+    blocks = block_size_aware(signatures_array, _phonetic, 1)
+    labels = np.unique(blocks, return_inverse=True)[1]
+
+    def close(X, i, j):
+        return np.zeros(len(i))
+
+    def far(X, i, j):
+        return np.ones(len(i))
+
+    # "Yi" and "Yi-Nan" are compatible, "Shang-Yung" is in another block.
+    linked = link_subblocks(signatures_array, labels, blocks, close, 0.5)
+    assert len(set(linked)) == 2
+
+    linked = link_subblocks(signatures_array, labels, blocks, far, 0.5)
+    assert list(linked) == list(labels)
+
+    linked = link_subblocks(signatures_array, labels, blocks, close, 0.5,
+                            max_pairs=0)
+    assert list(linked) == list(labels)
+
+
+def test_link_subblocks_chaining():
+    """Test if clusters are not chained through a compatible cluster."""
+    from beard_server.modules.clustering.utils.beard_subblocking import \
+        SEPARATOR, link_subblocks
+
+    X = np.array([["y"], ["yi"], ["yan"], ["n yi"]], dtype=np.object)
+    labels = np.arange(len(X))
+    blocks = ["WANG" + SEPARATOR + "y" + SEPARATOR + name
+              for name in X[:, 0]]
+    scores = {("y", "yi"): 0.1, ("y", "yan"): 0.3, ("y", "n yi"): 0.4,
+              ("yi", "n yi"): 0.9}
+
+    def affinity(X, i, j):
+        return np.array([scores.get((a, b), scores.get((b, a)))
+                         for a, b in zip(X[i, 0], X[j, 0])])
+
+    # "Yi" and "Yan" are never compared, and the average distance of
+    # "Y, Yi" and "Nan Yi" is above the threshold.
+    linked = link_subblocks(X, labels, blocks, affinity, 0.5)
+    assert list(linked) == [0, 0, 2, 3]
+
+    linked = link_subblocks(X, labels, blocks, affinity, 0.65)
+    assert list(linked) == [0, 0, 2, 0]
+
+
+def test_block_histogram():
+    """Test if blocks are counted in powers of two."""
+    from beard_server.modules.clustering.utils.beard_subblocking import \
+        block_histogram
+
+    blocks = ["a"] + ["b"] * 2 + ["c"] * 3 + ["d"] * 9
+
+    assert block_histogram(blocks) == [(1, 1), (2, 2), (8, 1)]
+
+
+def test_clustering_max_block_size(clustering_data, distance_model):
+    """Test if split blocks still give the clusters of the authors."""
+    from beard_server.modules.clustering.utils import clustering
+
+    records, signatures, labels = clustering_data
+
+    clusters = clustering(input_signatures=signatures,
+                          input_records=records,
+                          distance_model=distance_model,
+                          verbose=0, n_jobs=1,
+                          clustering_threshold=0.709,
+                          blocking_threshold=0,
+                          max_block_size=1)
+
+    expected = {}
+    for signature, label in zip(signatures, labels):
+        expected.setdefault(label, []).append(signature["signature_id"])
+
+    assert (sorted(sorted(c) for c in clusters.values()) ==
+            sorted(sorted(c) for c in expected.values()))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the helpers for author disambiguation."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+
+def _getters():
+    from beard_server.modules.clustering.utils import beard_utils
+
+    return (beard_utils.get_coauthors_from_range,
+            beard_utils.get_coauthors,
+            beard_utils.get_keywords,
+            beard_utils.get_collaborations)
+
+
+def test_indexed_records(clustering_data):
+    """Test if the getters give the same values on indexed records."""
+    from beard_server.modules.clustering.utils.beard_utils import \
+        IndexedRecord, load_signatures
+
+    records, signatures, _ = clustering_data
+    signatures, _ = load_signatures(signatures, records)
+
+    for signature in signatures.values():
+        assert isinstance(signature["publication"], IndexedRecord)
+        plain = dict(signature, publication=dict(signature["publication"]))
+
+        for getter in _getters():
+            assert getter(signature) == getter(plain)
+
+
+def test_indexed_coauthor_windows():
+    """Test if windows of indexed authors are the ones of the getters."""
+    import pickle
+
+    from beard_server.modules.clustering.utils.beard_utils import \
+        IndexedRecord, load_signatures
+
+    authors = ["Author, %d" % k for k in range(40)] + ["Author, 3"]
+    records = [{"publication_id": 0, "authors": authors,
+                "keywords": ["a", "b"], "collaborations": []}]
+    signatures = [{"signature_id": k, "publication_id": 0,
+                   "author_name": name}
+                  for k, name in enumerate(authors[::3] + ["Other, A"])]
+    expected = [[getter(dict(s, publication=records[0]))
+                 for getter in _getters()] for s in signatures]
+
+    loaded, _ = load_signatures(signatures, records)
+
+    for _ in range(2):
+        assert [[getter(loaded[s["signature_id"]]) for getter in _getters()]
+                for s in signatures] == expected
+
+    record = loaded[0]["publication"]
+    copied = pickle.loads(pickle.dumps(record))
+
+    assert isinstance(copied, IndexedRecord)
+    assert copied == records[0]
+    assert copied.joined("keywords") == "a b"
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the assignment algorithm."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+
+def test_the_same_clusters():
+    """Test if the two exact clusters will be matched."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {1: set(['A', 'B'])}
+    partition_after = {2: set(['A', 'B'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([(1, 2)], [], [])
+
+
+def test_cluster_adding():
+    """Test if the new cluster will be distinguished."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {}
+    partition_after = {1: set(['A', 'B'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([], [1], [])
+
+
+def test_cluster_removal():
+    """Test if the removed cluster will be distinguished."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {1: set(['A', 'B'])}
+    partition_after = {}
+
+    match = _solve_clusters(partition_before,
+                            partition_after)
+
+    assert match == ([], [], [1])
+
+
+def test_complex_matching():
+    """Test more complex clustering with no removal or adding."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {1: set(['A', 'B']), 2: set(['C', 'D', 'E'])}
+    partition_after = {3: set(['A', 'C', 'E']), 4: set(['B', 'D'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([(1, 4), (2, 3)], [], [])
+
+
+def test_complex_adding():
+    """Test more complex clustering with adding a new cluster."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {1: set(['A', 'B', 'C'])}
+    partition_after = {2: set(['A', 'B']), 3: set(['C'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([(1, 2)], [3], [])
+
+
+def test_complex_removal():
+    """Test more complex clustering with removing a cluster."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {1: set(['A', 'B']), 2: set(['C'])}
+    partition_after = {3: set(['A', 'B', 'C'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([(1, 3)], [], [2])
+
+
+def test_strings_as_keys():
+    """Test clustering based on strings as keys."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {"1": set(['A', 'B']), "2": set(['C'])}
+    partition_after = {"3": set(['A', 'B', 'C'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([('1', '3')], [], ['2'])
+
+
+def test_different_types_as_keys():
+    """Test clustering based on strings as keys."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {1: set(['A', 'B']), "2": set(['C'])}
+    partition_after = {"3": set(['A', 'B', 'C']), 4: set(['E', 'F'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([(1, '3')], [4], ['2'])
+
+
+def test_many_virtual_agents():
+    """Test clustering based on strings as keys."""
+    from beard_server.modules.matching.assignment import _solve_clusters
+
+    partition_before = {1: set(['A'])}
+    partition_after = {1: set(['A', 'B', 'C']), 2: set(['D']),
+                       "3": set(['E', 'F'])}
+
+    match = _solve_clusters(partition_before, partition_after)
+
+    assert match == ([(1, 1)], [2, '3'], [])
+
+
+def _objective(partition_before, partition_after, match):
+    """Compute the cost of the matching, as minimized by the solvers."""
+    n_after = len(partition_after)
+    pairs = [(partition_before[before], partition_after[after])
+             for before, after in match[0]]
+    pairs.extend((set(), partition_after[after]) for after in match[1])
+
+    return sum(-len(before & after) -
+               1. / (n_after * (1 + len(before ^ after)))
+               for before, after in pairs)
+
+
+def test_same_as_simplex():
+    """Test if the matching is as good as the one of the simplex method."""
+    import random
+
+    import pytest
+
+    from beard_server.modules.matching import assignment, simplex
+
+    random.seed(0)
+
+    for _ in range(5):
+        partition_before = {}
+        partition_after = {}
+
+        for signature in range(30):
+            partition_before.setdefault(random.randint(0, 5),
+                                        set()).add(signature)
+            partition_after.setdefault('a%d' % random.randint(0, 7),
+                                       set()).add(signature)
+
+        match = assignment._solve_clusters(partition_before, partition_after)
+        expected = simplex._solve_clusters(partition_before, partition_after)
+
+        assert len(match[0]) + len(match[1]) == len(partition_after)
+        assert len(match[0]) + len(match[2]) == len(partition_before)
+        assert _objective(partition_before, partition_after, match) == \
+            pytest.approx(_objective(partition_before, partition_after,
+                                     expected))
+
+
+def test_separate_components():
+    """Test matching clusters forming several components of overlaps."""
+    import pytest
+
+    from beard_server.modules.matching import assignment, simplex
+
+    partition_before = {1: set(['A', 'B']), 2: set(['C']), 3: set(['D']),
+                        4: set(['E', 'F']), 5: set(['G'])}
+    partition_after = {6: set(['A']), 7: set(['B', 'C']), 8: set(['D']),
+                       9: set(['E']), 10: set(['F']), 11: set(['H'])}
+
+    match = assignment._solve_clusters(partition_before, partition_after)
+    expected = simplex._solve_clusters(partition_before, partition_after)
+
+    assert sorted(match[1]) == [9, 11] or sorted(match[1]) == [10, 11]
+    assert match[2] == [5] or sorted(match[2]) == [2, 5]
+    assert (3, 8) in match[0]
+    assert _objective(partition_before, partition_after, match) == \
+        pytest.approx(_objective(partition_before, partition_after,
+                                 expected))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the cost matrix of the matching."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import numpy as np
+
+
+def _naive_cost_matrix(clusters_before, clusters_after):
+    cost = np.zeros((len(clusters_before), len(clusters_after)))
+
+    for index_before, cluster_before in clusters_before.items():
+        for index_after, cluster_after in clusters_after.items():
+            cost[index_before, index_after] = -len(
+                cluster_before & cluster_after) - 1. / \
+                (len(clusters_after) * (1 + len(
+                    cluster_before ^ cluster_after)))
+
+    return cost
+
+
+def test_cost_matrix():
+    """Test the example of the docstring."""
+    from beard_server.modules.matching.cost import _cost_matrix
+
+    clusters_before = {0: set(['A', 'B']), 1: set(['C']), 2: set(),
+                       3: set()}
+    clusters_after = {0: set(['B']), 1: set(['A', 'C'])}
+
+    np.testing.assert_allclose(_cost_matrix(clusters_before, clusters_after),
+                               [[-1.25, -1.16666667],
+                                [-0.16666667, -1.25],
+                                [-0.25, -0.16666667],
+                                [-0.25, -0.16666667]])
+
+
+def test_cost_matrix_matches_naive():
+    """Test if the costs are the ones of the pairwise set operations."""
+    from beard_server.modules.matching.cost import _cost_matrix, _overlaps
+
+    random_state = np.random.RandomState(0)
+    labels_before = random_state.randint(40, size=200)
+    labels_after = random_state.randint(30, size=200)
+
+    clusters_before = dict((index, set()) for index in range(50))
+    clusters_after = dict((index, set()) for index in range(30))
+
+    for signature, (before, after) in enumerate(zip(labels_before,
+                                                    labels_after)):
+        clusters_before[before].add('s%d' % signature)
+        clusters_after[after].add('s%d' % signature)
+
+    intersections, sizes_before, sizes_after = _overlaps(clusters_before,
+                                                         clusters_after)
+
+    assert intersections.shape == (50, 30)
+    assert intersections.nnz < 50 * 30
+    assert list(sizes_before[40:]) == [0] * 10
+
+    np.testing.assert_array_equal(
+        _cost_matrix(clusters_before, clusters_after),
+        _naive_cost_matrix(clusters_before, clusters_after))
+
+
+def test_cost_matrix_no_clusters_after():
+    """Test if an empty state after gives an empty matrix."""
+    from beard_server.modules.matching.cost import _cost_matrix
+
+    assert _cost_matrix({0: set(['A'])}, {}).shape == (1, 0)
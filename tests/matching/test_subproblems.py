@@ -89,3 +89,50 @@ def test_type_error():
 
     with pytest.raises(TypeError):
         _divide_into_subproblems(partition_before, partition_after)
+
+
+def test_long_chain():
+    """Test if a long chain of clusters does not hit the recursion limit."""
+    import sys
+
+    from beard_server.modules.matching.subproblems import \
+        _divide_into_subproblems
+
+    length = sys.getrecursionlimit() * 2
+
+    partition_before = dict((index, ['s%d' % (2 * index),
+                                     's%d' % (2 * index + 1)])
+                            for index in range(length))
+    partition_after = dict((-index - 1, ['s%d' % (2 * index + 1),
+                                         's%d' % (2 * index + 2)])
+                           for index in range(length))
+
+    match = _divide_into_subproblems(partition_before, partition_after)
+
+    assert len(match) == 1
+    assert len(match[0][0]) == len(match[0][1]) == length
+
+
+def test_colliding_keys():
+    """Test if cluster keys are not mixed with signatures or each other."""
+    from beard_server.modules.matching.subproblems import \
+        _divide_into_subproblems
+
+    # The same key in the-state-before and in the-state-after.
+    match = _divide_into_subproblems({1: ['A']}, {1: ['A'], 2: ['B']})
+
+    assert match == [({1: set(['A'])}, {1: set(['A'])}),
+                     ({}, {2: set(['B'])})]
+
+    match = _divide_into_subproblems({1: ['A']}, {1: ['B']})
+
+    assert match == [({1: set(['A'])}, {}), ({}, {1: set(['B'])})]
+
+    # Keys equal to signatures do not link clusters.
+    match = _divide_into_subproblems({'A': ['B']}, {'C': ['A']})
+
+    assert match == [({'A': set(['B'])}, {}), ({}, {'C': set(['A'])})]
+
+    match = _divide_into_subproblems({1: [2], 2: [3]}, {4: [3]})
+
+    assert match == [({1: set([2])}, {}), ({2: set([3])}, {4: set([3])})]
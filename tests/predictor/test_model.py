@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Test the cached coreness model."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import cPickle as pickle
+import os
+
+
+def _dump(path, model):
+    with open(path, 'wb') as fp:
+        pickle.dump(model, fp)
+
+
+def test_cached_model_is_reloaded_when_changed(tmpdir):
+    """Test if a new model file is picked up after the check interval."""
+    from beard_server.modules.predictor.model import CachedModel
+
+    path = str(tmpdir.join('linkage.dat'))
+    _dump(path, {'coef': [1, 2]})
+
+    model = CachedModel(path, check_interval=3600)
+    first, event = model.load()
+
+    assert event == 'cold'
+    assert model.load() == (first, None)
+
+    _dump(path, {'coef': [3, 4]})
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime + 10, stat.st_mtime + 10))
+
+    # Not checked before the end of the interval.
+    assert model.get() is first
+
+    model.check_interval = 0
+    model._current = (first, 0)
+    second, event = model.load()
+
+    assert event == 'reload'
+    assert second == {'coef': [3, 4]}
+    assert model.stats()['loads']['reload']['count'] == 1
+
+
+def test_published_model_is_used_at_once(tmpdir):
+    """Test if a published model is handed out without being unpickled."""
+    from beard_server.modules.predictor.model import CachedModel
+    from beard_server.registry import registry
+
+    path = str(tmpdir.join('linkage.dat'))
+    _dump(path, {'coef': [1, 2]})
+
+    model = CachedModel(path, check_interval=0)
+    model.get()
+    new = {'coef': [5, 6]}
+    misses = registry.misses
+    model.publish(new)
+
+    assert model.get() is new
+    assert registry.misses == misses
+    assert os.listdir(str(tmpdir)) == ['linkage.dat']
+
+    with open(path, 'rb') as fp:
+        assert pickle.load(fp) == new
+
+
+def test_latency_stats():
+    """Test if the percentiles are taken from the latest durations."""
+    from beard_server.modules.predictor.model import LatencyStats
+
+    stats = LatencyStats(window=4)
+
+    assert stats.as_dict()['mean'] is None
+
+    for duration in (10.0, 1.0, 2.0, 3.0, 4.0):
+        stats.add(duration)
+
+    assert stats.as_dict() == {'count': 5, 'mean': 4.0, 'p50': 3.0,
+                               'p99': 4.0, 'max': 10.0}
@@ -152,3 +152,13 @@ def test_working_predictor_top_words(app):
 
         assert data == result
         assert res.status_code == 200
+
+
+def test_stats(app):
+    """Check if the latencies of the coreness requests are reported."""
+    with app.test_client() as client:
+        res = client.get("/api/predictor/stats")
+        data = json.loads(res.data)
+
+        assert set(data['requests']) == set(['warm', 'cold', 'reload'])
+        assert set(data['model']['loads']) == set(['cold', 'reload'])
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the bounded caches."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+
+def test_least_recently_used_is_evicted():
+    """Test if the entry used the longest time ago goes first."""
+    from beard_server.cache import LRUCache
+
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+
+    assert cache.get('a') == 1
+
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.get('b') is None
+    assert cache.stats() == {'entries': 2, 'size': 2, 'max_size': 2,
+                             'hits': 3, 'misses': 1, 'hit_rate': 0.75,
+                             'evictions': 1}
+
+
+def test_size_aware_eviction():
+    """Test if the cache is bounded by the size of its values."""
+    from beard_server.cache import LRUCache
+
+    cache = LRUCache(10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    cache.put('a', 'xx')
+    cache.put('c', 'xxxxx')
+
+    assert cache.size == 7
+    assert sorted(key for key in ('a', 'b', 'c') if key in cache) == \
+        ['a', 'c']
+
+    cache.put('d', 'x' * 11)
+
+    assert 'd' not in cache
+    assert len(cache) == 2
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.stats()['size'] == 0
+
+
+def test_max_age():
+    """Test if old entries of the memory cache expire."""
+    from beard_server.cache import LRUCache
+
+    cache = LRUCache(10, max_age=-1)
+    cache.put('a', 1)
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_filesystem_cache(tmpdir):
+    """Test if values are shared through the directory and evicted."""
+    import os
+    import time
+
+    from beard_server.cache import FilesystemCache
+
+    directory = str(tmpdir.join('cache'))
+    cache = FilesystemCache(directory, max_size=2500)
+    cache.put('a', b'x' * 1000)
+    cache.put('b', b'y' * 1000)
+
+    # Make 'a' the least recently used entry.
+    for path in os.listdir(directory):
+        os.utime(os.path.join(directory, path), (0, 0))
+    assert FilesystemCache(directory, 2500).get('b') == b'y' * 1000
+
+    cache.put('c', b'z' * 1000)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == b'y' * 1000
+    assert cache.get('c') == b'z' * 1000
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+
+    expired = FilesystemCache(directory, 2500, max_age=time.time() / 2)
+    os.utime(expired._path('c'), (0, 0))
+
+    assert expired.get('c') is None
+    assert expired.stats()['entries'] == 1
+
+    cache.clear()
+
+    assert cache.stats()['entries'] == 0
+
+
+def test_make_cache(tmpdir):
+    """Test the selection of the backend."""
+    import pytest
+
+    from beard_server.cache import FilesystemCache, LRUCache, make_cache
+
+    assert make_cache(None, 100) is None
+    assert make_cache('memory', 0) is None
+    assert isinstance(make_cache('memory', 100), LRUCache)
+    assert isinstance(make_cache('filesystem', 100,
+                                 directory=str(tmpdir)), FilesystemCache)
+
+    with pytest.raises(ValueError):
+        make_cache('redis', 100)
+
+
+def test_content_hash():
+    """Test if the hash does not depend on the order of keys."""
+    from beard_server.cache import content_hash
+
+    first = {}
+    first['a'] = 1
+    first['b'] = [1, {'c': 2, 'd': 3}]
+
+    second = {}
+    second['b'] = [1, {'d': 3, 'c': 2}]
+    second['a'] = 1
+
+    assert content_hash(first) == content_hash(second)
+    assert content_hash(first) != content_hash({'a': 1})
@@ -263,3 +263,33 @@ def test_conflict_resolver():
 
     assert solve_conflicts(
         claimed_signatures, not_claimed_signatures) == result
+
+
+def test_merge_clusters():
+    """Test if the clusters of groups of blocks are merged and matched."""
+    from beard_server.tasks import merge_clusters
+
+    signatures = [
+        {'signature_id': 'a', 'author_recid': '10'},
+        {'signature_id': 'b', 'author_recid': '10'},
+        {'signature_id': 'c'},
+        {'signature_id': 'd'},
+    ]
+
+    with_profiles, with_no_profiles = merge_clusters(
+        [{'0': ['a', 'b']}, {'0': ['c'], '1': ['d']}], signatures)
+
+    assert with_profiles == {'10': ['a', 'b']}
+    assert sorted(with_no_profiles.values()) == [['c'], ['d']]
+
+
+def test_make_clusters_called_directly(monkeypatch):
+    """Test if a direct call clusters the payload in the task itself."""
+    from beard_server import config, tasks
+
+    monkeypatch.setattr(config, 'BEARD_SERVER_FAN_OUT_SIZE', 0)
+    monkeypatch.setattr(tasks, 'make_beard_clusters',
+                        lambda records, signatures: {'0': ['a']})
+
+    assert tasks.make_clusters([], [{'signature_id': 'a'}]) == \
+        ({}, {'0': ['a']})
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Test the instrumentation of clustering runs."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import json
+import logging
+
+
+def test_stages_are_nested():
+    """Test if nested stages are recorded with their joined names."""
+    from beard_server.instrumentation import profile, stage
+
+    with profile('run') as run:
+        with stage('predict'):
+            with stage('clustering'):
+                pass
+
+    names = [entry['name'] for entry in run.stages]
+
+    assert names == ['predict/clustering', 'predict']
+    assert run.time >= run.stages[1]['time'] >= run.stages[0]['time']
+    assert run.stages[0]['peak_rss'] > 0
+
+
+def test_current_stage():
+    """Test if the stage being run is given by its joined names."""
+    from beard_server.instrumentation import profile, stage
+
+    with profile('run') as run:
+        assert run.current_stage is None
+
+        with stage('predict'):
+            with stage('clustering'):
+                assert run.current_stage == 'predict/clustering'
+
+            assert run.current_stage == 'predict'
+
+    assert run.current_stage is None
+
+
+def test_counters_and_blocks():
+    """Test if blocks are summed in the counters and sorted by time."""
+    from beard_server.instrumentation import count, profile, record_block
+
+    with profile('run', signatures=5) as run:
+        count('block_cache_hits')
+        record_block('WANGs', 2, 1, 0.1)
+        record_block('DOEj', 3, 3, 0.5, affinity_time=0.4)
+
+    data = run.as_dict(max_blocks=1)
+
+    assert data['signatures'] == 5
+    assert data['counters'] == {'block_cache_hits': 1, 'blocks': 2,
+                                'signatures': 5, 'pairs': 4,
+                                'block_time': 0.6}
+    assert data['blocks'] == [{'block': 'DOEj', 'size': 3, 'pairs': 3,
+                               'time': 0.5, 'affinity_time': 0.4}]
+
+
+def test_outside_of_a_run():
+    """Test if stages and counters outside of a run are ignored."""
+    from beard_server.instrumentation import count, current_profile, \
+        record_block, stage
+
+    with stage('predict'):
+        count('block_cache_hits')
+        record_block('WANGs', 2, 1, 0.1)
+
+    assert current_profile() is None
+
+
+def test_disabled_instrumentation(monkeypatch):
+    """Test if no profile is made when instrumentation is disabled."""
+    from beard_server import config
+    from beard_server.instrumentation import current_profile, profile, stage
+
+    monkeypatch.setattr(config, 'BEARD_SERVER_INSTRUMENTATION', False)
+
+    with profile('run') as run:
+        with stage('predict'):
+            assert current_profile() is None
+
+    assert run is None
+
+
+class _Handler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_profile_is_logged():
+    """Test if the profile is emitted as a JSON log record."""
+    from beard_server.instrumentation import logger, profile, stage
+
+    handler = _Handler()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    try:
+        with profile('run'):
+            with stage('predict'):
+                pass
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+    assert len(handler.records) == 1
+    assert handler.records[0].profile['name'] == 'run'
+    assert json.loads(handler.records[0].getMessage())['stages'][0][
+        'name'] == 'predict'
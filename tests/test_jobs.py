@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Test the background jobs."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import json
+import threading
+import time
+
+
+def _wait(job, timeout=10):
+    deadline = time.time() + timeout
+
+    while job.in_flight and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_identical_jobs_are_deduplicated():
+    """Test if an identical job in flight is not submitted twice."""
+    from beard_server.jobs import JobManager
+
+    manager = JobManager(2, 60)
+    release = threading.Event()
+    calls = []
+
+    def work(payload):
+        calls.append(payload)
+        release.wait(10)
+        return {'clusters': payload}
+
+    first = manager.submit('work', work, [1, 2])
+    second = manager.submit('work', work, [1, 2])
+    other = manager.submit('work', work, [3])
+
+    assert second is first
+    assert other is not first
+
+    release.set()
+    _wait(first)
+    _wait(other)
+
+    assert first.status == 'done'
+    assert first.as_dict()['result'] == {'clusters': [1, 2]}
+    assert sorted(calls) == [[1, 2], [3]]
+
+    # Finished jobs do not catch new submissions.
+    assert manager.submit('work', work, [1, 2]) is not first
+
+
+def test_failed_job():
+    """Test if the error of a failed job is reported."""
+    from beard_server.jobs import JobManager
+
+    manager = JobManager(1, 60)
+
+    def work():
+        raise IOError("No model.")
+
+    job = manager.submit('work', work)
+    _wait(job)
+
+    assert job.as_dict()['status'] == 'failed'
+    assert job.as_dict()['error'] == 'IOError: No model.'
+
+
+def test_job_progress():
+    """Test if the progress is the stage being run."""
+    from beard_server import instrumentation
+    from beard_server.jobs import JobManager
+
+    manager = JobManager(1, 60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def work():
+        with instrumentation.stage('load_model'):
+            pass
+
+        with instrumentation.stage('block_clustering'):
+            started.set()
+            release.wait(10)
+
+    job = manager.submit('work', work)
+    started.wait(10)
+
+    assert job.progress() == {'stage': 'block_clustering',
+                              'stages_done': ['load_model']}
+
+    release.set()
+    _wait(job)
+
+    assert job.progress()['stage'] is None
+
+
+def test_finished_jobs_expire():
+    """Test if finished jobs are forgotten after their maximum age."""
+    from beard_server.jobs import JobManager
+
+    manager = JobManager(1, 0)
+    job = manager.submit('work', lambda: None)
+    _wait(job)
+    time.sleep(0.01)
+    manager.submit('other', lambda: None)
+
+    assert manager.get(job.id) is None
+
+
+def test_async_clustering(app, monkeypatch):
+    """Check if an asynchronous request returns a job to poll."""
+    from beard_server.modules.clustering import views
+
+    monkeypatch.setattr(views, 'clustering',
+                        lambda records, signatures: {'0': ['a']})
+
+    with app.test_client() as client:
+        res = client.post(
+            "/api/clustering/clusters?async=1",
+            data=json.dumps({"records": [], "signatures": []}),
+            headers={"Content-Type": "application/json"})
+        data = json.loads(res.data)
+
+        assert res.status_code == 202
+        assert res.headers['Location'].endswith(data['location'])
+
+        for _ in range(1000):
+            job = json.loads(client.get(data['location']).data)
+
+            if job['status'] == 'done':
+                break
+
+            time.sleep(0.01)
+
+        assert job['id'] == data['job_id']
+        assert job['result'] == {'0': ['a']}
+
+
+def test_unknown_job(app):
+    """Check if an unknown job is not found."""
+    with app.test_client() as client:
+        assert client.get("/api/jobs/unknown").status_code == 404
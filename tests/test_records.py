@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Test the record store."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+
+import pytest
+
+RECORDS = [
+    {'publication_id': 1, 'title': 'Graphene detectors',
+     'authors': ['Wang, Shang-Yung']},
+    {'publication_id': 2, 'title': 'Black holes',
+     'authors': ['Kao, W.F.', 'Wang, Shang-Yung']},
+]
+
+
+@pytest.fixture(params=['filesystem', 'sqlite'])
+def store(request, tmpdir):
+    """Record store of each backend."""
+    from beard_server.records import make_record_store
+
+    return make_record_store(request.param, str(tmpdir.join('records')))
+
+
+def test_put_and_get_many(store):
+    """Test if records are stored under their content hashes."""
+    from beard_server.cache import content_hash
+
+    refs = store.put_many(RECORDS)
+
+    assert refs == [{'publication_id': record['publication_id'],
+                     'record_hash': content_hash(record)}
+                    for record in RECORDS]
+
+    hashes = [ref['record_hash'] for ref in refs]
+
+    # Storing again is a no-op.
+    assert store.put_many(RECORDS) == refs
+    assert store.get_many(hashes[::-1]) == RECORDS[::-1]
+    assert store.missing(hashes) == []
+
+
+def test_missing_records(store):
+    """Test if only the records not stored yet are reported."""
+    from beard_server.records import MissingRecords, record_ref
+
+    store.put_many(RECORDS[:1])
+    hashes = [record_ref(record)['record_hash'] for record in RECORDS]
+
+    assert store.missing(hashes) == hashes[1:]
+
+    with pytest.raises(MissingRecords) as excinfo:
+        store.get_many(hashes)
+
+    assert excinfo.value.hashes == hashes[1:]
+
+
+def test_resolve_and_store_records(store):
+    """Test if references and records can be mixed in a payload."""
+    from beard_server.records import resolve_records, store_records
+
+    refs = store_records(RECORDS, store=store)
+
+    assert all(set(ref) == set(['publication_id', 'record_hash'])
+               for ref in refs)
+    assert store_records(refs, store=store) == refs
+    assert resolve_records([refs[0], RECORDS[1]], store=store) == RECORDS
+    assert resolve_records(RECORDS) is RECORDS
+
+
+def test_references_need_a_store():
+    """Test if references are rejected without a record store."""
+    from beard_server.records import record_ref, resolve_records
+
+    with pytest.raises(ValueError):
+        resolve_records([record_ref(RECORDS[0])])
+
+
+def test_invalid_hash(tmpdir):
+    """Test if hashes which are not SHA-1 digests are rejected."""
+    from beard_server.records import FilesystemRecordStore
+
+    store = FilesystemRecordStore(str(tmpdir))
+
+    with pytest.raises(ValueError):
+        store.missing(['../config'])
+
+
+def test_sqlite_connection_is_opened_per_process(tmpdir):
+    """Test if forked processes open their own SQLite connection."""
+    import multiprocessing
+
+    from beard_server.records import SQLiteRecordStore, record_ref
+
+    store = SQLiteRecordStore(str(tmpdir.join('records.sqlite')))
+
+    assert not os.path.exists(store.path)
+
+    store.put_many(RECORDS[:1])
+    queue = multiprocessing.Queue()
+
+    def child():
+        connection = store._connection()
+        store.put_many(RECORDS[1:])
+        queue.put(connection is not parent)
+
+    parent = store._connection()
+    process = multiprocessing.Process(target=child)
+    process.start()
+    assert queue.get(timeout=10)
+    process.join()
+
+    # Written by the child.
+    assert store.get_many([record_ref(RECORDS[1])['record_hash']]) == \
+        RECORDS[1:]
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the model registry."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import cPickle as pickle
+import os
+
+import pytest
+
+
+def _dump(path, model):
+    with open(path, 'wb') as fp:
+        pickle.dump(model, fp)
+
+
+def test_model_is_loaded_once(tmpdir):
+    """Test if the same instance is returned for an unchanged file."""
+    from beard_server.registry import ModelRegistry
+
+    path = str(tmpdir.join('model.dat'))
+    _dump(path, {'trees': [1, 2, 3]})
+
+    registry = ModelRegistry()
+    first = registry.load(path)
+    second = registry.load(path)
+
+    assert first is second
+    assert first == {'trees': [1, 2, 3]}
+    assert registry.hits == 1
+    assert registry.misses == 1
+
+
+def test_touched_model_is_not_reloaded(tmpdir):
+    """Test if a new mtime with the same content keeps the instance."""
+    from beard_server.registry import ModelRegistry
+
+    path = str(tmpdir.join('model.dat'))
+    _dump(path, {'trees': [1, 2, 3]})
+
+    registry = ModelRegistry()
+    first = registry.load(path)
+
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime + 10, stat.st_mtime + 10))
+
+    assert registry.load(path) is first
+    assert registry.misses == 1
+
+
+def test_changed_model_is_reloaded(tmpdir):
+    """Test if a new content of the file triggers reloading."""
+    from beard_server.registry import ModelRegistry
+
+    path = str(tmpdir.join('model.dat'))
+    _dump(path, {'trees': [1, 2, 3]})
+
+    registry = ModelRegistry()
+    registry.load(path)
+    digest = registry.fingerprint(path)
+
+    _dump(path, {'trees': [1, 2, 3, 4]})
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime + 10, stat.st_mtime + 10))
+
+    assert registry.load(path) == {'trees': [1, 2, 3, 4]}
+    assert registry.fingerprint(path) != digest
+    assert registry.misses == 2
+
+
+def test_stats(tmpdir):
+    """Test if the statistics describe the loaded models."""
+    from beard_server.registry import ModelRegistry
+
+    path = str(tmpdir.join('model.dat'))
+    _dump(path, [])
+
+    registry = ModelRegistry()
+    registry.load(path)
+    stats = registry.stats()
+
+    assert stats['misses'] == 1
+    assert stats['hits'] == 0
+    assert list(stats['models']) == [os.path.abspath(path)]
+    assert stats['load_time'] >= 0
+
+    registry.clear()
+
+    assert registry.stats() == {'hits': 0, 'misses': 0, 'load_time': 0,
+                                'models': {}}
+
+
+def test_missing_model(tmpdir):
+    """Test if a missing model raises IOError."""
+    from beard_server.registry import ModelRegistry
+
+    with pytest.raises(IOError):
+        ModelRegistry().load(str(tmpdir.join('missing.dat')))
+
+
+def test_derived_objects_follow_the_model(tmpdir):
+    """Test if derived objects are shared until the model is reloaded."""
+    from beard_server.registry import ModelRegistry
+
+    path = str(tmpdir.join('model.dat'))
+    _dump(path, [1, 2])
+
+    registry = ModelRegistry()
+    first = registry.derived(path, 'total',
+                             lambda model, digest: [sum(model)])
+
+    assert first == [3]
+    assert registry.derived(path, 'total',
+                            lambda model, digest: None) is first
+
+    _dump(path, [1, 2, 3])
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime + 10, stat.st_mtime + 10))
+
+    assert registry.derived(path, 'total',
+                            lambda model, digest: [sum(model)]) == [6]
+
+
+def test_published_model_keeps_the_mode(tmpdir):
+    """Test if publishing keeps the permissions of the replaced file."""
+    from beard_server.registry import ModelRegistry
+
+    path = str(tmpdir.join('model.dat'))
+    registry = ModelRegistry()
+    registry.publish(path, {'trees': [1]})
+
+    assert os.stat(path).st_mode & 0o777 == 0o644
+
+    os.chmod(path, 0o640)
+    registry.publish(path, {'trees': [2]})
+
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert registry.load(path) == {'trees': [2]}
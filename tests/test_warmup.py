@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Inspire.
+# Copyright (C) 2016 CERN.
+#
+# Inspire is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Inspire is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Inspire; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Test the preloading of the models in workers."""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import cPickle as pickle
+import multiprocessing
+
+
+def _dump(path, model):
+    with open(path, 'wb') as fp:
+        pickle.dump(model, fp)
+
+
+def test_preload_skips_missing_models(tmpdir):
+    """Test if available models are loaded and missing ones skipped."""
+    from beard_server.registry import registry
+    from beard_server.warmup import preload
+
+    path = str(tmpdir.join('pipeline.pickle'))
+    _dump(path, {'steps': [1, 2, 3]})
+
+    times = preload({'predictor_pipeline': path,
+                     'ethnicity_estimator': str(tmpdir.join('missing'))})
+
+    assert list(times) == ['predictor_pipeline']
+    assert registry.load(path) == {'steps': [1, 2, 3]}
+
+
+def _load_in_child(path, queue):
+    from beard_server.registry import registry
+
+    misses = registry.misses
+    registry.load(path)
+    queue.put(registry.misses - misses)
+
+
+def test_forked_children_reuse_preloaded_models(tmpdir):
+    """Test if the children do not load a model preloaded by the parent."""
+    from beard_server.warmup import preload
+
+    path = str(tmpdir.join('pipeline.pickle'))
+    _dump(path, {'steps': [4, 5, 6]})
+    preload({'predictor_pipeline': path})
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_load_in_child,
+                                      args=(path, queue))
+    process.start()
+    misses = queue.get()
+    process.join()
+
+    assert misses == 0
+
+
+def test_memory_sharing():
+    """Test if the memory of the process is split into shared and private."""
+    from beard_server.warmup import memory_sharing
+
+    memory = memory_sharing()
+
+    assert memory['rss'] > 0
+    assert memory['shared'] + memory['private'] == memory['rss']